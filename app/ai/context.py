@@ -0,0 +1,194 @@
+"""
+Token-budgeted input for the AI assistant.
+
+The system prompt starts with the lesson context, which depends only on the subject and
+lesson: it is built once per lesson, cached, and byte-identical across turns and users, so
+the provider's prompt caching can reuse it too. The conversation is then fitted into what is
+left of the budget: recent turns verbatim, older turns folded into a short extractive
+summary. Tokens are estimated from the UTF-8 length, which over-counts rather than
+under-counts for every script the app serves.
+"""
+
+import math
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Union
+
+from ..cache import MemoryBackend
+from ..config import settings
+from ..models import Lesson, Subject
+from .prompts import ASSISTANT_CONTEXT_PROMPT, ASSISTANT_PASSAGES_PROMPT, ASSISTANT_PROMPT
+
+BYTES_PER_TOKEN = 4
+ELLIPSIS = " ..."
+# Sentence ends in Latin, Arabic-script (؟ ۔) and Devanagari-style text, and line breaks
+_SENTENCE_END = re.compile(r"(?<=[.!?؟۔।])\s+|\n+")
+
+_prefixes = MemoryBackend(max_bytes=settings.assistant_context_cache_max_bytes)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text.encode("utf-8")) / BYTES_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` to about `max_tokens`, preferring to end at a paragraph or sentence break."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max(0, max_tokens * BYTES_PER_TOKEN - len(ELLIPSIS))
+    cut = text.encode("utf-8")[:budget].decode("utf-8", errors="ignore")
+    # Back off to a natural break when one is close to the end
+    for separator in ("\n\n", "\n", ". ", "؟ ", "۔ "):
+        position = cut.rfind(separator)
+        if position >= len(cut) * 0.8:
+            cut = cut[: position + len(separator.rstrip())]
+            break
+    return cut.rstrip() + ELLIPSIS
+
+
+def _first_sentence(text: str, max_chars: int = 200) -> str:
+    sentence = _SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars].rstrip() + ELLIPSIS
+
+
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+
+
+def summarize_turns(turns: List[dict], max_tokens: int, summary: Optional[str] = None) -> Optional[str]:
+    """
+    Extractive summary of older turns: the first sentence of each, appended to an earlier
+    `summary` (rolling), newest lines kept when over budget.
+    """
+    earlier = summary.splitlines()[1:] if summary else []
+    new = [f"- {'Student' if turn.get('role') == 'user' else 'Assistant'}: {_first_sentence(str(turn.get('content', '')))}" for turn in turns]
+    lines = []
+    used = estimate_tokens(SUMMARY_HEADER)
+    for line in reversed(earlier + new):
+        if used + estimate_tokens(line) > max_tokens:
+            break
+        lines.append(line)
+        used += estimate_tokens(line)
+    if not lines:
+        return None
+    return "\n".join([SUMMARY_HEADER, *reversed(lines)])
+
+
+def _prefix_key(subject_id: str, lesson_id: Optional[str], include_content: bool = True) -> str:
+    key = f"lesson:{lesson_id}" if lesson_id else f"subject:{subject_id}"
+    return key if include_content else f"{key}:brief"
+
+
+def lesson_context(subject_id: str, lesson_id: Optional[str] = None, include_content: bool = True) -> str:
+    """
+    The stable context part of the assistant prompt for a subject/lesson, cached across turns
+    and users. Without `include_content` only the names are included, for when retrieved
+    passages stand in for the lesson content.
+    """
+    key = _prefix_key(subject_id, lesson_id, include_content)
+    payload = _prefixes.get(key)
+    if payload is not None:
+        return payload.decode("utf-8")
+
+    try:
+        subject_name = Subject.get(subject_id, attributes_to_get=["name"]).name
+    except Subject.DoesNotExist:
+        subject_name = ""
+    lesson_title, lesson_content = "", ""
+    if lesson_id:
+        try:
+            lesson = Lesson.get(lesson_id, attributes_to_get=["title", "content"] if include_content else ["title"])
+            lesson_title = lesson.title
+            if include_content:
+                lesson_content = truncate_to_tokens(lesson.content or "", settings.assistant_lesson_budget_tokens)
+        except Lesson.DoesNotExist:
+            pass
+
+    context = ASSISTANT_CONTEXT_PROMPT.format(subject=subject_name, lesson_title=lesson_title, lesson_content=lesson_content)
+    _prefixes.set(key, context.encode("utf-8"), settings.assistant_context_cache_ttl_seconds)
+    return context
+
+
+def invalidate_lesson_context(lesson_id: str) -> None:
+    _prefixes.delete(_prefix_key("", lesson_id), _prefix_key("", lesson_id, include_content=False))
+
+
+@dataclass
+class AssistantInput:
+    instruction: str
+    messages: List[dict]
+    estimated_tokens: int
+    summarized_turns: int = 0
+
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(str(message.get("content", ""))) + 4  # role and framing
+
+
+def latest_question(user_messages: Union[str, List[dict]]) -> str:
+    """The student's last message, with the one before it for short follow-ups ("and the second one?")."""
+    if isinstance(user_messages, str):
+        return user_messages
+    questions = [str(message.get("content", "")) for message in user_messages if message.get("role") == "user"]
+    if questions and len(questions) > 1 and estimate_tokens(questions[-1]) < 20:
+        return f"{questions[-2]}\n{questions[-1]}"
+    return questions[-1] if questions else ""
+
+
+def format_passages(passages: list) -> str:
+    """Retrieved passages (see app/ai/retrieval.py) for the system prompt, after the stable context."""
+    if not passages:
+        return ""
+    body = "\n\n".join(f"[{passage.lesson_title}]\n{passage.text}" for passage in passages)
+    return ASSISTANT_PASSAGES_PROMPT.format(passages=body)
+
+
+def build_assistant_input(
+    context: str,
+    language: str,
+    user_messages: Union[str, List[dict]],
+    budget_tokens: Optional[int] = None,
+    passages: Optional[list] = None,
+    summary: Optional[str] = None,
+) -> AssistantInput:
+    """
+    System prompt plus as much of the conversation as fits in `budget_tokens`.
+    Retrieved `passages` go at the end of the system prompt, so the cached prefix stays stable.
+    `summary` is the rolling summary of a server-side session's earlier turns.
+
+    The latest message is always sent (truncated if it alone is over budget). Earlier turns
+    are kept newest first while they fit; the rest become an extractive summary placed right
+    after the system prompt. The kept history always starts with a student turn.
+    """
+    budget = budget_tokens or settings.assistant_input_budget_tokens
+    instruction = ASSISTANT_PROMPT.format(context=context, language=language) + format_passages(passages)
+    messages = [{"role": "user", "content": user_messages}] if isinstance(user_messages, str) else list(user_messages)
+    if not messages:
+        return AssistantInput(instruction=instruction, messages=[], estimated_tokens=estimate_tokens(instruction))
+
+    remaining = budget - estimate_tokens(instruction)
+    latest = dict(messages[-1])
+    latest["content"] = truncate_to_tokens(str(latest.get("content", "")), max(remaining - 4, settings.assistant_min_message_tokens))
+    remaining -= message_tokens(latest)
+
+    older = messages[:-1]
+    summary_budget = min(settings.assistant_summary_budget_tokens, max(remaining, 0))
+    start = len(older)
+    while start > 0 and message_tokens(older[start - 1]) <= remaining - (summary_budget if summary or start > 1 else 0):
+        start -= 1
+        remaining -= message_tokens(older[start])
+    # Do not open the kept history with an assistant turn
+    while start < len(older) and older[start].get("role") != "user":
+        remaining += message_tokens(older[start])
+        start += 1
+
+    kept = older[start:] + [latest]
+    summary = summarize_turns(older[:start], min(summary_budget, max(remaining, 0)), summary) if start or summary else None
+    if summary:
+        kept.insert(0, {"role": "system", "content": summary})
+
+    return AssistantInput(
+        instruction=instruction,
+        messages=kept,
+        estimated_tokens=estimate_tokens(instruction) + sum(message_tokens(message) for message in kept),
+        summarized_turns=start,
+    )
@@ -5,20 +5,21 @@ AI functions for generating educational content.
 from pydantic import BaseModel
 from typing import Literal
 from .prompts import (
-    ASSISTANT_PROMPT,
     LESSON_GENERATOR_PROMPT,
     PRACTICE_TASK_GENERATOR_PROMPT,
     QUIZ_GENERATOR_PROMPT,
     QUIZ_FEEDBACK_GENERATOR_PROMPT,
 )
+from .context import build_assistant_input
 from .utils import get_completion
 
 
-async def ai_assistant(user_messages, context, language):
+async def ai_assistant(user_messages, context, language, passages=None, summary=None):
     """
-    AI assistant to answer user queries with context.
+    AI assistant to answer user queries with context and retrieved lesson passages, within the assistant token budget.
     """
-    result = await get_completion(ASSISTANT_PROMPT.format(context=context, language=language), user_messages=user_messages)
+    assistant_input = build_assistant_input(context, language, user_messages, passages=passages, summary=summary)
+    result = await get_completion(assistant_input.instruction, user_messages=assistant_input.messages)
     return result
 
 
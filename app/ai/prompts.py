@@ -1,5 +1,16 @@
-ASSISTANT_PROMPT = """You are a helpful AI assistant in {language} language. Use the provided context to answer the user's query.
+# The context comes first so the prompt prefix is identical for every student of a lesson
+ASSISTANT_PROMPT = """Use the provided context to answer the user's query.
 Context: {context}
+
+You are a helpful AI assistant in {language} language.
+"""
+
+ASSISTANT_CONTEXT_PROMPT = """Subject: {subject}, Lesson: {lesson_title}
+{lesson_content}"""
+
+ASSISTANT_PASSAGES_PROMPT = """
+Relevant passages from the subject's lessons:
+{passages}
 """
 
 LESSON_GENERATOR_PROMPT = """You are an expert instructor of {subject}. Generate a comprehensive lesson about '{title}' for grade {grade_level} students in {language}.
@@ -0,0 +1,301 @@
+"""
+Passage retrieval over lesson content for the AI assistant.
+
+When a lesson is saved its content is split into passages of about
+`retrieval_chunk_tokens`, and each passage gets a term vector from a hashing vectorizer
+(word unigrams and bigrams plus character trigrams, hashed into `DIMENSIONS` signed buckets,
+L2-normalized, stored as float16). A lesson's passages and vectors are one `ChunkIndex`,
+kept in the LessonChunks table under the lesson's subject, so a single query loads a
+whole subject. The assistant scores the student's question against every passage of the
+subject (a matrix-vector product) and sends only the best `retrieval_top_k`, which also
+lets it answer from other lessons of the subject.
+
+Vectors are computed locally and deterministically (crc32 hashing), so no model or service
+is needed and indexes written by one instance are readable by every other.
+"""
+
+import json
+import logging
+import math
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from ..cache import MemoryBackend
+from ..config import settings
+from ..models import Lesson, LessonChunks
+from ..text import words
+from .context import _SENTENCE_END, ELLIPSIS, estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = 1024  # changing it requires `manage.py index_lessons`
+CHAR_NGRAM_WEIGHT = 0.3
+# Passages scoring under this fraction of the best one are noise (shared common words), not context
+RELATIVE_CUTOFF = 0.5
+MAX_CHUNKS_PER_LESSON = 100  # keeps a LessonChunks item well under the 400 KB DynamoDB limit
+
+_subjects = MemoryBackend(max_bytes=settings.retrieval_cache_max_bytes)
+
+
+def _features(text: str) -> dict:
+    features = {}
+    tokens = words(text)
+    for i, token in enumerate(tokens):
+        features[token] = features.get(token, 0.0) + 1.0
+        if i:
+            bigram = f"{tokens[i - 1]} {token}"
+            features[bigram] = features.get(bigram, 0.0) + 1.0
+        # Character trigrams let inflected forms ("fraction", "fractions", "الکسر") still match
+        padded = f"<{token}>"
+        for j in range(len(padded) - 2):
+            trigram = "#" + padded[j : j + 3]
+            features[trigram] = features.get(trigram, 0.0) + CHAR_NGRAM_WEIGHT
+    return features
+
+
+def vectorize(texts: List[str]) -> np.ndarray:
+    """L2-normalized hashed term vectors, float32 (len(texts), DIMENSIONS)."""
+    vectors = np.zeros((len(texts), DIMENSIONS), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature, weight in _features(text).items():
+            h = zlib.crc32(feature.encode("utf-8"))
+            # Low bits pick the bucket, the top bit the sign, so collisions tend to cancel out
+            vectors[row, h % DIMENSIONS] += (1.0 if h >> 31 else -1.0) * math.log1p(weight)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def chunk_text(text: str, max_tokens: Optional[int] = None) -> List[str]:
+    """Split `text` into passages of up to about `max_tokens`, along paragraphs, then sentences."""
+    max_tokens = max_tokens or settings.retrieval_chunk_tokens
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            sentence = sentence.strip()
+            while sentence:
+                piece = truncate_to_tokens(sentence, max_tokens)
+                if piece == sentence or piece == ELLIPSIS:
+                    pieces.append(sentence)
+                    break
+                piece = piece[: -len(ELLIPSIS)]
+                pieces.append(piece)
+                sentence = sentence[len(piece) :].strip()
+
+    chunks, current = [], ""
+    for piece in pieces:
+        candidate = f"{current}\n\n{piece}" if current else piece
+        if current and estimate_tokens(candidate) > max_tokens:
+            chunks.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+@dataclass
+class ChunkIndex:
+    """Passages of one or more lessons with their vectors, in a flat binary layout that loads without copying."""
+
+    lesson_ids: List[str]
+    titles: List[str]
+    languages: List[str]
+    lesson: np.ndarray  # int32 (chunks,), position in lesson_ids of each passage
+    offsets: np.ndarray  # int64 (chunks + 1,), passage i is text[offsets[i]:offsets[i + 1]]
+    vectors: np.ndarray  # float16 (chunks, DIMENSIONS)
+    text: bytes  # UTF-8 passages, concatenated
+
+    def __len__(self) -> int:
+        return len(self.lesson)
+
+    def passage(self, i: int) -> str:
+        return self.text[self.offsets[i] : self.offsets[i + 1]].decode("utf-8")
+
+    @classmethod
+    def for_lesson(cls, lesson: Lesson) -> "ChunkIndex":
+        passages = chunk_text(lesson.content or "")[:MAX_CHUNKS_PER_LESSON]
+        encoded = [passage.encode("utf-8") for passage in passages]
+        # The title is part of every passage's vector, so "fractions" finds the Fractions lesson
+        vectors = vectorize([f"{lesson.title}\n{passage}" for passage in passages])
+        return cls(
+            lesson_ids=[lesson.id],
+            titles=[lesson.title],
+            languages=[lesson.language],
+            lesson=np.zeros(len(passages), dtype=np.int32),
+            offsets=np.concatenate([[0], np.cumsum([len(e) for e in encoded], dtype=np.int64)]).astype(np.int64),
+            vectors=vectors.astype(np.float16),
+            text=b"".join(encoded),
+        )
+
+    @classmethod
+    def concat(cls, indexes: List["ChunkIndex"]) -> "ChunkIndex":
+        lesson_ids, titles, languages, lesson, offsets, base, position = [], [], [], [], [np.zeros(1, dtype=np.int64)], 0, 0
+        for index in indexes:
+            lesson_ids += index.lesson_ids
+            titles += index.titles
+            languages += index.languages
+            lesson.append(index.lesson + position)
+            offsets.append(index.offsets[1:] + base)
+            base += len(index.text)
+            position += len(index.lesson_ids)
+        return cls(
+            lesson_ids=lesson_ids,
+            titles=titles,
+            languages=languages,
+            lesson=np.concatenate(lesson or [np.zeros(0, dtype=np.int32)]).astype(np.int32),
+            offsets=np.concatenate(offsets),
+            vectors=np.concatenate([index.vectors for index in indexes] or [np.zeros((0, DIMENSIONS), dtype=np.float16)]),
+            text=b"".join(index.text for index in indexes),
+        )
+
+    def to_bytes(self) -> bytes:
+        """Length-prefixed JSON header, then offsets, lesson positions, vectors and text, each 8-byte aligned."""
+        header = json.dumps(
+            {"lesson_ids": self.lesson_ids, "titles": self.titles, "languages": self.languages, "chunks": len(self), "dimensions": DIMENSIONS}
+        ).encode("utf-8")
+        header += b" " * (-(len(header) + 4) % 8)
+        lesson = self.lesson.astype(np.int32).tobytes()
+        lesson += b"\0" * (-len(lesson) % 8)
+        return b"".join(
+            [len(header).to_bytes(4, "little"), header, self.offsets.astype(np.int64).tobytes(), lesson, self.vectors.astype(np.float16).tobytes(), self.text]
+        )
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "ChunkIndex":
+        header_size = int.from_bytes(payload[:4], "little")
+        header = json.loads(payload[4 : 4 + header_size])
+        if header["dimensions"] != DIMENSIONS:
+            raise ValueError(f"Index built with {header['dimensions']} dimensions, expected {DIMENSIONS}; run manage.py index_lessons")
+        chunks = header["chunks"]
+        position = 4 + header_size
+        offsets = np.frombuffer(payload, dtype=np.int64, count=chunks + 1, offset=position)
+        position += offsets.nbytes
+        lesson = np.frombuffer(payload, dtype=np.int32, count=chunks, offset=position)
+        position += lesson.nbytes + (-lesson.nbytes % 8)
+        vectors = np.frombuffer(payload, dtype=np.float16, count=chunks * DIMENSIONS, offset=position).reshape(chunks, DIMENSIONS)
+        position += vectors.nbytes
+        return cls(header["lesson_ids"], header["titles"], header["languages"], lesson, offsets, vectors, payload[position:])
+
+
+def _item(lesson: Lesson) -> Optional[LessonChunks]:
+    index = ChunkIndex.for_lesson(lesson)
+    if not len(index):
+        return None
+    return LessonChunks(
+        subject_id=lesson.subject_id,
+        lesson_id=lesson.id,
+        language=lesson.language,
+        chunk_count=len(index),
+        index=zlib.compress(index.to_bytes(), 6),
+    )
+
+
+def index_lesson(lesson: Lesson, previous_subject_id: Optional[str] = None) -> None:
+    """(Re)build the passages of a saved lesson. Failures are logged, never raised: the lesson itself is saved."""
+    if not settings.retrieval_enabled:
+        return
+    try:
+        if previous_subject_id and previous_subject_id != lesson.subject_id:
+            remove_lesson(previous_subject_id, lesson.id)
+        item = _item(lesson)
+        if item is None:
+            remove_lesson(lesson.subject_id, lesson.id)
+            return
+        item.save()
+        _subjects.delete(lesson.subject_id)
+    except Exception as e:
+        logger.error(f"Error indexing lesson {lesson.id} for retrieval: {e}")
+
+
+def remove_lesson(subject_id: str, lesson_id: str) -> None:
+    try:
+        LessonChunks(subject_id=subject_id, lesson_id=lesson_id).delete()
+        _subjects.delete(subject_id)
+    except Exception as e:
+        logger.error(f"Error removing lesson {lesson_id} from retrieval: {e}")
+
+
+def index_lessons(lessons: Iterable[Lesson]) -> int:
+    """Bulk (re)build, e.g. after seeding; returns the number of lessons with passages."""
+    indexed = 0
+    subject_ids = set()
+    with LessonChunks.batch_write() as batch:
+        for lesson in lessons:
+            item = _item(lesson)
+            if item is not None:
+                batch.save(item)
+                indexed += 1
+                subject_ids.add(lesson.subject_id)
+    _subjects.delete(*subject_ids)
+    return indexed
+
+
+def subject_index(subject_id: str) -> Optional[ChunkIndex]:
+    """Every passage of a subject, cached as one flat payload for `retrieval_cache_ttl_seconds`."""
+    payload = _subjects.get(subject_id)
+    if payload is None:
+        indexes = [ChunkIndex.from_bytes(zlib.decompress(item.index)) for item in LessonChunks.query(subject_id)]
+        if not indexes:
+            return None
+        payload = ChunkIndex.concat(indexes).to_bytes()
+        _subjects.set(subject_id, payload, settings.retrieval_cache_ttl_seconds)
+    return ChunkIndex.from_bytes(payload)
+
+
+@dataclass
+class Passage:
+    lesson_id: str
+    lesson_title: str
+    text: str
+    score: float
+
+
+def retrieve(subject_id: str, question: str, lesson_id: Optional[str] = None, language: Optional[str] = None, k: Optional[int] = None) -> List[Passage]:
+    """
+    The `k` passages of the subject most similar to `question`, best first. Passages of
+    `lesson_id` get a small boost and are searched whatever their language; other lessons
+    only in `language`. Returns [] when nothing is indexed or on any error, so callers can
+    fall back to the full lesson.
+    """
+    k = k or settings.retrieval_top_k
+    try:
+        index = subject_index(subject_id)
+        if index is None or not len(index) or not question.strip():
+            return []
+        query = vectorize([question])[0]
+        scores = index.vectors.astype(np.float32) @ query
+
+        own = np.array([i for i, lid in enumerate(index.lesson_ids) if lid == lesson_id], dtype=np.int32)
+        if len(own):
+            scores[np.isin(index.lesson, own)] += settings.retrieval_lesson_boost
+        if language:
+            allowed = np.array([i for i, lang in enumerate(index.languages) if lang == language or index.lesson_ids[i] == lesson_id], dtype=np.int32)
+            scores[~np.isin(index.lesson, allowed)] = -np.inf
+
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        cutoff = max(settings.retrieval_min_score, float(scores[top[0]]) * RELATIVE_CUTOFF)
+        return [
+            Passage(
+                lesson_id=index.lesson_ids[index.lesson[i]],
+                lesson_title=index.titles[index.lesson[i]],
+                text=index.passage(i),
+                score=float(scores[i]),
+            )
+            for i in top
+            if scores[i] >= cutoff
+        ]
+    except Exception as e:
+        logger.error(f"Error retrieving passages for subject {subject_id}: {e}")
+        return []
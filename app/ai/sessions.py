@@ -0,0 +1,81 @@
+"""
+Server-side conversations for /ai/assist.
+
+A client sends only its new `message` and the `session_id` returned by the previous turn;
+the history lives in the AssistantSession table. After each turn the stored history is
+compacted: once it exceeds `assistant_session_history_tokens`, the oldest turns are folded
+into the session's rolling extractive summary, so both the item and the model input stay
+bounded however long the conversation runs. Every turn pushes the session's TTL back by
+`assistant_session_ttl_seconds`; idle sessions are dropped by DynamoDB.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+from pynamodb.exceptions import PutError
+
+from ..config import settings
+from ..models import AssistantMessageAttribute, AssistantSession
+from .context import message_tokens, summarize_turns
+
+logger = logging.getLogger(__name__)
+
+
+def get_session(session_id: str, user_id: str) -> Optional[AssistantSession]:
+    """The user's session, None when it does not exist, has expired or belongs to someone else."""
+    try:
+        session = AssistantSession.get(session_id)
+    except AssistantSession.DoesNotExist:
+        return None
+    # DynamoDB deletes expired items lazily, up to days later
+    if session.user_id != user_id or session.expires_at <= datetime.now(timezone.utc):
+        return None
+    return session
+
+
+def start_session(user_id: str, subject_id: str, lesson_id: Optional[str] = None) -> AssistantSession:
+    """A new, unsaved session; it is written with its first turn."""
+    return AssistantSession(user_id=user_id, subject_id=subject_id, lesson_id=lesson_id, messages=[], turns=0)
+
+
+def history(session: AssistantSession) -> List[dict]:
+    return [{"role": message.role, "content": message.content} for message in session.messages]
+
+
+def _compact(messages: List[dict], summary: Optional[str]) -> tuple:
+    """Fold the oldest turns into the summary until the verbatim history fits its budget."""
+    folded = 0
+    while folded < len(messages) - 2 and sum(message_tokens(m) for m in messages[folded:]) > settings.assistant_session_history_tokens:
+        folded += 1
+    # The kept history starts with a student turn
+    while folded < len(messages) - 1 and messages[folded]["role"] != "user":
+        folded += 1
+    if folded:
+        summary = summarize_turns(messages[:folded], settings.assistant_summary_budget_tokens, summary)
+    return messages[folded:], summary
+
+
+def record_turn(session: AssistantSession, message: str, reply: str, subject_id: str, lesson_id: Optional[str] = None) -> AssistantSession:
+    """
+    Append a turn and save. The save is conditional on the turn count the session was read
+    with, so of two concurrent turns on one session the second gets a 409 instead of
+    silently dropping the first.
+    """
+    read_turns = session.turns
+    messages, summary = _compact(history(session) + [{"role": "user", "content": message}, {"role": "assistant", "content": reply or ""}], session.summary)
+    session.messages = [AssistantMessageAttribute(**m) for m in messages]
+    session.summary = summary
+    session.turns = read_turns + 1
+    session.subject_id, session.lesson_id = subject_id, lesson_id
+    session.expires_at = datetime.now(timezone.utc) + timedelta(seconds=settings.assistant_session_ttl_seconds)
+    condition = AssistantSession.id.does_not_exist() if read_turns == 0 else AssistantSession.turns == read_turns
+    try:
+        session.save(condition=condition)
+    except PutError as e:
+        if e.cause_response_code == "ConditionalCheckFailedException":
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Session was updated by another request, please retry")
+        logger.error(f"Error saving assistant session {session.id}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not save session")
+    return session
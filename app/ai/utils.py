@@ -1,32 +1,67 @@
-from agents import AsyncOpenAI, OpenAIChatCompletionsModel
 from dotenv import load_dotenv
+import asyncio
 import os
+import time
+import weakref
+
+from .. import metrics
+from ..config import settings
 
 load_dotenv()
 
+# One client (and HTTP connection pool) per event loop, created on first use. The OpenAI SDK
+# is imported lazily because it dominates the app's import time.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    from openai import AsyncOpenAI
+
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(base_url=settings.llm_base_url, api_key=os.getenv("GEMINI_API_KEY"))
+        _clients[loop] = client
+    return client
+
 
 def get_model():
-    gemini_client = AsyncOpenAI(base_url="https://generativelanguage.googleapis.com/v1beta/openai/", api_key=os.getenv("GEMINI_API_KEY"))
+    from agents import AsyncOpenAI, OpenAIChatCompletionsModel
+
+    gemini_client = AsyncOpenAI(base_url=settings.llm_base_url, api_key=os.getenv("GEMINI_API_KEY"))
     model = OpenAIChatCompletionsModel(openai_client=gemini_client, model="gemini-2.0-flash-lite")
 
     return model
 
 
 async def get_completion(instruction: str, user_messages: str | list, output_type=None, model="gemini-2.0-flash-lite"):
-    client = AsyncOpenAI(base_url="https://generativelanguage.googleapis.com/v1beta/openai/", api_key=os.getenv("GEMINI_API_KEY"))
+    client = get_client()
     if isinstance(user_messages, str):
         user_messages = [{"role": "user", "content": user_messages}]
 
-    if output_type:
-        completion = await client.chat.completions.parse(
+    start = time.perf_counter()
+    usage = None
+    try:
+        if output_type:
+            completion = await client.chat.completions.parse(
+                model=model,
+                messages=[{"role": "system", "content": instruction}] + user_messages,
+                response_format=output_type,
+            )
+            usage = completion.usage
+            return completion.choices[-1].message.parsed
+
+        response = await client.chat.completions.create(
             model=model,
             messages=[{"role": "system", "content": instruction}] + user_messages,
-            response_format=output_type,
         )
-        return completion.choices[-1].message.parsed
-
-    response = await client.chat.completions.create(
-        model=model,
-        messages=[{"role": "system", "content": instruction}] + user_messages,
-    )
-    return response.choices[-1].message.content
+        usage = response.usage
+        return response.choices[-1].message.content
+    finally:
+        metrics.record_llm_call(
+            model,
+            (time.perf_counter() - start) * 1000,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            ok=usage is not None,
+        )
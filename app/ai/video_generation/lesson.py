@@ -3,7 +3,7 @@ from typing import List, Optional, Dict
 import uuid
 from tqdm import tqdm
 from .utils import (
-    client,
+    get_genai_client,
     MODEL_ID,
     image_generation,
     text_to_speech,
@@ -63,7 +63,7 @@ def lesson_generation(lesson_input: LessonInput) -> Lesson:
     Respond in {lesson_input.language}.
     """
 
-    response = client.models.generate_content(
+    response = get_genai_client().models.generate_content(
         model=MODEL_ID,
         contents=prompt,
         config={
@@ -1,16 +1,17 @@
 from typing import List
-from google import genai
-from google.genai import types
+from functools import lru_cache
 import os
 from pathlib import Path
 import wave
-import boto3
 from botocore.exceptions import ClientError
-from ..config import settings
+from ...config import settings
 import tempfile
-from moviepy import ImageClip, AudioFileClip, VideoFileClip, concatenate_videoclips
 import logging
 import re
+
+# google-genai, boto3 and moviepy are heavy; they are imported on first use so that importing
+# this package (or anything that imports it) stays cheap.
+
 # Set up logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -22,8 +23,20 @@ IMAGE_MODEL_ID = "gemini-2.5-flash-image-preview"
 AUDIO_MODEL_ID = "gemini-2.5-flash-preview-tts"
 GOOGLE_API_KEY = settings.gemini_api_key
 
-client = genai.Client(api_key=GOOGLE_API_KEY)
-s3_client = boto3.client("s3")
+
+@lru_cache(maxsize=None)
+def get_genai_client():
+    from google import genai
+
+    return genai.Client(api_key=GOOGLE_API_KEY)
+
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    import boto3
+
+    return boto3.client("s3")
+
 
 def clean_filename(filename:str):
     filename = filename[:100]
@@ -35,7 +48,7 @@ def clean_filename(filename:str):
 def upload_to_s3(file_path: str, s3_key: str) -> str:
     """Upload a file to S3 bucket and return the URL."""
     try:
-        s3_client.upload_file(file_path, S3_BUCKET, s3_key)
+        get_s3_client().upload_file(file_path, S3_BUCKET, s3_key)
         url = f"https://{S3_BUCKET}.s3.amazonaws.com/{s3_key}"
         logger.info(f"Uploaded {file_path} to S3: {url}")
         return url
@@ -98,7 +111,9 @@ def image_generation(lesson_concept, topic: str, use_s3: bool = True) -> List[st
     NOTE: Create atleast one image for given concept, it would be nice if you generate upto 5 images to illustrate the concept.
     """
 
-    response = client.models.generate_content(
+    from google.genai import types
+
+    response = get_genai_client().models.generate_content(
         model=IMAGE_MODEL_ID,
         contents=prompt,
         config=types.GenerateContentConfig(response_modalities=["Image"]),
@@ -117,7 +132,9 @@ def wave_file(filename, pcm, channels=1, rate=24000, sample_width=2):
 
 def text_to_speech(text: str, filename: str, topic: str, use_s3: bool = True) -> str:
     """Convert text to speech and save locally or to S3."""
-    response = client.models.generate_content(
+    from google.genai import types
+
+    response = get_genai_client().models.generate_content(
         model=AUDIO_MODEL_ID,
         contents=text,
         config=types.GenerateContentConfig(
@@ -164,6 +181,8 @@ def create_mini_video(
     use_s3: bool = True,
 ) -> str:
     """Create a mini video from images and audio."""
+    from moviepy import ImageClip, AudioFileClip, concatenate_videoclips
+
     # Download files from S3 if needed
     if use_s3 and img_paths and img_paths[0].startswith("http"):
         # Implementation for downloading from S3 would go here
@@ -214,6 +233,8 @@ def create_full_video(
     mini_video_paths: List[str], output_name: str, use_s3: bool = True
 ) -> str:
     """Create a full video by concatenating mini videos."""
+    from moviepy import VideoFileClip, concatenate_videoclips
+
     # Download files from S3 if needed
     if use_s3 and mini_video_paths and mini_video_paths[0].startswith("http"):
         # Implementation for downloading from S3 would go here
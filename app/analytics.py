@@ -0,0 +1,198 @@
+"""
+Cohort analytics over quiz attempt summaries.
+
+Attempts are read through the quiz summary index (no questions, responses or feedback) into
+columnar NumPy arrays once, and every aggregate is computed vectorized over those columns.
+Attempt counts, pass rates and difficulty cover submitted attempts only; quizzes that were
+generated but never submitted (no score) are reported separately as `unsubmitted`.
+Results are cached per subject/grade for `analytics_cache_ttl_seconds`.
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from . import crud
+from .cache import MemoryBackend
+from .config import settings
+from .models import QUIZ_PASSING_SCORE, Lesson
+
+SCORE_BUCKETS = np.arange(0, 101, 10)  # 0-10, 10-20, ..., 90-100 (last bucket includes 100)
+PERCENTILES = (10, 25, 50, 75, 90)
+TIME_PERCENTILES = (50, 90, 95)
+
+_results = MemoryBackend(max_bytes=settings.analytics_cache_max_bytes)
+
+
+@dataclass
+class AttemptColumns:
+    """Quiz attempt summaries as parallel arrays; lessons and students are dictionary-encoded."""
+
+    lesson_ids: List[str]
+    student_ids: List[str]
+    lesson: np.ndarray  # int32 index into lesson_ids
+    student: np.ndarray  # int32 index into student_ids
+    score: np.ndarray  # float64, NaN for unfinished attempts
+    passed: np.ndarray  # bool
+    time_taken: np.ndarray  # float64 minutes, NaN when unknown
+
+    @classmethod
+    def from_summaries(cls, summaries) -> "AttemptColumns":
+        lesson_codes: Dict[str, int] = {}
+        student_codes: Dict[str, int] = {}
+        lesson, student, score, passed, time_taken = [], [], [], [], []
+        for attempt in summaries:
+            lesson.append(lesson_codes.setdefault(attempt.lesson_id, len(lesson_codes)))
+            student.append(student_codes.setdefault(attempt.student_id, len(student_codes)))
+            score.append(np.nan if attempt.score is None else attempt.score)
+            passed.append(bool(attempt.passed))
+            time_taken.append(np.nan if attempt.time_taken_minutes is None else attempt.time_taken_minutes)
+        return cls(
+            lesson_ids=list(lesson_codes),
+            student_ids=list(student_codes),
+            lesson=np.asarray(lesson, dtype=np.int32),
+            student=np.asarray(student, dtype=np.int32),
+            score=np.asarray(score, dtype=np.float64),
+            passed=np.asarray(passed, dtype=bool),
+            time_taken=np.asarray(time_taken, dtype=np.float64),
+        )
+
+    @classmethod
+    def concatenate(cls, parts: List["AttemptColumns"]) -> "AttemptColumns":
+        """Merge per-subject columns; lesson codes are offset, student codes are remapped to one shared dictionary."""
+        if not parts:
+            return cls.from_summaries([])
+        offsets = np.cumsum([0] + [len(part.lesson_ids) for part in parts[:-1]])
+        student_codes: Dict[str, int] = {}
+        remaps = [np.asarray([student_codes.setdefault(s, len(student_codes)) for s in part.student_ids], dtype=np.int32) for part in parts]
+        return cls(
+            lesson_ids=[lesson_id for part in parts for lesson_id in part.lesson_ids],
+            student_ids=list(student_codes),
+            lesson=np.concatenate([part.lesson + offset for part, offset in zip(parts, offsets)]).astype(np.int32),
+            student=np.concatenate([remap[part.student] for part, remap in zip(parts, remaps)]).astype(np.int32),
+            score=np.concatenate([part.score for part in parts]),
+            passed=np.concatenate([part.passed for part in parts]),
+            time_taken=np.concatenate([part.time_taken for part in parts]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.lesson)
+
+    @property
+    def submitted(self) -> np.ndarray:
+        """Attempts that were submitted, and so scored; the others were abandoned, not failed."""
+        return ~np.isnan(self.score)
+
+
+def _round(value, digits: int = 2) -> Optional[float]:
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def _percentiles(values: np.ndarray, percentiles) -> Dict[str, Optional[float]]:
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {f"p{p}": None for p in percentiles}
+    return {f"p{p}": _round(v) for p, v in zip(percentiles, np.percentile(values, percentiles))}
+
+
+def _per_lesson(columns: AttemptColumns, titles: Dict[str, str]) -> List[dict]:
+    n_lessons = len(columns.lesson_ids)
+    submitted = columns.submitted
+    attempts = np.bincount(columns.lesson[submitted], minlength=n_lessons)
+    unsubmitted = np.bincount(columns.lesson[~submitted], minlength=n_lessons)
+    passes = np.bincount(columns.lesson[submitted], weights=columns.passed[submitted], minlength=n_lessons)
+    score_sums = np.bincount(columns.lesson[submitted], weights=columns.score[submitted], minlength=n_lessons)
+
+    timed = ~np.isnan(columns.time_taken)
+    timed_attempts = np.bincount(columns.lesson[timed], minlength=n_lessons)
+    time_sums = np.bincount(columns.lesson[timed], weights=columns.time_taken[timed], minlength=n_lessons)
+
+    # Distinct students per lesson: sort the (lesson, student) pairs and count the first of each run
+    n_students = max(len(columns.student_ids), 1)
+    pairs = np.sort(columns.lesson.astype(np.int64) * n_students + columns.student)
+    first = np.ones(len(pairs), dtype=bool)
+    first[1:] = pairs[1:] != pairs[:-1]
+    students = np.bincount(pairs[first] // n_students, minlength=n_lessons)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pass_rate = passes / attempts
+        avg_score = score_sums / attempts
+        avg_time = time_sums / timed_attempts
+
+    # Hardest lessons first: lowest pass rate, then lowest average score
+    order = np.lexsort((np.nan_to_num(avg_score, nan=np.inf), np.nan_to_num(pass_rate, nan=np.inf)))
+    return [
+        {
+            "lesson_id": columns.lesson_ids[i],
+            "lesson_title": titles.get(columns.lesson_ids[i]),
+            "attempts": int(attempts[i]),
+            "unsubmitted": int(unsubmitted[i]),
+            "students": int(students[i]),
+            "pass_rate": _round(pass_rate[i], 4),
+            "avg_score": _round(avg_score[i]),
+            "avg_time_taken_minutes": _round(avg_time[i]),
+            "difficulty": _round(1 - pass_rate[i], 4),
+        }
+        for i in order
+    ]
+
+
+def summarize(columns: AttemptColumns, titles: Optional[Dict[str, str]] = None) -> dict:
+    """All cohort aggregates for a set of attempts."""
+    submitted = columns.submitted
+    scores = columns.score[submitted]
+    histogram, _ = np.histogram(scores, bins=SCORE_BUCKETS)
+    return {
+        "attempts": int(submitted.sum()),
+        "unsubmitted": int(len(columns) - submitted.sum()),
+        "students": len(columns.student_ids),
+        "lessons": len(columns.lesson_ids),
+        "pass_rate": _round(columns.passed[submitted].mean(), 4) if len(scores) else None,
+        "passing_score": QUIZ_PASSING_SCORE,
+        "score": {
+            "mean": _round(scores.mean()) if len(scores) else None,
+            "std": _round(scores.std()) if len(scores) else None,
+            **_percentiles(scores, PERCENTILES),
+            "histogram": [
+                {"min": int(low), "max": int(high), "count": int(count)} for low, high, count in zip(SCORE_BUCKETS[:-1], SCORE_BUCKETS[1:], histogram)
+            ],
+        },
+        "time_taken_minutes": _percentiles(columns.time_taken, TIME_PERCENTILES),
+        "per_lesson": _per_lesson(columns, titles or {}),
+    }
+
+
+def _lesson_titles(subject_id: str) -> Dict[str, str]:
+    return {lesson.id: lesson.title for lesson in Lesson.subject_index.query(subject_id, attributes_to_get=["id", "title"])}
+
+
+def _cached(key: str, compute) -> dict:
+    payload = _results.get(key)
+    if payload is not None:
+        return json.loads(payload)
+    result = compute()
+    _results.set(key, json.dumps(result).encode(), settings.analytics_cache_ttl_seconds)
+    return result
+
+
+def subject_analytics(subject_id: str) -> dict:
+    def compute():
+        columns = AttemptColumns.from_summaries(crud.crud_quiz.get_summaries_by_subject(subject_id))
+        return {"subject_id": subject_id, **summarize(columns, _lesson_titles(subject_id))}
+
+    return _cached(f"subject:{subject_id}", compute)
+
+
+def grade_analytics(grade_level: int) -> dict:
+    def compute():
+        subjects = crud.crud_subject.get_by_grade(grade_level)
+        parts, titles = [], {}
+        for subject in subjects:
+            parts.append(AttemptColumns.from_summaries(crud.crud_quiz.get_summaries_by_subject(subject.id)))
+            titles.update(_lesson_titles(subject.id))
+        return {"grade_level": grade_level, "subjects": len(subjects), **summarize(AttemptColumns.concatenate(parts), titles)}
+
+    return _cached(f"grade:{grade_level}", compute)
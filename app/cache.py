@@ -0,0 +1,157 @@
+"""
+Read-through cache for catalog queries (subjects by grade, lessons by subject and language).
+
+Entries are stored as serialized DynamoDB items so that the in-process backend can bound its
+memory exactly and the same payloads can be shared through Redis between instances.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Type, TypeVar
+
+from pynamodb.models import Model
+
+from .config import settings
+from .models import LanguageChoicesEnum
+
+logger = logging.getLogger(__name__)
+
+ModelType = TypeVar("ModelType", bound=Model)
+
+
+class MemoryBackend:
+    """LRU with per-entry expiry, bounded by the total size of the stored payloads."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple[float, bytes]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, key: str, payload: bytes, ttl: int) -> None:
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (time.monotonic() + ttl, payload)
+            self._size += len(payload)
+            while self._size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _pop(self, key: str) -> None:
+        _, payload = self._entries.pop(key)
+        self._size -= len(payload)
+
+
+class RedisBackend:
+    """Shared backend so invalidations reach every instance. Requires the `redis` package."""
+
+    def __init__(self, url: str, namespace: str = "khaneducation:catalog:"):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._namespace = namespace
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(self._namespace + key)
+
+    def set(self, key: str, payload: bytes, ttl: int) -> None:
+        self._client.set(self._namespace + key, payload, ex=ttl)
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self._client.delete(*(self._namespace + key for key in keys))
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter(match=self._namespace + "*"):
+            self._client.delete(key)
+
+
+class CatalogCache:
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def subjects_key(grade_level: int) -> str:
+        return f"subjects:grade:{grade_level}"
+
+    @staticmethod
+    def lessons_key(subject_id: str, language: str) -> str:
+        return f"lessons:{subject_id}:{language}"
+
+    def get_or_load(self, key: str, model: Type[ModelType], loader: Callable[[], List[ModelType]]) -> List[ModelType]:
+        try:
+            payload = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Catalog cache read failed for {key}: {e}")
+            payload = None
+        if payload is not None:
+            return [model.from_raw_data(item) for item in json.loads(payload)]
+
+        items = loader()
+        try:
+            payload = json.dumps([item.serialize(null_check=False) for item in items], separators=(",", ":")).encode()
+            self.backend.set(key, payload, self.ttl)
+        except Exception as e:
+            logger.warning(f"Catalog cache write failed for {key}: {e}")
+        return items
+
+    def invalidate_grade(self, *grade_levels: int) -> None:
+        self._delete(*(self.subjects_key(grade) for grade in set(grade_levels) if grade is not None))
+
+    def invalidate_lessons(self, subject_id: str, language: Optional[str] = None) -> None:
+        """Drop cached lesson lists for a subject, for one language or all of them."""
+        languages = [language] if language else [lang.value for lang in LanguageChoicesEnum]
+        self._delete(*(self.lessons_key(subject_id, lang) for lang in languages))
+
+    def clear(self) -> None:
+        try:
+            self.backend.clear()
+        except Exception as e:
+            logger.warning(f"Catalog cache clear failed: {e}")
+
+    def _delete(self, *keys: str) -> None:
+        try:
+            self.backend.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Catalog cache invalidation failed for {keys}: {e}")
+
+
+def _create_backend():
+    if settings.cache_redis_url:
+        try:
+            return RedisBackend(settings.cache_redis_url)
+        except ImportError:
+            logger.warning("CACHE_REDIS_URL is set but the redis package is not installed, using the in-process cache")
+    return MemoryBackend(max_bytes=settings.catalog_cache_max_bytes)
+
+
+catalog_cache = CatalogCache(_create_backend(), ttl=settings.catalog_cache_ttl_seconds)
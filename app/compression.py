@@ -0,0 +1,61 @@
+"""
+Compact binary encoding for large text attributes.
+
+Every blob starts with a one byte codec marker so the format can change without a
+rewrite of existing items:
+
+    0x00  raw UTF-8 (used when compression would not make the value smaller)
+    0x01  zlib
+    0x02  zstd
+"""
+
+import zlib
+
+from .config import settings
+
+try:  # Python 3.14+
+    from compression import zstd as _zstd
+
+    _zstd_compress, _zstd_decompress = _zstd.compress, _zstd.decompress
+except ImportError:
+    try:
+        import zstandard as _zstd
+
+        _zstd_compress = lambda data: _zstd.ZstdCompressor().compress(data)  # noqa: E731
+        _zstd_decompress = lambda data: _zstd.ZstdDecompressor().decompress(data)  # noqa: E731
+    except ImportError:
+        _zstd = None
+
+RAW = b"\x00"
+ZLIB = b"\x01"
+ZSTD = b"\x02"
+
+ZLIB_LEVEL = 6
+
+
+def compress_text(text: str, codec: str = None) -> bytes:
+    codec = codec or settings.content_compression
+    raw = text.encode("utf-8")
+    if codec == "zstd" and _zstd is not None:
+        marker, compressed = ZSTD, _zstd_compress(raw)
+    elif codec in ("zlib", "zstd"):
+        marker, compressed = ZLIB, zlib.compress(raw, ZLIB_LEVEL)
+    else:
+        return RAW + raw
+
+    if len(compressed) >= len(raw):
+        return RAW + raw
+    return marker + compressed
+
+
+def decompress_text(blob: bytes) -> str:
+    marker, payload = blob[:1], blob[1:]
+    if marker == RAW:
+        return payload.decode("utf-8")
+    if marker == ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+    if marker == ZSTD:
+        if _zstd is None:
+            raise RuntimeError("zstd-compressed value found but no zstd implementation is installed")
+        return _zstd_decompress(payload).decode("utf-8")
+    raise ValueError(f"Unknown compression marker {marker!r}")
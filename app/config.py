@@ -1,5 +1,7 @@
+import os
+import tempfile
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -13,8 +15,105 @@ class Settings(BaseSettings):
     aws_region: str = "us-east-1"
 
     gemini_api_key: str
+    # OpenAI-compatible endpoint for all LLM calls; point it at a stand-in for local load tests
+    llm_base_url: str = "https://generativelanguage.googleapis.com/v1beta/openai/"
 
-    # dynamodb_endpoint_url: str
+    # "database" re-reads the user on every request; "claims" trusts the signed token claims and
+    # checks an in-memory revocation list refreshed from DynamoDB (see app/revocation.py). Student
+    # routes read the student profile in both modes
+    auth_mode: str = "database"
+    claims_token_expire_minutes: int = 15
+    revocation_refresh_seconds: int = 30
+
+    # bcrypt cost factor; stored hashes with a different cost are rehashed on the next login
+    bcrypt_rounds: int = 12
+
+    # Codec for large text attributes such as Lesson.content: "zlib", "zstd" or "none"
+    content_compression: str = "zlib"
+
+    # Catalog (subjects by grade, lessons by subject+language) read-through cache
+    catalog_cache_ttl_seconds: int = 300
+    catalog_cache_max_bytes: int = 8 * 1024 * 1024
+    cache_redis_url: Optional[str] = None  # shared backend, needs the redis package
+
+    dynamodb_endpoint_url: Optional[str] = None  # e.g. http://localhost:8000 for DynamoDB Local
+
+    # Lambda function invoked asynchronously to run post-response tasks (see app/tasks.py);
+    # defaults to the current function on Lambda, elsewhere tasks run in-process after the response
+    tasks_function_name: Optional[str] = None
+
+    # Shared DynamoDB client tuning (see app/db.py)
+    dynamodb_max_pool_connections: int = 50
+    dynamodb_connect_timeout_seconds: float = 2
+    dynamodb_read_timeout_seconds: float = 5
+    dynamodb_max_retry_attempts: int = 3
+    dynamodb_retry_mode: str = "adaptive"
+    dynamodb_tcp_keepalive: bool = True
+    dynamodb_return_consumed_capacity: bool = True  # ask every call for its consumed capacity (see app/metrics.py)
+
+    # Per-route metrics (see app/metrics.py); request logs default to on under Lambda
+    metrics_enabled: bool = True
+    metrics_log_requests: Optional[bool] = None
+    metrics_token: Optional[str] = None  # GET /metrics needs "Authorization: Bearer <token>"; unset, it returns 404
+
+    # N+1 detector (see app/querycount.py): warn about requests making more DynamoDB calls than the
+    # threshold; on by default in debug mode
+    query_guard_enabled: Optional[bool] = None
+    query_guard_threshold: int = 25
+
+    # Admin exports (see app/export.py) are written to S3 and downloaded through presigned URLs
+    export_s3_bucket: Optional[str] = None
+    export_s3_prefix: str = "exports/"
+    export_step_seconds: int = 20  # per Lambda invocation; longer exports continue in the next one
+    export_url_expire_seconds: int = 3600
+
+    # Admin cohort analytics results (see app/analytics.py)
+    analytics_cache_ttl_seconds: int = 300
+    analytics_cache_max_bytes: int = 4 * 1024 * 1024
+
+    # Token-bucket limits for the LLM-backed endpoints (see app/ratelimit.py), "<requests>/<second|minute|hour>"
+    # per user by role ("default" for roles not listed) and for all users together ("global")
+    rate_limit_enabled: bool = True
+    rate_limit_redis_url: Optional[str] = None  # shared buckets across instances, needs the redis package
+    rate_limits: Dict[str, Dict[str, str]] = {
+        "ai_assist": {"student": "20/minute", "default": "60/minute", "global": "600/minute"},
+        "quiz_start": {"student": "6/minute", "default": "30/minute", "global": "300/minute"},
+        "quiz_submit": {"student": "10/minute", "default": "30/minute", "global": "300/minute"},
+    }
+
+    # AI assistant input (see app/ai/context.py), in estimated tokens
+    assistant_input_budget_tokens: int = 4000  # system prompt plus conversation
+    assistant_lesson_budget_tokens: int = 2000  # lesson content inside the system prompt
+    assistant_summary_budget_tokens: int = 300  # summary of the turns that no longer fit
+    assistant_min_message_tokens: int = 500  # the latest message is never cut below this
+    assistant_context_cache_ttl_seconds: int = 600
+    assistant_context_cache_max_bytes: int = 4 * 1024 * 1024
+    # Server-side sessions (see app/ai/sessions.py)
+    assistant_session_ttl_seconds: int = 2 * 3600  # idle time after which a session expires
+    assistant_session_history_tokens: int = 3000  # turns kept verbatim; older ones are summarized
+
+    # Lesson passage retrieval for the AI assistant (see app/ai/retrieval.py)
+    retrieval_enabled: bool = True
+    retrieval_top_k: int = 4
+    retrieval_chunk_tokens: int = 200
+    retrieval_min_score: float = 0.15  # cosine similarity below which a passage is not sent
+    retrieval_lesson_boost: float = 0.05  # added to the scores of the lesson the student is on
+    retrieval_cache_ttl_seconds: int = 300
+    retrieval_cache_max_bytes: int = 32 * 1024 * 1024
+
+    # Full-text search over lessons and subjects (see app/search.py)
+    search_enabled: bool = True
+    # Shared segment built by manage.py build-search-index; without a bucket the local path is the index
+    search_s3_bucket: Optional[str] = None
+    search_s3_key: str = "search/index.seg"
+    search_index_path: str = os.path.join(tempfile.gettempdir(), "khaneducation_search.idx")  # local copy of the S3 segment
+    search_merge_threshold: int = 50  # changed documents kept in memory before a new segment is published
+    search_reload_seconds: int = 30  # how often to check for a segment published by another process
+
+    # Warmup during Lambda init / server startup (see app/warmup.py)
+    warmup_enabled: bool = True
+    warmup_budget_seconds: float = 5.0
+    warmup_grade_levels: List[int] = list(range(1, 13))  # catalog cache entries to prime
 
     class Config:
         env_file = ".env"
@@ -4,5 +4,6 @@ from .main import (
     crud_student as crud_student,
     crud_practice_task as crud_practice_task,
     crud_quiz as crud_quiz,
+    crud_quiz_attempt_counter as crud_quiz_attempt_counter,
     crud_user as crud_user,
 )
@@ -4,6 +4,7 @@ from pynamodb.exceptions import DoesNotExist, PutError, UpdateError, DeleteError
 from fastapi import HTTPException, status
 import logging
 from typing import Type, TypeVar, Generic, List, Optional, Any
+from ..pagination import Page, encode_cursor, decode_cursor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -39,6 +40,26 @@ class CRUDBase(Generic[ModelType]):
         """
         raise NotImplementedError("This method should be overridden in subclasses with efficient query logic.")
 
+    def paginate(self, source: Any, operation: str, *args, limit: Optional[int] = None, cursor: Optional[str] = None, **kwargs) -> Page[ModelType]:
+        """
+        Run `source.<operation>` (a query or scan on the model or one of its indexes) for at most
+        `limit` items, resuming from `cursor`. The returned page carries a signed cursor for the
+        next page, or None once the results are exhausted.
+        """
+        index_name = getattr(source.Meta, "index_name", "") if source is not self.model else ""
+        scope = f"{self.model.Meta.table_name}:{index_name}:{operation}"
+        try:
+            last_evaluated_key = decode_cursor(cursor, scope)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        try:
+            results = getattr(source, operation)(*args, limit=limit, page_size=limit, last_evaluated_key=last_evaluated_key, **kwargs)
+            items = list(results)
+            return Page(items=items, next_cursor=encode_cursor(results.last_evaluated_key, scope))
+        except Exception as e:
+            logger.error(f"Error paginating {scope} with args {args}: {e}")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
 
     def create(self, obj_in_data: dict) -> ModelType:
         """Create a new item."""
@@ -1,10 +1,17 @@
 # app/crud/main.py
-from ..models import User, Subject, Lesson, Student, PracticeTask, Quiz, Notification
+from ..models import User, Subject, Lesson, Student, PracticeTask, Quiz, QuizAttemptCounter, Notification
 from .base import CRUDBase
+from pynamodb.exceptions import UpdateError
 from typing import List, Optional, Iterator
 from pynamodb.pagination import ResultIterator
+from ..pagination import Page
+from ..cache import catalog_cache
+from ..revocation import revocation_list
+from ..ai.context import invalidate_lesson_context
+from .. import tasks
 
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,8 +20,8 @@ logger = logging.getLogger(__name__)
 class CRUDUser(CRUDBase[User]):
     def get_by_email(self, email: str) -> Optional[User]:
         try:
-            results = list(self.model.email_index.query(email))
-            return results[0] if results else None
+            # The email index projects all attributes, so this single query returns the full user
+            return next(iter(self.model.email_index.query(email, limit=1)), None)
         except Exception as e:
             logger.error(f"Error fetching user by email {email}: {e}")
             raise HTTPException(status_code=500, detail="Database error")
@@ -27,39 +34,122 @@ class CRUDUser(CRUDBase[User]):
             logger.error(f"Error fetching user by username {username}: {e}")
             raise HTTPException(status_code=500, detail="Database error")
 
-    def get_multi(self, limit: int = 100) -> List[User]:
+    def get_multi(self, limit: int = 100, cursor: Optional[str] = None) -> Page[User]:
+        return self.paginate(self.model, "scan", limit=limit, cursor=cursor)
+
+    def update(self, db_obj: User, obj_in_data: dict) -> User:
+        db_obj = super().update(db_obj, obj_in_data)
+        # Outstanding tokens carry the old role and profile claims
+        self.revoke_tokens(db_obj.id)
+        return db_obj
+
+    def remove(self, db_obj: User) -> User:
+        db_obj = super().remove(db_obj)
+        self.revoke_tokens(db_obj.id)
+        return db_obj
+
+    def revoke_tokens(self, user_id: str) -> None:
         try:
-            return list(self.model.scan(limit=limit))
+            revocation_list.revoke(user_id)
         except Exception as e:
-            logger.error(f"Error fetching multiple users: {e}")
-            raise HTTPException(status_code=500, detail="Database error")
+            logger.error(f"Error revoking tokens for user {user_id}: {e}")
+            raise HTTPException(status_code=500, detail="Could not revoke user tokens")
 
 
 class CRUDSubject(CRUDBase[Subject]):
     def get_by_grade(self, grade_level: int) -> List[Subject]:
         try:
-            return list(self.model.grade_level_index.query(grade_level))
+            return catalog_cache.get_or_load(
+                catalog_cache.subjects_key(grade_level), self.model, lambda: list(self.model.grade_level_index.query(grade_level))
+            )
         except Exception as e:
             logger.error(f"Error fetching subjects by grade and language: {e}")
             raise HTTPException(status_code=500, detail="Database error")
-    def get_multi(self, limit: int = 100) -> List[Subject]:
-        try:
-            return list(self.model.scan(limit=limit))
-        except Exception as e:
-            logger.error(f"Error fetching multiple subjects: {e}")
-            raise HTTPException(status_code=500, detail="Database error")
+
+    def get_multi(self, limit: int = 100, cursor: Optional[str] = None) -> Page[Subject]:
+        return self.paginate(self.model, "scan", limit=limit, cursor=cursor)
+
+    def create(self, obj_in_data: dict) -> Subject:
+        db_obj = super().create(obj_in_data)
+        catalog_cache.invalidate_grade(db_obj.grade_level)
+        _index_subject(db_obj)
+        return db_obj
+
+    def update(self, db_obj: Subject, obj_in_data: dict) -> Subject:
+        old_grade_level = db_obj.grade_level
+        db_obj = super().update(db_obj, obj_in_data)
+        catalog_cache.invalidate_grade(old_grade_level, db_obj.grade_level)
+        _index_subject(db_obj)
+        return db_obj
+
+    def remove(self, db_obj: Subject) -> Subject:
+        db_obj = super().remove(db_obj)
+        catalog_cache.invalidate_grade(db_obj.grade_level)
+        catalog_cache.invalidate_lessons(db_obj.id)
+        _unindex_subject(db_obj)
+        return db_obj
+
+
+# Changes to these fields rebuild the lesson's retrieval passages / search document
+RETRIEVAL_FIELDS = {"content", "title", "subject_id", "language"}
+SEARCH_FIELDS = {"content", "title", "subject_id", "language", "tags", "summary", "status"}
+
+
+# numpy is imported with app.ai.retrieval and app.search on the first catalog write, not at cold start
+def _index_lesson(lesson: Lesson, changed: Optional[set] = None, previous_subject_id: Optional[str] = None) -> None:
+    from ..ai import retrieval
+    from .. import search
+
+    if changed is None or RETRIEVAL_FIELDS & changed:
+        retrieval.index_lesson(lesson, previous_subject_id)
+    if changed is None or SEARCH_FIELDS & changed:
+        search.index_lesson(lesson)
+
+
+def _unindex_lesson(lesson: Lesson) -> None:
+    from ..ai import retrieval
+    from .. import search
+
+    retrieval.remove_lesson(lesson.subject_id, lesson.id)
+    search.remove(search.LESSON, lesson.id)
+
+
+# Publishes lesson and subject changes to the shared search index from a Lambda task (see app/search.py);
+# registered here because app.search, and numpy with it, is only imported on first use
+SEARCH_UPDATE_TASK = "search_update"
+
+
+@tasks.task(SEARCH_UPDATE_TASK)
+async def update_search_documents(keys: List[str]) -> None:
+    from .. import search
+
+    await run_in_threadpool(search.update_documents, keys)
+
+
+def _index_subject(subject: Subject) -> None:
+    from .. import search
+
+    search.index_subject(subject)
+
+
+def _unindex_subject(subject: Subject) -> None:
+    from .. import search
+
+    search.remove(search.SUBJECT, subject.id)
 
 
 class CRUDLesson(CRUDBase[Lesson]):
-    def get_by_subject(self, subject_id: str) -> List[Lesson]:
-        try:
-            return list(self.model.subject_index.query(subject_id))
-        except Exception as e:
-            logger.error(f"Error fetching lessons for subject {subject_id}: {e}")
-            raise HTTPException(status_code=500, detail="Database error")
+    def get_by_subject(self, subject_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Page[Lesson]:
+        return self.paginate(self.model.subject_index, "query", subject_id, limit=limit, cursor=cursor)
 
     def get_by_subject_and_language(self, subject_id: str, language: str, attributes_to_get: List[str] = None) -> Optional[List[Lesson]]:
         try:
+            if attributes_to_get is None:
+                return catalog_cache.get_or_load(
+                    catalog_cache.lessons_key(subject_id, language),
+                    self.model,
+                    lambda: list(self.model.subject_and_language_index.query(subject_id, Lesson.language == language)),
+                )
             return list(self.model.subject_and_language_index.query(subject_id, Lesson.language == language, attributes_to_get=attributes_to_get))
         except Lesson.DoesNotExist:
             return None
@@ -67,12 +157,34 @@ class CRUDLesson(CRUDBase[Lesson]):
             logger.error(f"Error fetching lessons for subject {subject_id} and language {language}: {e}")
             raise HTTPException(status_code=500, detail="Database error")
 
-    def get_by_instructor(self, instructor_id: str) -> List[Lesson]:
-        try:
-            return list(self.model.instructor_index.query(instructor_id))
-        except Exception as e:
-            logger.error(f"Error fetching lessons for instructor {instructor_id}: {e}")
-            raise HTTPException(status_code=500, detail="Database error")
+    def get_by_instructor(self, instructor_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Page[Lesson]:
+        return self.paginate(self.model.instructor_index, "query", instructor_id, limit=limit, cursor=cursor)
+
+    def create(self, obj_in_data: dict) -> Lesson:
+        db_obj = super().create(obj_in_data)
+        catalog_cache.invalidate_lessons(db_obj.subject_id, db_obj.language)
+        _index_lesson(db_obj)
+        return db_obj
+
+    def update(self, db_obj: Lesson, obj_in_data: dict) -> Lesson:
+        old_subject_id, old_language = db_obj.subject_id, db_obj.language
+        db_obj = super().update(db_obj, obj_in_data)
+        catalog_cache.invalidate_lessons(old_subject_id, old_language)
+        catalog_cache.invalidate_lessons(db_obj.subject_id, db_obj.language)
+        invalidate_lesson_context(db_obj.id)
+        _index_lesson(db_obj, set(obj_in_data), old_subject_id)
+        return db_obj
+
+    def reindex(self, db_obj: Lesson) -> None:
+        """Refresh the retrieval passages and search document of a lesson written without `update`."""
+        _index_lesson(db_obj)
+
+    def remove(self, db_obj: Lesson) -> Lesson:
+        db_obj = super().remove(db_obj)
+        catalog_cache.invalidate_lessons(db_obj.subject_id, db_obj.language)
+        invalidate_lesson_context(db_obj.id)
+        _unindex_lesson(db_obj)
+        return db_obj
 
 
 class CRUDStudent(CRUDBase[Student]):
@@ -93,12 +205,8 @@ class CRUDStudent(CRUDBase[Student]):
 
 
 class CRUDPracticeTask(CRUDBase[PracticeTask]):
-    def get_by_lesson(self, lesson_id: str) -> List[PracticeTask]:
-        try:
-            return list(self.model.lesson_index.query(lesson_id))
-        except Exception as e:
-            logger.error(f"Error fetching practice tasks for lesson {lesson_id}: {e}")
-            raise HTTPException(status_code=500, detail="Database error")
+    def get_by_lesson(self, lesson_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Page[PracticeTask]:
+        return self.paginate(self.model.lesson_index, "query", lesson_id, limit=limit, cursor=cursor)
 
 
 class CRUDQuiz(CRUDBase[Quiz]):
@@ -110,13 +218,21 @@ class CRUDQuiz(CRUDBase[Quiz]):
             logger.error(f"Error fetching quiz attempts for student {student_id}: {e}")
             raise HTTPException(status_code=500, detail="Database error")
 
-    def get_by_lesson_student(self, lesson_id: str, student_id: str, attributes_to_get: List[str] = None) -> List[Quiz]:
-        try:
-            quizzes = list(self.model.lesson_student_index.query(lesson_id, Quiz.student_id == student_id, attributes_to_get=attributes_to_get))
-            return quizzes
-        except Exception as e:
-            logger.error(f"Error fetching quiz attempts for student {student_id}: {e}")
-            raise HTTPException(status_code=500, detail="Database error")
+    def get_by_lesson(self, lesson_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Page[Quiz]:
+        return self.paginate(self.model.lesson_student_index, "query", lesson_id, limit=limit, cursor=cursor)
+
+    def get_by_lesson_student(
+        self, lesson_id: str, student_id: str, attributes_to_get: List[str] = None, limit: Optional[int] = None, cursor: Optional[str] = None
+    ) -> Page[Quiz]:
+        return self.paginate(
+            self.model.lesson_student_index,
+            "query",
+            lesson_id,
+            Quiz.student_id == student_id,
+            attributes_to_get=attributes_to_get,
+            limit=limit,
+            cursor=cursor,
+        )
 
     def get_by_subject_student(self, subject_id: str, student_id: str, attributes_to_get: List[str] = None) -> ResultIterator[Quiz]:
         try:
@@ -126,6 +242,55 @@ class CRUDQuiz(CRUDBase[Quiz]):
             logger.error(f"Error fetching quiz attempts for student {student_id}: {e}")
             raise HTTPException(status_code=500, detail="Database error")
 
+    def get_summaries_by_subject_student(self, subject_id: str, student_id: str) -> List[Quiz]:
+        """Attempts projected to QUIZ_SUMMARY_ATTRIBUTES only (no questions, responses or feedback)."""
+        try:
+            return list(self.model.summary_subject_student_index.query(subject_id, Quiz.student_id == student_id))
+        except Exception as e:
+            logger.error(f"Error fetching quiz summaries for student {student_id} in subject {subject_id}: {e}")
+            raise HTTPException(status_code=500, detail="Database error")
+
+    def get_summaries_by_subject(self, subject_id: str) -> ResultIterator[Quiz]:
+        """All students' attempt summaries for a subject, streamed page by page."""
+        try:
+            return self.model.summary_subject_student_index.query(subject_id)
+        except Exception as e:
+            logger.error(f"Error fetching quiz summaries for subject {subject_id}: {e}")
+            raise HTTPException(status_code=500, detail="Database error")
+
+
+class CRUDQuizAttemptCounter(CRUDBase[QuizAttemptCounter]):
+    def increment(self, student_id: str, lesson_id: str, limit: int) -> int:
+        """
+        Claim the next attempt with one conditional update and return its quiz version; raises ValueError
+        once the limit is reached. Versions only ever grow, so a slot given back by decrement() is reused
+        for the limit but never for the version number.
+        """
+        counter = self.model(student_id, lesson_id)
+        # Counters written before versions existed number their quizzes from their attempts
+        claim = dict(
+            actions=[self.model.attempts.add(1), self.model.versions.set((self.model.versions | self.model.attempts) + 1)],
+            condition=self.model.attempts < limit,
+        )
+        create = dict(actions=[self.model.attempts.add(1), self.model.versions.add(1)], condition=self.model.attempts.does_not_exist())
+        # A failed claim means the limit is reached or there is no counter yet; a failed create means
+        # a concurrent request created it first, so the claim gets one more try
+        for update in (claim, create, claim):
+            try:
+                counter.update(**update)
+                return int(counter.versions)
+            except UpdateError as e:
+                if e.cause_response_code != "ConditionalCheckFailedException":
+                    logger.error(f"Error incrementing quiz attempts for student {student_id}, lesson {lesson_id}: {e}")
+                    raise HTTPException(status_code=500, detail="Database error")
+        raise ValueError(f"Quiz attempt limit reached for lesson {lesson_id} ({limit} attempts only).")
+
+    def decrement(self, student_id: str, lesson_id: str) -> None:
+        """Give back an attempt claimed by increment() when the quiz could not be created."""
+        try:
+            self.model(student_id, lesson_id).update(actions=[self.model.attempts.add(-1)], condition=self.model.attempts > 0)
+        except UpdateError as e:
+            logger.error(f"Error releasing quiz attempt for student {student_id}, lesson {lesson_id}: {e}")
 
 
 # Instantiate CRUD objects
@@ -135,4 +300,5 @@ crud_lesson = CRUDLesson(Lesson)
 crud_student = CRUDStudent(Student)
 crud_practice_task = CRUDPracticeTask(PracticeTask)
 crud_quiz = CRUDQuiz(Quiz)
+crud_quiz_attempt_counter = CRUDQuizAttemptCounter(QuizAttemptCounter)
 crud_notification = CRUDBase(Notification)
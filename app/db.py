@@ -0,0 +1,175 @@
+"""
+Shared DynamoDB connection registry.
+
+PynamoDB gives every model its own botocore client (and HTTP pool) with library default
+timeouts. All models and transactions here share one tuned client per region/endpoint
+instead, and every call is timed into per-table latency histograms.
+"""
+
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import botocore.client
+from pynamodb.connection import Connection, TableConnection
+
+from .config import settings
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value_ms)] += 1
+            self.count += 1
+            self.total_ms += value_ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None past the last bound)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else None,
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": {**{f"le_{bound}": c for bound, c in zip(self.bounds, self.counts)}, "inf": self.counts[-1]},
+        }
+
+
+_histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def _histogram(table: str, operation: str) -> LatencyHistogram:
+    key = (table, operation)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(key, LatencyHistogram())
+    return histogram
+
+
+def _table_name(params: dict) -> str:
+    if "TableName" in params:
+        return params["TableName"]
+    if "RequestItems" in params:
+        return ",".join(sorted(params["RequestItems"]))
+    if "TransactItems" in params:
+        return ",".join(sorted({op["TableName"] for item in params["TransactItems"] for op in item.values()}))
+    return "-"
+
+
+# Operations that accept ReturnConsumedCapacity
+_CAPACITY_OPERATIONS = {
+    "GetItem", "PutItem", "UpdateItem", "DeleteItem", "Query", "Scan",
+    "BatchGetItem", "BatchWriteItem", "TransactGetItems", "TransactWriteItems",
+}
+
+# Called after every call as listener(table, operation, duration_ms, parsed_response), see app/metrics.py
+_call_listeners: List[Callable[[str, str, float, Optional[dict]], None]] = []
+
+
+def add_call_listener(listener: Callable[[str, str, float, Optional[dict]], None]) -> None:
+    _call_listeners.append(listener)
+
+
+def _before_call(params, model, context, **_):
+    if settings.dynamodb_return_consumed_capacity and model.name in _CAPACITY_OPERATIONS:
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+    context["khaneducation_call"] = (_table_name(params), model.name, time.perf_counter())
+
+
+def _after_call(context, parsed=None, **_):
+    call = context.pop("khaneducation_call", None)
+    if call is not None:
+        table, operation, start = call
+        duration_ms = (time.perf_counter() - start) * 1000
+        _histogram(table, operation).observe(duration_ms)
+        for listener in _call_listeners:
+            listener(table, operation, duration_ms, parsed)
+
+
+def latency_snapshot() -> dict:
+    """Per table and operation latency summaries, e.g. {"khaneducation_lessons": {"GetItem": {...}}}."""
+    snapshot: Dict[str, dict] = {}
+    for (table, operation), histogram in sorted(_histograms.items()):
+        snapshot.setdefault(table, {})[operation] = histogram.snapshot()
+    return snapshot
+
+
+class TunedConnection(Connection):
+    """PynamoDB connection whose botocore client uses the app's pool, timeout, keep-alive and retry settings."""
+
+    @property
+    def client(self):
+        if not self._client or (self._client._request_signer and not self._client._request_signer._credentials):
+            config = botocore.client.Config(
+                parameter_validation=False,
+                connect_timeout=self._connect_timeout_seconds,
+                read_timeout=self._read_timeout_seconds,
+                max_pool_connections=self._max_pool_connections,
+                tcp_keepalive=settings.dynamodb_tcp_keepalive,
+                retries=self._retry_configuration,
+            )
+            self._client = self.session.create_client("dynamodb", self.region, endpoint_url=self.host, config=config)
+            self._client.meta.events.register_first("before-send.*.*", self._before_send)
+            self._client.meta.events.register("before-parameter-build.dynamodb", _before_call)
+            self._client.meta.events.register("after-call.dynamodb", _after_call)
+            self._client.meta.events.register("after-call-error.dynamodb", _after_call)
+        return self._client
+
+
+_connections: Dict[Tuple[str, Optional[str]], TunedConnection] = {}
+_connections_lock = threading.Lock()
+
+
+def get_connection(region: Optional[str] = None, host: Optional[str] = None) -> TunedConnection:
+    """The shared connection for a region/endpoint, created on first use."""
+    key = (region or settings.aws_region, host or settings.dynamodb_endpoint_url)
+    connection = _connections.get(key)
+    if connection is None:
+        with _connections_lock:
+            connection = _connections.get(key)
+            if connection is None:
+                connection = TunedConnection(
+                    region=key[0],
+                    host=key[1],
+                    connect_timeout_seconds=settings.dynamodb_connect_timeout_seconds,
+                    read_timeout_seconds=settings.dynamodb_read_timeout_seconds,
+                    max_retry_attempts=settings.dynamodb_max_retry_attempts,
+                    retry_configuration={"mode": settings.dynamodb_retry_mode, "total_max_attempts": 1 + settings.dynamodb_max_retry_attempts},
+                    max_pool_connections=settings.dynamodb_max_pool_connections,
+                )
+                _connections[key] = connection
+    return connection
+
+
+def share_connection(table_connection: TableConnection, region: Optional[str] = None, host: Optional[str] = None) -> TableConnection:
+    """Point a model's TableConnection at the shared connection for its region/endpoint."""
+    connection = get_connection(region, host)
+    if table_connection.connection is not connection:
+        with _connections_lock:
+            if table_connection.table_name not in connection._tables:
+                connection.add_meta_table(table_connection.get_meta_table())
+            table_connection.connection = connection
+    return table_connection
@@ -1,4 +1,5 @@
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
@@ -7,12 +8,14 @@ from .models import User, UserRoleEnum
 from .config import settings
 from .schemas import User as UserSchema, TokenData, Student as StudentSchema
 from . import crud
+from .revocation import revocation_list
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 SECRET_KEY = settings.secret_key
 ALGORITHM = settings.algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
+CLAIMS_AUTH = settings.auth_mode == "claims"
 
 
 def verify_access_token(token: str, credentials_exception):
@@ -30,11 +33,16 @@ def verify_access_token(token: str, credentials_exception):
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
+    now = datetime.now(timezone.utc)
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
+        expire = now + expires_delta
+    elif CLAIMS_AUTH:
+        # Claims are trusted until expiry, so keep tokens short-lived
+        expire = now + timedelta(minutes=settings.claims_token_expire_minutes)
     else:
-        expire = datetime.now(timezone.utc) + timedelta(days=30)
-    to_encode.update({"exp": expire})
+        expire = now + timedelta(days=30)
+    # Sub-second iat, so a login right after a revocation is not mistaken for an older token
+    to_encode.update({"exp": expire, "iat": now.timestamp()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -56,11 +64,27 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserSchema:
     except JWTError:
         raise credentials_exception
 
+    if CLAIMS_AUTH:
+        if revocation_list.is_stale():
+            await run_in_threadpool(revocation_list.refresh)
+        if revocation_list.is_revoked(user_id, payload.get("iat")) or payload.get("is_active") is False:
+            raise credentials_exception
+        return UserSchema(
+            id=user_id,
+            username=username,
+            first_name=payload.get("first_name"),
+            last_name=payload.get("last_name"),
+            email=email,
+            role=payload.get("role"),
+        )
+
     # Get user from PynamoDB
     try:
         user = User.get(hash_key=user_id)
     except User.DoesNotExist:
         raise credentials_exception
+    if user.is_active is False:
+        raise credentials_exception
 
     return UserSchema(
         id=user.id,
@@ -79,7 +103,8 @@ async def get_current_student(user: UserSchema = Depends(get_current_user)) -> S
             detail="Student profile required",
         )
 
-    # Verify student profile exists in PynamoDB
+    # Verify student profile exists in PynamoDB; read on every request in claims mode too, where
+    # only the user comes from the token
     student = crud.crud_student.get_by_user_id(user.id)
 
     if not student:
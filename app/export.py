@@ -0,0 +1,341 @@
+"""
+Streaming exports of DynamoDB tables for offline analysis.
+
+Rows flow through a generator pipeline (parallel scan pages -> row dicts -> chunk files), so
+memory stays bounded by one chunk. Chunks are gzip CSV, or Parquet when `pyarrow` is
+installed. After each chunk is written the scan positions of the pages it contains are
+checkpointed, so a rerun resumes after the last complete chunk instead of starting over.
+
+The admin endpoint runs the same pipeline as a post-response task (see app/tasks.py) that
+uploads each chunk and the checkpoint to S3. On Lambda it works in steps of
+`export_step_seconds`, each step an invocation that resumes from the S3 checkpoint, so no
+request or invocation holds a whole table; the finished export is a manifest of chunk keys
+that the status endpoint turns into presigned URLs.
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Type
+
+from pynamodb.models import Model
+
+from . import tasks
+from .config import settings
+from .models import Quiz, Student
+from .scan import ScanCheckpoint, ScanPage, parallel_scan
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {"csv": "csv.gz", "parquet": "parquet"}
+
+
+@dataclass
+class Dataset:
+    model: Type[Model]
+    columns: List[str]  # attributes read from the table, in output order
+
+    def to_row(self, item: Model) -> dict:
+        return {column: getattr(item, column, None) for column in self.columns}
+
+
+DATASETS: Dict[str, Dataset] = {
+    # Attempts with their outcome; questions, responses and feedback text are left out
+    "quizzes": Dataset(
+        model=Quiz,
+        columns=[
+            "id",
+            "student_id",
+            "subject_id",
+            "lesson_id",
+            "lesson_title",
+            "quiz_version",
+            "start_time",
+            "end_time",
+            "time_taken_minutes",
+            "score",
+            "passed",
+            "cheating_detected",
+            "feedback_status",
+        ],
+    ),
+    # Student progress: grade and language per student
+    "students": Dataset(model=Student, columns=["user_id", "current_grade", "language", "created_at", "updated_at"]),
+}
+
+
+@dataclass
+class ExportStats:
+    rows: int = 0
+    chunks: int = 0
+    bytes_written: int = 0
+    consumed_capacity: float = 0.0
+    started_at: float = field(default_factory=time.perf_counter)
+    files: List[str] = field(default_factory=list)
+    complete: bool = True  # False when the export stopped at its deadline
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+def _csv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _write_csv_chunk(path: str, columns: List[str], rows: List[dict]) -> None:
+    with open(path, "wb") as raw:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+        for data in _csv_gzip_stream(columns, [rows], compressor):
+            raw.write(data)
+
+
+def _write_parquet_chunk(path: str, columns: List[str], rows: List[dict]) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pylist(rows).select(columns)
+    pq.write_table(table, path, compression="zstd")
+
+
+def _csv_gzip_stream(columns: List[str], row_batches: Iterable[List[dict]], compressor=None) -> Iterator[bytes]:
+    """gzip-compressed CSV bytes for batches of rows, one flush per batch."""
+    compressor = compressor or zlib.compressobj(6, zlib.DEFLATED, 31)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in row_batches:
+        for row in rows:
+            writer.writerow([_csv_value(row.get(column)) for column in columns])
+        data = compressor.compress(buffer.getvalue().encode("utf-8"))
+        buffer.seek(0)
+        buffer.truncate()
+        if data:
+            yield data
+    data = compressor.compress(buffer.getvalue().encode("utf-8")) + compressor.flush()
+    if data:
+        yield data
+
+
+def check_format(fmt: str) -> None:
+    """Raise ValueError for an unknown format, or Parquet without pyarrow (the `parquet` extra)."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt}, expected one of {', '.join(FORMATS)}")
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet export needs the pyarrow package (install the parquet extra)")
+
+
+def export_dataset(
+    name: str,
+    out_dir: str,
+    fmt: str = "csv",
+    segments: int = 4,
+    rows_per_chunk: int = 100_000,
+    resume: bool = True,
+    on_page: Optional[Callable[[ScanPage, ExportStats], None]] = None,
+    on_flush: Optional[Callable[[Optional[str], str], None]] = None,
+    deadline: Optional[float] = None,
+) -> ExportStats:
+    """
+    Export a dataset to numbered chunk files in `out_dir` and return throughput stats.
+
+    Chunks end on page boundaries, so a chunk can exceed `rows_per_chunk` by up to one page
+    per segment. With `resume`, an existing checkpoint continues the previous run.
+    `on_flush(chunk_path, checkpoint_path)` runs after every checkpoint save (chunk_path is
+    None when the flushed pages were empty). Past `deadline` (time.monotonic()) the export
+    flushes what it has and returns with `complete` False; running it again resumes.
+    """
+    check_format(fmt)
+
+    dataset = DATASETS[name]
+    write_chunk = _write_parquet_chunk if fmt == "parquet" else _write_csv_chunk
+    os.makedirs(out_dir, exist_ok=True)
+
+    checkpoint_path = os.path.join(out_dir, f"{name}.checkpoint.json")
+    if not resume:
+        ScanCheckpoint(checkpoint_path, segments).remove()
+    checkpoint = ScanCheckpoint.load(checkpoint_path, segments)
+    checkpoint.state.setdefault("format", fmt)
+    if checkpoint.state["format"] != fmt:
+        raise ValueError(f"Checkpoint {checkpoint_path} belongs to a {checkpoint.state['format']} export")
+
+    stats = ExportStats(chunks=checkpoint.state.get("chunks", 0))
+    rows_before = checkpoint.state.get("rows", 0)
+    rows: List[dict] = []
+    pages: List[ScanPage] = []
+
+    def flush() -> None:
+        if not rows and not pages:
+            return
+        path = None
+        if rows:
+            path = os.path.join(out_dir, f"{name}-{stats.chunks:05d}.{FORMATS[fmt]}")
+            write_chunk(path, dataset.columns, rows)
+            stats.bytes_written += os.path.getsize(path)
+            stats.files.append(path)
+            stats.chunks += 1
+        # Only now are these pages durable; record their positions
+        for page in pages:
+            checkpoint.record(page)
+        checkpoint.state["chunks"] = stats.chunks
+        checkpoint.state["rows"] = rows_before + stats.rows
+        checkpoint.save()
+        if on_flush:
+            on_flush(path, checkpoint_path)
+        rows.clear()
+        pages.clear()
+
+    for page in parallel_scan(dataset.model, total_segments=segments, attributes_to_get=dataset.columns, checkpoint=checkpoint):
+        rows.extend(dataset.to_row(item) for item in page.items)
+        pages.append(page)
+        stats.rows += len(page.items)
+        stats.consumed_capacity += page.consumed_capacity
+        if on_page:
+            on_page(page, stats)
+        if len(rows) >= rows_per_chunk:
+            flush()
+        if deadline is not None and time.monotonic() >= deadline:
+            flush()
+            stats.complete = False
+            return stats
+    flush()
+    return stats
+
+
+EXPORT_TASK = "export"
+MANIFEST = "manifest.json"
+ERROR = "error.json"
+CHECKPOINT = "checkpoint.json"
+STARTED = "started.json"
+
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    import boto3
+
+    return boto3.client("s3", region_name=settings.aws_region)
+
+
+def _s3_prefix(name: str, export_id: str) -> str:
+    return f"{settings.export_s3_prefix}{name}/{export_id}/"
+
+
+def _read_json(key: str) -> Optional[dict]:
+    client = get_s3_client()
+    try:
+        return json.loads(client.get_object(Bucket=settings.export_s3_bucket, Key=key)["Body"].read())
+    except client.exceptions.NoSuchKey:
+        return None
+
+
+def _put_json(key: str, data: dict) -> None:
+    get_s3_client().put_object(Bucket=settings.export_s3_bucket, Key=key, Body=json.dumps(data).encode("utf-8"), ContentType="application/json")
+
+
+def new_export_id() -> str:
+    return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:8]}"
+
+
+def export_step_to_s3(name: str, export_id: str, fmt: str = "csv", segments: int = 4, step_seconds: Optional[float] = None) -> ExportStats:
+    """One step of an S3 export: resume from its S3 checkpoint, upload each chunk as it is written."""
+    prefix = _s3_prefix(name, export_id)
+    client = get_s3_client()
+    with tempfile.TemporaryDirectory() as out_dir:
+        checkpoint = _read_json(prefix + CHECKPOINT)
+        if checkpoint is not None:
+            with open(os.path.join(out_dir, f"{name}.checkpoint.json"), "w") as f:
+                json.dump(checkpoint, f)
+
+        def upload(chunk_path: Optional[str], checkpoint_path: str) -> None:
+            # Chunk before checkpoint: a step that dies in between rewrites the same chunk key
+            if chunk_path:
+                client.upload_file(chunk_path, settings.export_s3_bucket, prefix + os.path.basename(chunk_path))
+                os.remove(chunk_path)
+            client.upload_file(checkpoint_path, settings.export_s3_bucket, prefix + CHECKPOINT)
+
+        deadline = time.monotonic() + step_seconds if step_seconds else None
+        stats = export_dataset(name, out_dir, fmt=fmt, segments=segments, on_flush=upload, deadline=deadline)
+        if stats.complete:
+            with open(os.path.join(out_dir, f"{name}.checkpoint.json")) as f:
+                state = json.load(f)
+            _put_json(
+                prefix + MANIFEST,
+                {
+                    "dataset": name,
+                    "format": fmt,
+                    "rows": state.get("rows", 0),
+                    "files": [f"{name}-{chunk:05d}.{FORMATS[fmt]}" for chunk in range(state.get("chunks", 0))],
+                    "finished_at": datetime.now(timezone.utc).isoformat(),
+                },
+            )
+    return stats
+
+
+@tasks.task(EXPORT_TASK)
+async def run_s3_export(name: str, export_id: str, fmt: str = "csv", segments: int = 4) -> None:
+    """Export task; on Lambda each step is bounded by `export_step_seconds` and invokes the next."""
+    from fastapi.concurrency import run_in_threadpool
+
+    step_seconds = settings.export_step_seconds if tasks.dispatches_to_lambda() else None
+    try:
+        stats = await run_in_threadpool(export_step_to_s3, name, export_id, fmt, segments, step_seconds)
+    except Exception as e:
+        logger.error(f"Export {name}/{export_id} failed: {e}")
+        await run_in_threadpool(_put_json, _s3_prefix(name, export_id) + ERROR, {"error": str(e)})
+        return
+    if not stats.complete:
+        await run_in_threadpool(tasks.invoke, EXPORT_TASK, name=name, export_id=export_id, fmt=fmt, segments=segments)
+
+
+def export_status(name: str, export_id: str) -> Optional[dict]:
+    """Status of an S3 export, with presigned download URLs once it is ready; None if it does not exist."""
+    prefix = _s3_prefix(name, export_id)
+    manifest = _read_json(prefix + MANIFEST)
+    if manifest is not None:
+        client = get_s3_client()
+        urls = [
+            client.generate_presigned_url(
+                "get_object", Params={"Bucket": settings.export_s3_bucket, "Key": prefix + file}, ExpiresIn=settings.export_url_expire_seconds
+            )
+            for file in manifest["files"]
+        ]
+        return {"export_id": export_id, "status": "ready", "rows": manifest["rows"], "chunks": len(urls), "urls": urls}
+    error = _read_json(prefix + ERROR)
+    if error is not None:
+        return {"export_id": export_id, "status": "failed", "error": error["error"]}
+    checkpoint = _read_json(prefix + CHECKPOINT)
+    if checkpoint is None:
+        # The first chunk is not uploaded yet; the export exists if it was started
+        started = _read_json(prefix + STARTED)
+        return {"export_id": export_id, "status": "pending"} if started else None
+    return {"export_id": export_id, "status": "running", "rows": checkpoint.get("rows", 0), "chunks": checkpoint.get("chunks", 0)}
+
+
+def start_s3_export(background_tasks, name: str, fmt: str = "csv", segments: int = 4) -> str:
+    """Start an export of `name` to S3 after the response and return its id."""
+    # Rejected with the request rather than in the task
+    check_format(fmt)
+    export_id = new_export_id()
+    _put_json(_s3_prefix(name, export_id) + STARTED, {"dataset": name, "format": fmt, "segments": segments})
+    tasks.enqueue(background_tasks, EXPORT_TASK, name=name, export_id=export_id, fmt=fmt, segments=segments)
+    return export_id
@@ -0,0 +1,39 @@
+"""
+HTTP conditional caching helpers (ETag / If-None-Match / Cache-Control).
+"""
+
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response, status
+
+# Cache-Control policy per read-mostly route. Content only changes on admin edits, so
+# shared caches may serve it briefly and revalidate cheaply with the ETag afterwards.
+LESSON_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
+LESSON_TASKS_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
+SUBJECTS_CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=120"
+SUBJECT_CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=600"
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag from the values that identify a representation (ids, updated_at, ...)."""
+    digest = hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def set_cache_headers(response: Response, etag: str, cache_control: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
@@ -1,17 +1,47 @@
 # app/main.py
-from fastapi import FastAPI, Depends
+import asyncio
+import hmac
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from mangum import Mangum
 from .ai import generate_content as ai
+from .ai import context as ai_context
+from .ai import sessions as ai_sessions
 from . import schemas
 from . import routers
+from . import warmup
+from . import metrics
+from . import querycount
+from . import tasks
+from .config import settings
 from .dependencies import get_current_student
+from .pagination import NEXT_CURSOR_HEADER
+from .ratelimit import rate_limit
 
 # --- PynamoDB Import ---
-from .models import Subject, Lesson, Student  # Import models needed for AI context
+from .models import Student
 
-app = FastAPI(version="1.0.0")
+# On Lambda the warmup runs at import time, during the init phase (see the end of this module)
+ON_LAMBDA = "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.warmup_enabled and not ON_LAMBDA:
+        await run_in_threadpool(warmup.run, app)
+    yield
+    if settings.search_enabled:
+        from . import search
+
+        # Search index changes not published yet would be lost with the process
+        await run_in_threadpool(search.search_index.merge)
+
+
+app = FastAPI(version="1.0.0", lifespan=lifespan)
 origins = ["*"]
 app.add_middleware(
     CORSMiddleware,
@@ -19,7 +49,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "Retry-After"],
 )
+if settings.query_guard_enabled if settings.query_guard_enabled is not None else settings.debug:
+    app.add_middleware(querycount.QueryGuardMiddleware, threshold=settings.query_guard_threshold)
+if settings.metrics_enabled:
+    # Added last so it wraps everything, including CORS preflights and error responses
+    log_requests = settings.metrics_log_requests if settings.metrics_log_requests is not None else ON_LAMBDA
+    app.add_middleware(metrics.MetricsMiddleware, log_requests=log_requests)
 
 app.include_router(routers.user_profile.router)
 app.include_router(routers.auth.router)
@@ -28,6 +65,7 @@ app.include_router(routers.lesson.router)
 app.include_router(routers.quiz.router)
 app.include_router(routers.dashboard.router)
 app.include_router(routers.admin.router)
+app.include_router(routers.search.router)
 
 
 @app.get("/")
@@ -35,32 +73,66 @@ def root():
     return RedirectResponse("/docs")
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics(request: Request):
+    """
+    Per-route latency, DynamoDB and LLM metrics of this instance in the Prometheus text format.
+    Internal: without METRICS_TOKEN configured the endpoint does not exist.
+    """
+    if not settings.metrics_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {settings.metrics_token}"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/languages", response_model=list[schemas.LanguageChoicesEnum])  # Use list type hint
 def get_languages():
     return list(schemas.LanguageChoicesEnum)
 
 
-@app.post("/ai/assist", response_model=dict)
+@app.post("/ai/assist", response_model=dict, dependencies=[Depends(rate_limit("ai_assist"))])
 async def assist_user(request: schemas.AIContentRequest, current_student: Student = Depends(get_current_student)):
-    try:
-        subject = Subject.get(request.subject_id)  # Fetch Subject by hash key (id)
-    except Subject.DoesNotExist:
-        subject = None
-    language = current_student.language
-    lesson_content = ""
-    if request.lesson_id:
-        try:
-            lesson = Lesson.get(request.lesson_id)  # hash_key, range_key
-            lesson_content = f"{lesson.title}" if lesson else ""
-            lesson_content += f"\n{lesson.content}" if lesson else ""
-        except Lesson.DoesNotExist:
-            lesson = None
-            lesson_content = ""
-
-    context = f"Subject: {subject.name}, Lesson: {lesson_content}"
-    # --- End Fetch Context ---
-    response = await ai.ai_assistant(request.user_messages, context, language)
-    return {"ai_response": response}
-
-
-handler = Mangum(app)
+    session, summary, user_messages = None, None, request.user_messages
+    if request.message is not None:
+        if request.session_id:
+            session = await run_in_threadpool(ai_sessions.get_session, request.session_id, current_student.user_id)
+            if session is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found or expired")
+        else:
+            session = ai_sessions.start_session(current_student.user_id, request.subject_id, request.lesson_id)
+        user_messages = ai_sessions.history(session) + [{"role": "user", "content": request.message}]
+        summary = session.summary
+
+    passages = []
+    if settings.retrieval_enabled:
+        # numpy is imported with app.ai.retrieval on first use, as for the analytics endpoints
+        from .ai import retrieval
+
+        question = ai_context.latest_question(user_messages)
+        passages = await run_in_threadpool(retrieval.retrieve, request.subject_id, question, request.lesson_id, current_student.language)
+    # Cached per lesson, so follow-up turns skip the Subject and Lesson reads; without passages (lesson not indexed) the content is sent
+    context = await run_in_threadpool(ai_context.lesson_context, request.subject_id, request.lesson_id, not passages)
+    response = await ai.ai_assistant(user_messages, context, current_student.language, passages, summary)
+    if session is None:
+        return {"ai_response": response}
+    await run_in_threadpool(ai_sessions.record_turn, session, request.message, response, request.subject_id, request.lesson_id)
+    return {"ai_response": response, "session_id": session.id}
+
+
+# Mangum would otherwise run the lifespan on every invocation
+asgi_handler = Mangum(app, lifespan="off")
+
+
+def handler(event, context):
+    if warmup.is_warm_ping(event):
+        return {"warm": True}
+    if tasks.is_task_event(event):
+        # Asynchronous self-invocation carrying a post-response task (see app/tasks.py)
+        asyncio.run(tasks.run(event))
+        return {"task": event[tasks.TASK_KEY]}
+    return asgi_handler(event, context)
+
+
+if settings.warmup_enabled and ON_LAMBDA:
+    warmup.run(app)
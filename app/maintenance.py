@@ -0,0 +1,263 @@
+"""
+Maintenance engine for bulk jobs run from manage.py.
+
+A job reads a table with a segmented parallel scan, or with an index query when the items
+of interest are reachable through one, and hands every item to a transform. The transform
+returns update actions, which are applied per item with UpdateItem, conditioned on the item
+still existing unchanged since it was read: only the fields the job sets are written, so a
+concurrent edit is never overwritten with the scanned snapshot. Writes run on a few threads,
+throttled so the job uses at most a fraction of the table's write capacity. Jobs show
+progress with an ETA, can dry-run, and checkpoint after every page so an interrupted run
+resumes where it stopped.
+"""
+
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterator, List, Optional, Type, TypeVar
+
+from pynamodb.exceptions import UpdateError
+from pynamodb.expressions.update import Action
+from pynamodb.models import Model
+from tqdm import tqdm
+
+from .scan import ScanCheckpoint, ScanPage, parallel_scan
+
+ModelType = TypeVar("ModelType", bound=Model)
+
+# Write budget assumed for on-demand tables, which have no provisioned capacity to take a fraction of
+ON_DEMAND_WRITE_UNITS = 1000
+
+
+def item_size(item: dict) -> int:
+    """Approximate DynamoDB item size of a serialized item: attribute names plus values."""
+    size = 0
+    for name, value in item.items():
+        attr_value = next(iter(value.values()))
+        if isinstance(attr_value, bytes):
+            size += len(name) + len(attr_value)
+        else:
+            size += len(name) + len(json.dumps(attr_value, ensure_ascii=False).encode("utf-8"))
+    return size
+
+
+def write_units(item: Model) -> int:
+    """Standard writes cost one unit per started 1 KB."""
+    # Items read with attributes_to_get lack required attributes, so skip the null checks
+    return max(1, math.ceil(item_size(item.serialize(null_check=False)) / 1024))
+
+
+class RateLimiter:
+    """Token bucket of capacity units refilled at `units_per_second`, allowing up to one second of burst."""
+
+    def __init__(self, units_per_second: float):
+        self.units_per_second = units_per_second
+        self._available = units_per_second
+        self._updated_at = time.monotonic()
+
+    def acquire(self, units: float) -> None:
+        now = time.monotonic()
+        self._available = min(self.units_per_second, self._available + (now - self._updated_at) * self.units_per_second)
+        self._updated_at = now
+        if self._available < units:
+            time.sleep((units - self._available) / self.units_per_second)
+            self._updated_at = time.monotonic()
+            self._available = 0.0
+        else:
+            self._available -= units
+
+
+@dataclass
+class MaintenanceStats:
+    read: int = 0
+    written: int = 0
+    skipped: int = 0
+    conflicts: int = 0  # items changed or deleted concurrently and left alone
+    write_units: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.perf_counter() - self.started_at
+
+
+class MaintenanceJob:
+    """
+    One pass over `model`: a parallel scan, or a query of `index` for `hash_key`.
+
+    `hydrate` fetches full items with BatchGetItem for keys-only indexes. The transform
+    returns the update actions for an item, or None to leave it unchanged.
+    """
+
+    def __init__(
+        self,
+        model: Type[ModelType],
+        name: str,
+        index=None,
+        hash_key: Any = None,
+        hydrate: bool = False,
+        segments: int = 4,
+        attributes_to_get: Optional[List[str]] = None,
+        capacity_fraction: float = 0.25,
+        dry_run: bool = False,
+        checkpoint_dir: Optional[str] = None,
+        progress: bool = True,
+        workers: int = 8,
+    ):
+        self.model = model
+        self.name = name
+        self.index = index
+        self.hash_key = hash_key
+        self.hydrate = hydrate
+        self.segments = 1 if index is not None else segments
+        self.attributes_to_get = attributes_to_get
+        self.capacity_fraction = capacity_fraction
+        self.dry_run = dry_run
+        self.checkpoint_path = os.path.join(checkpoint_dir, f"{name}.checkpoint.json") if checkpoint_dir else None
+        self.progress = progress
+        self.workers = workers
+
+    def write_units_per_second(self) -> float:
+        """The job's share of the table's provisioned write capacity."""
+        description = self.model.describe_table()
+        if description.get("BillingModeSummary", {}).get("BillingMode") == "PAY_PER_REQUEST":
+            capacity = ON_DEMAND_WRITE_UNITS
+        else:
+            capacity = description.get("ProvisionedThroughput", {}).get("WriteCapacityUnits") or ON_DEMAND_WRITE_UNITS
+        return max(1.0, capacity * self.capacity_fraction)
+
+    def _estimated_items(self) -> Optional[int]:
+        if self.index is not None:
+            return None
+        try:
+            return self.model.describe_table().get("ItemCount")
+        except Exception:
+            return None
+
+    def _query_pages(self, checkpoint: Optional[ScanCheckpoint]) -> Iterator[ScanPage]:
+        connection = self.model._get_connection()
+        start_key = checkpoint.start_key(0) if checkpoint else None
+        if checkpoint and checkpoint.is_done(0):
+            return
+        while True:
+            data = connection.query(
+                self.hash_key,
+                attributes_to_get=self.attributes_to_get,
+                exclusive_start_key=start_key,
+                index_name=self.index.Meta.index_name,
+                return_consumed_capacity="TOTAL",
+            )
+            start_key = data.get("LastEvaluatedKey")
+            yield ScanPage(
+                segment=0,
+                items=[self.model.from_raw_data(item) for item in data.get("Items", [])],
+                last_evaluated_key=start_key,
+                consumed_capacity=data.get("ConsumedCapacity", {}).get("CapacityUnits", 0.0),
+            )
+            if start_key is None:
+                return
+
+    def pages(self, checkpoint: Optional[ScanCheckpoint] = None) -> Iterator[ScanPage]:
+        if self.index is not None:
+            return self._query_pages(checkpoint)
+        return parallel_scan(self.model, total_segments=self.segments, attributes_to_get=self.attributes_to_get, checkpoint=checkpoint)
+
+    def _hydrate(self, items: List[ModelType]) -> List[ModelType]:
+        hash_key_name = self.model._hash_key_attribute().attr_name
+        range_key = self.model._range_key_attribute()
+        if range_key:
+            keys = [(getattr(item, hash_key_name), getattr(item, range_key.attr_name)) for item in items]
+        else:
+            keys = [getattr(item, hash_key_name) for item in items]
+        return list(self.model.batch_get(keys)) if keys else []
+
+    def _key(self, item: ModelType) -> tuple:
+        range_key = self.model._range_key_attribute()
+        hash_key = getattr(item, self.model._hash_key_attribute().attr_name)
+        return (hash_key, getattr(item, range_key.attr_name)) if range_key else (hash_key,)
+
+    def _tracks_updates(self) -> bool:
+        return getattr(self.model, "updated_at", None) is not None
+
+    def _condition(self, item: ModelType):
+        """The item still exists and, when the model tracks it, has not been saved since it was read."""
+        condition = self.model._hash_key_attribute().exists()
+        if self._tracks_updates() and getattr(item, "updated_at", None) is not None:
+            # Items stored without updated_at read back with its default (now), which no stored value matches
+            condition &= self.model.updated_at.does_not_exist() | (self.model.updated_at == item.updated_at)
+        return condition
+
+    def _update(self, item: ModelType, actions: List[Action], transform: Callable[[ModelType], Optional[List[Action]]]) -> Optional[bool]:
+        """
+        Apply `actions` to `item`. If the item changed since it was read, re-read it and transform it
+        once more. True: written, False: no longer needs a write, None: deleted or changed again.
+        """
+        for attempt in range(2):
+            if self._tracks_updates():
+                actions = [*actions, self.model.updated_at.set(datetime.now(timezone.utc))]
+            try:
+                item.update(actions=actions, condition=self._condition(item))
+                return True
+            except UpdateError as e:
+                if e.cause_response_code != "ConditionalCheckFailedException":
+                    raise
+            if attempt:
+                break
+            try:
+                item = self.model.get(*self._key(item))
+            except self.model.DoesNotExist:
+                return None
+            actions = transform(item)
+            if actions is None:
+                return False
+        return None
+
+    def run(self, transform: Callable[[ModelType], Optional[List[Action]]]) -> MaintenanceStats:
+        stats = MaintenanceStats()
+        checkpoint = ScanCheckpoint.load(self.checkpoint_path, self.segments) if self.checkpoint_path and not self.dry_run else None
+        limiter = None if self.dry_run else RateLimiter(self.write_units_per_second())
+        progress = tqdm(total=self._estimated_items(), unit=" items", desc=self.name, disable=not self.progress)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for page in self.pages(checkpoint):
+                    items = self._hydrate(page.items) if self.hydrate else page.items
+                    updates = []
+                    for item in items:
+                        stats.read += 1
+                        actions = transform(item)
+                        if actions is None:
+                            stats.skipped += 1
+                            continue
+                        if self.dry_run:
+                            stats.written += 1
+                            continue
+                        # UpdateItem is billed on the larger of the item before and after
+                        units = write_units(item)
+                        limiter.acquire(units)
+                        updates.append(executor.submit(self._update, item, actions, transform))
+                        stats.write_units += units
+
+                    # Finish this page's writes before recording it as done
+                    for update in updates:
+                        outcome = update.result()
+                        if outcome is None:
+                            stats.conflicts += 1
+                        elif outcome:
+                            stats.written += 1
+                        else:
+                            stats.skipped += 1
+                    if checkpoint:
+                        checkpoint.record(page)
+                        checkpoint.save()
+                    progress.update(len(page.items))
+        finally:
+            progress.close()
+
+        if checkpoint:
+            checkpoint.remove()
+        return stats
@@ -0,0 +1,273 @@
+"""
+Per-route request metrics.
+
+`MetricsMiddleware` opens a `RequestMetrics` in a context variable for every HTTP request.
+DynamoDB calls (through the botocore hooks in app/db.py, which also ask for consumed capacity)
+and LLM calls (from app/ai/utils.get_completion) are added to it; the context variable follows
+the request into worker threads. When the request finishes its totals are folded into
+process-wide aggregates rendered in the Prometheus text format by `render_prometheus`, and,
+with `log_requests`, written as one JSON log line per request (the channel that works under
+Mangum, where nothing can scrape the instance).
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from . import db
+from .db import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# Operations whose consumed capacity counts as reads; everything else counts as writes
+READ_OPERATIONS = {"GetItem", "BatchGetItem", "Query", "Scan", "TransactGetItems"}
+
+# LLM calls take seconds, not milliseconds
+LLM_LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 20000, 40000)
+
+UNMATCHED_ROUTE = "unmatched"
+NO_ROUTE = "-"  # LLM calls made outside any request
+
+
+@dataclass
+class RequestMetrics:
+    method: str
+    path: str
+    route: str = UNMATCHED_ROUTE
+    dynamodb_calls: int = 0
+    read_units: float = 0.0
+    write_units: float = 0.0
+    llm_calls: int = 0
+    llm_errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    llm_ms: float = 0.0
+    # Per call details, folded into the registry once the route is known
+    dynamodb: Dict[Tuple[str, str], List[float]] = field(default_factory=dict)  # (table, operation) -> [calls, units]
+    llm: List[Tuple[str, float, int, int, bool]] = field(default_factory=list)  # (model, ms, prompt, completion, ok)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def as_log_record(self, status: int, duration_ms: float) -> dict:
+        return {
+            "event": "request",
+            "method": self.method,
+            "route": self.route,
+            "path": self.path,
+            "status": status,
+            "duration_ms": round(duration_ms, 2),
+            "dynamodb": {"calls": self.dynamodb_calls, "read_units": self.read_units, "write_units": self.write_units},
+            "llm": {
+                "calls": self.llm_calls,
+                "errors": self.llm_errors,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "duration_ms": round(self.llm_ms, 2),
+            },
+        }
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def current() -> Optional[RequestMetrics]:
+    """Metrics of the request being handled, None outside requests (e.g. manage.py)."""
+    return _current.get()
+
+
+class _Registry:
+    """Process-wide aggregates, keyed by route (and table/operation or LLM model)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, str], int] = defaultdict(int)  # (method, route, status) -> count
+        self.latency: Dict[Tuple[str, str], LatencyHistogram] = {}  # (method, route)
+        self.dynamodb_calls: Dict[Tuple[str, str, str], int] = defaultdict(int)  # (route, table, operation)
+        self.consumed: Dict[Tuple[str, str, str], float] = defaultdict(float)  # (route, table, "read" | "write")
+        self.llm_calls: Dict[Tuple[str, str, str], int] = defaultdict(int)  # (route, model, outcome)
+        self.llm_tokens: Dict[Tuple[str, str, str], int] = defaultdict(int)  # (route, model, "prompt" | "completion")
+        self.llm_latency: Dict[Tuple[str, str], LatencyHistogram] = {}  # (route, model)
+
+    def observe_request(self, metrics: RequestMetrics, status: int, duration_ms: float) -> None:
+        route = metrics.route
+        with self._lock:
+            self.requests[(metrics.method, route, str(status))] += 1
+            histogram = self.latency.setdefault((metrics.method, route), LatencyHistogram())
+            for (table, operation), (calls, units) in metrics.dynamodb.items():
+                self.dynamodb_calls[(route, table, operation)] += int(calls)
+                if units:
+                    self.consumed[(route, table, "read" if operation in READ_OPERATIONS else "write")] += units
+        histogram.observe(duration_ms)
+        for call in metrics.llm:
+            self.observe_llm(route, *call)
+
+    def observe_llm(self, route: str, model: str, duration_ms: float, prompt_tokens: int, completion_tokens: int, ok: bool) -> None:
+        with self._lock:
+            self.llm_calls[(route, model, "ok" if ok else "error")] += 1
+            self.llm_tokens[(route, model, "prompt")] += prompt_tokens
+            self.llm_tokens[(route, model, "completion")] += completion_tokens
+            histogram = self.llm_latency.setdefault((route, model), LatencyHistogram(LLM_LATENCY_BUCKETS_MS))
+        histogram.observe(duration_ms)
+
+
+registry = _Registry()
+
+
+def _consumed_units(parsed: Optional[dict]) -> float:
+    consumed = (parsed or {}).get("ConsumedCapacity")
+    if not consumed:
+        return 0.0
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    return sum(entry.get("CapacityUnits", 0.0) for entry in consumed)
+
+
+def record_dynamodb_call(table: str, operation: str, duration_ms: float, parsed: Optional[dict]) -> None:
+    """botocore after-call listener (see db.add_call_listener); DynamoDB calls outside requests are only timed by app/db.py."""
+    metrics = _current.get()
+    if metrics is None:
+        return
+    units = _consumed_units(parsed)
+    with metrics._lock:
+        metrics.dynamodb_calls += 1
+        if operation in READ_OPERATIONS:
+            metrics.read_units += units
+        else:
+            metrics.write_units += units
+        totals = metrics.dynamodb.setdefault((table, operation), [0, 0.0])
+        totals[0] += 1
+        totals[1] += units
+
+
+def record_llm_call(model: str, duration_ms: float, prompt_tokens: int = 0, completion_tokens: int = 0, ok: bool = True) -> None:
+    metrics = _current.get()
+    if metrics is None:
+        registry.observe_llm(NO_ROUTE, model, duration_ms, prompt_tokens, completion_tokens, ok)
+        return
+    with metrics._lock:
+        metrics.llm_calls += 1
+        metrics.llm_errors += 0 if ok else 1
+        metrics.prompt_tokens += prompt_tokens
+        metrics.completion_tokens += completion_tokens
+        metrics.llm_ms += duration_ms
+        metrics.llm.append((model, duration_ms, prompt_tokens, completion_tokens, ok))
+
+
+db.add_call_listener(record_dynamodb_call)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request up to its last response byte. Background tasks
+    run inside the same call, so their DynamoDB and LLM work is still charged to the route.
+    """
+
+    def __init__(self, app, log_requests: bool = False):
+        self.app = app
+        self.log_requests = log_requests
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics(method=scope["method"], path=scope["path"])
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        status = 500
+        duration_ms = None
+
+        async def send_wrapper(message):
+            nonlocal status, duration_ms
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                duration_ms = (time.perf_counter() - start) * 1000
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            # The router stores the matched route in the shared scope; label by its template, not the raw path
+            route = scope.get("route")
+            if route is not None:
+                metrics.route = getattr(route, "path", UNMATCHED_ROUTE)
+            if duration_ms is None:
+                duration_ms = (time.perf_counter() - start) * 1000
+            registry.observe_request(metrics, status, duration_ms)
+            if self.log_requests:
+                logger.info(json.dumps(metrics.as_log_record(status, duration_ms)))
+
+
+def _labels(**labels) -> str:
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for name, value in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+def _histogram_lines(name: str, histogram: LatencyHistogram, **labels) -> list:
+    """A ms LatencyHistogram as a Prometheus histogram in seconds."""
+    lines, cumulative = [], 0
+    for bound, count in zip(histogram.bounds, histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound / 1000)} {cumulative}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.total_ms / 1000}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+
+def render_prometheus() -> str:
+    """All aggregates in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+
+    def family(name: str, kind: str, help_text: str) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    with registry._lock:
+        requests = dict(registry.requests)
+        latency = dict(registry.latency)
+        dynamodb_calls = dict(registry.dynamodb_calls)
+        consumed = dict(registry.consumed)
+        llm_calls = dict(registry.llm_calls)
+        llm_tokens = dict(registry.llm_tokens)
+        llm_latency = dict(registry.llm_latency)
+
+    family("http_requests_total", "counter", "HTTP requests by route and status.")
+    for (method, route, status), count in sorted(requests.items()):
+        lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    family("http_request_duration_seconds", "histogram", "HTTP request latency by route, up to the last response byte.")
+    for (method, route), histogram in sorted(latency.items()):
+        lines.extend(_histogram_lines("http_request_duration_seconds", histogram, method=method, route=route))
+
+    family("dynamodb_calls_total", "counter", "DynamoDB calls made while handling each route.")
+    for (route, table, operation), count in sorted(dynamodb_calls.items()):
+        lines.append(f"dynamodb_calls_total{_labels(route=route, table=table, operation=operation)} {count}")
+
+    family("dynamodb_consumed_capacity_units_total", "counter", "Capacity units DynamoDB reported as consumed, per route.")
+    for (route, table, kind), units in sorted(consumed.items()):
+        lines.append(f"dynamodb_consumed_capacity_units_total{_labels(route=route, table=table, kind=kind)} {units}")
+
+    family("dynamodb_call_duration_seconds", "histogram", "DynamoDB call latency by table and operation, all callers.")
+    for (table, operation), histogram in sorted(db._histograms.items()):
+        lines.extend(_histogram_lines("dynamodb_call_duration_seconds", histogram, table=table, operation=operation))
+
+    family("llm_calls_total", "counter", "LLM completions by route, model and outcome.")
+    for (route, model, outcome), count in sorted(llm_calls.items()):
+        lines.append(f"llm_calls_total{_labels(route=route, model=model, outcome=outcome)} {count}")
+
+    family("llm_tokens_total", "counter", "LLM tokens by route, model and kind.")
+    for (route, model, kind), count in sorted(llm_tokens.items()):
+        lines.append(f"llm_tokens_total{_labels(route=route, model=model, kind=kind)} {count}")
+
+    family("llm_call_duration_seconds", "histogram", "LLM completion latency by route and model.")
+    for (route, model), histogram in sorted(llm_latency.items()):
+        lines.extend(_histogram_lines("llm_call_duration_seconds", histogram, route=route, model=model))
+
+    return "\n".join(lines) + "\n"
@@ -1,8 +1,12 @@
 # app/models.py
 from pynamodb.models import Model
-from pynamodb.attributes import UnicodeAttribute, NumberAttribute, UTCDateTimeAttribute, BooleanAttribute, ListAttribute, MapAttribute, JSONAttribute
+from pynamodb.attributes import Attribute, BinaryAttribute, UnicodeAttribute, NumberAttribute, UTCDateTimeAttribute, BooleanAttribute, ListAttribute, MapAttribute, JSONAttribute, TTLAttribute
+from pynamodb.constants import BINARY, STRING
 from pynamodb.indexes import GlobalSecondaryIndex, AllProjection, KeysOnlyProjection, IncludeProjection
+from pynamodb.connection import TableConnection
 from .config import settings
+from .compression import compress_text, decompress_text
+from . import db
 import enum
 import uuid
 from datetime import datetime, timezone
@@ -34,6 +38,12 @@ class LessonStatusEnum(enum.Enum):
     FAILED = "failed"
 
 
+class FeedbackStatusEnum(enum.Enum):
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
+
+
 class DifficultyLevelEnum(enum.Enum):
     EASY = "easy"
     MEDIUM = "medium"
@@ -48,11 +58,51 @@ class QuestionTypeEnum(enum.Enum):
     ESSAY = "essay"
 
 
+class _CompressedText:
+    """A compressed value loaded from DynamoDB that has not been read yet."""
+
+    __slots__ = ("blob",)
+
+    def __init__(self, blob: bytes):
+        self.blob = blob
+
+
+class CompressedUnicodeAttribute(Attribute[str]):
+    """
+    Text stored as a compressed binary attribute (see app/compression.py for the format).
+    Values are decompressed on first access, so items that are loaded but whose text is
+    never read skip the work. Plain string values written before compression are still read.
+    """
+
+    attr_type = BINARY
+
+    def serialize(self, value):
+        return compress_text(value)
+
+    def deserialize(self, value):
+        if isinstance(value, str):
+            return value
+        return _CompressedText(value)
+
+    def get_value(self, value):
+        if STRING in value:
+            return value[STRING]
+        return super().get_value(value)
+
+    def __get__(self, instance, owner):
+        value = super().__get__(instance, owner)
+        if isinstance(value, _CompressedText):
+            value = decompress_text(value.blob)
+            attr_name = instance._dynamo_to_python_attrs.get(self.attr_name, self.attr_name)
+            instance.attribute_values[attr_name] = value
+        return value
+
+
 # --- Base Model ---
 class BaseModel(Model):
     class Meta:
         region = settings.aws_region
-        # host = settings.dynamodb_endpoint_url
+        host = settings.dynamodb_endpoint_url
         # aws_access_key_id = settings.aws_access_key_id
         # aws_secret_access_key = settings.aws_secret_access_key
         billing_mode = "PAY_PER_REQUEST"
@@ -65,6 +115,11 @@ class BaseModel(Model):
         self.updated_at = datetime.now(timezone.utc)
         super().save(**kwargs)
 
+    @classmethod
+    def _get_connection(cls) -> TableConnection:
+        """Route every table through the shared, tuned connection from app/db.py"""
+        return db.share_connection(super()._get_connection(), cls.Meta.region, cls.Meta.host)
+
 
 # --- Define Global Secondary Indexes (GSI) ---
 class UserEmailIndex(GlobalSecondaryIndex):
@@ -192,7 +247,7 @@ class Lesson(BaseModel):
     instructor_id = UnicodeAttribute()
     title = UnicodeAttribute()
     language = UnicodeAttribute()
-    content = UnicodeAttribute()
+    content = CompressedUnicodeAttribute()
     summary = UnicodeAttribute(null=True)  # Brief lesson summary
     learning_objectives = ListAttribute(of=UnicodeAttribute, null=True)
     status = UnicodeAttribute(default=LessonStatusEnum.DRAFT.value)
@@ -210,6 +265,20 @@ class Lesson(BaseModel):
     status_index = LessonStatusIndex()
 
 
+class LessonChunks(BaseModel):
+    """A lesson's content split into passages with their term vectors, for the assistant's retrieval (see app/ai/retrieval.py)."""
+
+    class Meta(BaseModel.Meta):
+        table_name = "khaneducation_lesson_chunks"
+
+    # One query returns the chunks of every lesson in a subject
+    subject_id = UnicodeAttribute(hash_key=True)
+    lesson_id = UnicodeAttribute(range_key=True)
+    language = UnicodeAttribute()
+    chunk_count = NumberAttribute()
+    index = BinaryAttribute(legacy_encoding=False)  # zlib-compressed ChunkIndex
+
+
 
 
 class StudentByGradeAndLanguageIndex(GlobalSecondaryIndex):
@@ -332,7 +401,22 @@ class QuizByStudentIndex(GlobalSecondaryIndex):
 
     student_id = UnicodeAttribute(hash_key=True)
 
+
+# Attributes needed by progress/analytics reads. Keeps question payloads, responses and
+# AI feedback out of dashboard queries.
+QUIZ_SUMMARY_ATTRIBUTES = ["lesson_id", "score", "passed", "end_time", "time_taken_minutes"]
+
+
+class QuizSummaryBySubjectStudentIndex(GlobalSecondaryIndex):
+    class Meta:
+        index_name = "quiz-summary-subject-student-index"
+        projection = IncludeProjection(QUIZ_SUMMARY_ATTRIBUTES)
+
+    subject_id = UnicodeAttribute(hash_key=True)
+    student_id = UnicodeAttribute(range_key=True)
+
 QUIZ_PASSING_SCORE = 70
+QUIZ_ATTEMPT_LIMIT = 3  # quizzes a student may generate per lesson
 
 
 class Quiz(BaseModel):
@@ -349,6 +433,7 @@ class Quiz(BaseModel):
     end_time = UTCDateTimeAttribute(null=True)
     time_taken_minutes = NumberAttribute(null=True)
     ai_feedback = UnicodeAttribute(null=True)
+    feedback_status = UnicodeAttribute(null=True)  # FeedbackStatusEnum, set once the attempt is submitted
     score = NumberAttribute(null=True)
     passed = BooleanAttribute(default=False)
     cheating_detected = BooleanAttribute(default=False)
@@ -361,6 +446,7 @@ class Quiz(BaseModel):
     lesson_student_index = QuizByLessonStudentIndex()
     student_index = QuizByStudentIndex()
     subject_student_index = QuizBySubjectStudentIndex()
+    summary_subject_student_index = QuizSummaryBySubjectStudentIndex()
 
     def add_question(self, question_text: str, question_type: str, options: List[str] = None, correct_answer: str = None):
         """Add a question to the quiz"""
@@ -411,6 +497,22 @@ class Quiz(BaseModel):
             self.time_taken_minutes = round(time_diff.total_seconds() / 60, 2)
         self.calculate_score()
 
+class QuizAttemptCounter(BaseModel):
+    """
+    Number of quizzes generated per student and lesson, incremented atomically before generation.
+    attempts counts towards QUIZ_ATTEMPT_LIMIT and is given back when generation fails; versions is the
+    last quiz_version handed out and never decreases.
+    """
+
+    class Meta(BaseModel.Meta):
+        table_name = "khaneducation_quiz_attempt_counters"
+
+    student_id = UnicodeAttribute(hash_key=True)
+    lesson_id = UnicodeAttribute(range_key=True)
+    attempts = NumberAttribute(default=0)
+    versions = NumberAttribute(null=True)
+
+
 # --- Additional Models for Enhanced Functionality ---
 
 
@@ -427,3 +529,38 @@ class Notification(BaseModel):
     is_read = BooleanAttribute(default=False)
     action_url = UnicodeAttribute(null=True)
     expires_at = UTCDateTimeAttribute(null=True)
+
+
+class AssistantMessageAttribute(MapAttribute):
+    role = UnicodeAttribute()  # user, assistant
+    content = UnicodeAttribute()
+
+
+class AssistantSession(BaseModel):
+    """An /ai/assist conversation kept server side: recent turns verbatim, older ones in a rolling summary."""
+
+    class Meta(BaseModel.Meta):
+        table_name = "khaneducation_assistant_sessions"
+
+    id = UnicodeAttribute(hash_key=True, default_for_new=lambda: str(uuid.uuid4()))
+
+    user_id = UnicodeAttribute()
+    subject_id = UnicodeAttribute()
+    lesson_id = UnicodeAttribute(null=True)
+    messages = ListAttribute(of=AssistantMessageAttribute, default=list)
+    summary = UnicodeAttribute(null=True)
+    turns = NumberAttribute(default=0)  # also the optimistic lock between concurrent turns
+    # Pushed back on every turn; DynamoDB drops idle sessions
+    expires_at = TTLAttribute()
+
+
+class TokenRevocation(BaseModel):
+    """Tokens of a user issued before `not_before` are rejected in claims-only auth mode."""
+
+    class Meta(BaseModel.Meta):
+        table_name = "khaneducation_token_revocations"
+
+    user_id = UnicodeAttribute(hash_key=True)
+    not_before = NumberAttribute()  # epoch seconds, sub-second precision
+    # Once every token issued before not_before has expired the entry is useless; DynamoDB drops it
+    expires_at = TTLAttribute()
@@ -0,0 +1,71 @@
+"""
+Opaque, signed pagination cursors built on DynamoDB's LastEvaluatedKey.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+from dataclasses import dataclass, field
+from typing import Generic, List, Optional, TypeVar
+
+from fastapi import Response
+
+from .config import settings
+
+T = TypeVar("T")
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+_SIGNATURE_BYTES = 16
+
+
+@dataclass
+class Page(Generic[T]):
+    items: List[T] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: bytes, scope: str) -> bytes:
+    digest = hmac.new(settings.secret_key.encode(), scope.encode() + b"\x00" + payload, hashlib.sha256).digest()
+    return digest[:_SIGNATURE_BYTES]
+
+
+def encode_cursor(last_evaluated_key: Optional[dict], scope: str) -> Optional[str]:
+    """Serialize a LastEvaluatedKey into a signed cursor bound to `scope` (table or index name)."""
+    if not last_evaluated_key:
+        return None
+    payload = json.dumps(last_evaluated_key, separators=(",", ":"), sort_keys=True).encode()
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload, scope))}"
+
+
+def decode_cursor(cursor: Optional[str], scope: str) -> Optional[dict]:
+    """Verify a cursor produced by `encode_cursor` and return the LastEvaluatedKey it carries."""
+    if not cursor:
+        return None
+    try:
+        encoded_payload, encoded_signature = cursor.split(".", 1)
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except ValueError as e:
+        raise ValueError("Malformed pagination cursor") from e
+
+    if not hmac.compare_digest(signature, _sign(payload, scope)):
+        raise ValueError("Invalid pagination cursor")
+    return json.loads(payload)
+
+
+def set_next_cursor(response: Response, page: Page) -> None:
+    """Expose the cursor for the next page as a response header (body stays a plain list)."""
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
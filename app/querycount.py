@@ -0,0 +1,121 @@
+"""
+DynamoDB query counting for development and tests.
+
+In debug mode `QueryGuardMiddleware` counts the DynamoDB operations of every request and,
+past `query_guard_threshold`, logs a warning listing the call sites that issued them (the
+usual sign of an N+1 pattern: one call per subject, lesson or student). Tests bound the
+calls of a block with `assert_max_queries`:
+
+    with assert_max_queries(6):
+        client.get("/dashboard/student/", headers=headers)
+"""
+
+import logging
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from . import db
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Frames from these files say nothing about who issued the call
+_SKIPPED_FILES = {os.path.join(APP_DIR, name) for name in ("db.py", "querycount.py", "metrics.py", "models.py")}
+CALL_SITE_DEPTH = 3  # app frames kept per call, innermost first
+
+
+def _call_site() -> str:
+    """The innermost app frames of the current stack, e.g. "crud/main.py:40 get_by_subject <- services.py:52 ..."."""
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < CALL_SITE_DEPTH:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_DIR) and filename not in _SKIPPED_FILES:
+            frames.append(f"{os.path.relpath(filename, APP_DIR)}:{frame.f_lineno} {frame.f_code.co_name}")
+        frame = frame.f_back
+    return " <- ".join(frames) or "<outside app>"
+
+
+class QueryTracker:
+    def __init__(self, label: str):
+        self.label = label
+        self.calls: Counter = Counter()  # (table, operation, call site) -> count
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return sum(self.calls.values())
+
+    def record(self, table: str, operation: str, call_site: str) -> None:
+        with self._lock:
+            self.calls[(table, operation, call_site)] += 1
+
+    def report(self, limit: int = 10) -> str:
+        lines = [f"{self.count} DynamoDB calls in {self.label}:"]
+        for (table, operation, call_site), count in self.calls.most_common(limit):
+            lines.append(f"  {count:>4} x {operation} {table} at {call_site}")
+        if len(self.calls) > limit:
+            lines.append(f"  ... {len(self.calls) - limit} more call sites")
+        return "\n".join(lines)
+
+
+_request_tracker: ContextVar[Optional[QueryTracker]] = ContextVar("query_tracker", default=None)
+# assert_max_queries scopes see every call in the process, whichever thread or event loop makes it
+_scopes: List[QueryTracker] = []
+_scopes_lock = threading.Lock()
+
+
+def _record(table: str, operation: str, duration_ms: float, parsed) -> None:
+    tracker = _request_tracker.get()
+    if tracker is None and not _scopes:
+        return
+    call_site = _call_site()
+    if tracker is not None:
+        tracker.record(table, operation, call_site)
+    for scope in list(_scopes):
+        scope.record(table, operation, call_site)
+
+
+db.add_call_listener(_record)
+
+
+@contextmanager
+def assert_max_queries(limit: int, label: str = "block") -> Iterator[QueryTracker]:
+    """Fail with the call-site report when the block makes more than `limit` DynamoDB calls."""
+    tracker = QueryTracker(label)
+    with _scopes_lock:
+        _scopes.append(tracker)
+    try:
+        yield tracker
+    finally:
+        with _scopes_lock:
+            _scopes.remove(tracker)
+    if tracker.count > limit:
+        raise AssertionError(f"Expected at most {limit} DynamoDB calls\n{tracker.report()}")
+
+
+class QueryGuardMiddleware:
+    """ASGI middleware logging requests (background tasks included) that exceed `threshold` DynamoDB calls."""
+
+    def __init__(self, app, threshold: int = 20):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tracker = QueryTracker(f"{scope['method']} {scope['path']}")
+        token = _request_tracker.set(tracker)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_tracker.reset(token)
+            if tracker.count > self.threshold:
+                logger.warning(f"Possible N+1 queries, threshold {self.threshold}\n{tracker.report()}")
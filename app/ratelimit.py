@@ -0,0 +1,199 @@
+"""
+Token-bucket admission control for the endpoints that call the LLM.
+
+Each limited endpoint has a per-user budget (by role) and a global budget, configured in
+`settings.rate_limits` as "<requests>/<second|minute|hour>". A bucket holds up to
+<requests> tokens and refills continuously over the period, so short bursts are allowed
+while the sustained rate stays bounded. Over-budget requests get a 429 with Retry-After
+before any database or LLM work. Buckets live in process memory, or in Redis when
+`rate_limit_redis_url` is set, which makes the global budget shared across instances.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+
+from .config import settings
+from .dependencies import get_current_user
+from .schemas import User as UserSchema
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+GLOBAL = "global"
+DEFAULT_ROLE = "default"
+
+
+@dataclass(frozen=True)
+class Limit:
+    capacity: float
+    period_seconds: float
+
+    @property
+    def rate(self) -> float:
+        """Tokens added per second."""
+        return self.capacity / self.period_seconds
+
+    @classmethod
+    def parse(cls, value: str) -> "Limit":
+        count, _, period = value.partition("/")
+        try:
+            capacity = float(count)
+        except ValueError:
+            capacity = math.nan
+        # A bucket that can never hold a token would divide by a zero refill rate
+        if period not in PERIODS or not (0 < capacity < math.inf):
+            raise ValueError(f"Invalid rate limit {value!r}, expected a positive count per period, e.g. '20/minute'")
+        return cls(capacity, PERIODS[period])
+
+
+class MemoryBackend:
+    """Buckets in a bounded LRU; a bucket idle long enough to be full is the same as no bucket."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, limit: Limit, cost: float = 1) -> float:
+        """Take `cost` tokens; returns 0 when admitted, else the seconds until they are available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (limit.capacity, now))
+            tokens = min(limit.capacity, tokens + (now - updated_at) * limit.rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / limit.rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def refund(self, key: str, limit: Limit, cost: float = 1) -> None:
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated_at = self._buckets[key]
+                self._buckets[key] = (min(limit.capacity, tokens + cost), updated_at)
+
+
+# KEYS[1] bucket; ARGV: capacity, rate per second, cost. Returns the wait in ms (0 = admitted).
+_ACQUIRE_SCRIPT = """
+local capacity, rate, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return math.ceil(wait * 1000)
+"""
+
+# KEYS[1] bucket; ARGV: capacity, cost. Gives back tokens of a request that was not admitted.
+_REFUND_SCRIPT = """
+local capacity, cost = tonumber(ARGV[1]), tonumber(ARGV[2])
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+    redis.call('HSET', KEYS[1], 'tokens', math.min(capacity, tokens + cost))
+end
+return 0
+"""
+
+
+class RedisBackend:
+    """Shared buckets, updated atomically by a Lua script. Requires the `redis` package."""
+
+    def __init__(self, url: str, namespace: str = "khaneducation:ratelimit:"):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._acquire = self._client.register_script(_ACQUIRE_SCRIPT)
+        self._refund = self._client.register_script(_REFUND_SCRIPT)
+        self._namespace = namespace
+
+    def acquire(self, key: str, limit: Limit, cost: float = 1) -> float:
+        return self._acquire(keys=[self._namespace + key], args=[limit.capacity, limit.rate, cost]) / 1000
+
+    def refund(self, key: str, limit: Limit, cost: float = 1) -> None:
+        # Capped like the memory backend, and a bucket that has expired meanwhile stays full
+        self._refund(keys=[self._namespace + key], args=[limit.capacity, cost])
+
+
+class RateLimiter:
+    def __init__(self, backend, limits: dict):
+        self.backend = backend
+        # {endpoint: {role | "default" | "global": Limit}}
+        self.limits = {endpoint: {name: Limit.parse(value) for name, value in budgets.items()} for endpoint, budgets in limits.items()}
+
+    def _user_limit(self, endpoint: str, role: str) -> Optional[Limit]:
+        budgets = self.limits.get(endpoint, {})
+        return budgets.get(role, budgets.get(DEFAULT_ROLE))
+
+    def check(self, endpoint: str, user_id: str, role: str) -> float:
+        """Seconds until the request may proceed, 0 when it is admitted (and its tokens taken)."""
+        user_limit = self._user_limit(endpoint, role)
+        global_limit = self.limits.get(endpoint, {}).get(GLOBAL)
+        user_key = f"{endpoint}:user:{user_id}"
+        try:
+            if user_limit:
+                wait = self.backend.acquire(user_key, user_limit)
+                if wait:
+                    return wait
+            if global_limit:
+                wait = self.backend.acquire(f"{endpoint}:{GLOBAL}", global_limit)
+                if wait:
+                    # Not admitted, so the user's token goes back
+                    if user_limit:
+                        self.backend.refund(user_key, user_limit)
+                    return wait
+        except Exception as e:
+            # Fail open: an unavailable shared backend must not take the endpoints down
+            logger.warning(f"Rate limiter backend failed for {endpoint}: {e}")
+        return 0.0
+
+
+def _build_limiter() -> RateLimiter:
+    if settings.rate_limit_redis_url:
+        try:
+            return RateLimiter(RedisBackend(settings.rate_limit_redis_url), settings.rate_limits)
+        except ImportError:
+            logger.warning("RATE_LIMIT_REDIS_URL is set but the redis package is not installed; using in-process rate limits")
+    return RateLimiter(MemoryBackend(), settings.rate_limits)
+
+
+limiter = _build_limiter()
+
+
+def rate_limit(endpoint: str):
+    """Dependency enforcing the `endpoint` budgets for the current user; 429 with Retry-After when exhausted."""
+
+    # Plain def: FastAPI runs it in the threadpool, so a Redis round trip never blocks the event loop
+    def check_rate_limit(user: UserSchema = Depends(get_current_user)) -> None:
+        if not settings.rate_limit_enabled:
+            return
+        role = getattr(user.role, "value", user.role) or DEFAULT_ROLE
+        wait = limiter.check(endpoint, user.id, role)
+        if wait:
+            logger.info(f"Rate limited {endpoint} for user {user.id}, retry in {wait:.1f}s")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please retry later",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    return check_rate_limit
@@ -0,0 +1,80 @@
+"""
+Token revocation list for claims-only authentication.
+
+Revoking a user stores a `not_before` timestamp in the TokenRevocation table; tokens issued
+earlier are rejected, and revoking everyone (after a bulk credential change) stores one entry
+for all users. Every instance keeps the whole table in memory as a dict and re-scans it every
+`revocation_refresh_seconds`, so authenticating a user never reads DynamoDB (student routes
+still read the student profile). Tokens older than `claims_token_expire_minutes` are rejected
+whatever their expiry, e.g. 30-day tokens issued in database mode, so an entry can expire
+(TTL) once that age has passed, which keeps the table, and each refresh, small.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from .config import settings
+from .models import TokenRevocation
+
+logger = logging.getLogger(__name__)
+
+
+ALL_USERS = "*"
+
+
+class RevocationList:
+    def __init__(self, enabled: bool, refresh_seconds: int, max_token_age_seconds: float):
+        self.enabled = enabled
+        self.refresh_seconds = refresh_seconds
+        self.max_token_age_seconds = max_token_age_seconds
+        self._not_before: Dict[str, float] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_seconds
+
+    def refresh(self) -> None:
+        with self._lock:
+            if not self.is_stale():
+                return
+            try:
+                self._not_before = {entry.user_id: float(entry.not_before) for entry in TokenRevocation.scan()}
+            except Exception as e:
+                # Keep serving the previous snapshot, retry on the next refresh
+                logger.error(f"Failed to refresh token revocation list: {e}")
+            self._loaded_at = time.monotonic()
+
+    def is_revoked(self, user_id: str, issued_at: Optional[float]) -> bool:
+        """True for tokens without an iat, older than the maximum token age, or issued before a revocation."""
+        if issued_at is None or time.time() - issued_at > self.max_token_age_seconds:
+            return True
+        not_before = max(self._not_before.get(user_id, 0.0), self._not_before.get(ALL_USERS, 0.0))
+        return issued_at < not_before
+
+    def revoke(self, user_id: str) -> None:
+        """Reject every token issued to the user until now, on all instances within one refresh interval."""
+        if not self.enabled:
+            # Database mode re-reads the user on every request, nothing to revoke
+            return
+        # Tokens carry a sub-second iat (see create_access_token); older tokens with a whole-second
+        # iat round down, so they are still rejected
+        not_before = time.time()
+        # Older tokens are rejected by age from then on
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.max_token_age_seconds + self.refresh_seconds)
+        TokenRevocation(user_id=user_id, not_before=not_before, expires_at=expires_at).save()
+        self._not_before[user_id] = not_before
+
+    def revoke_all(self) -> None:
+        """Reject every token issued until now, e.g. after resetting all passwords."""
+        self.revoke(ALL_USERS)
+
+
+revocation_list = RevocationList(
+    enabled=settings.auth_mode == "claims",
+    refresh_seconds=settings.revocation_refresh_seconds,
+    max_token_age_seconds=settings.claims_token_expire_minutes * 60,
+)
@@ -6,4 +6,5 @@ from . import (
     dashboard as dashboard,
     admin as admin,
     user_profile as user_profile,
+    search as search,
 )
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response, status, BackgroundTasks
+from typing import List, Optional
 from datetime import datetime, timezone
-from .. import crud, schemas, services
+from .. import crud, schemas, services, db, warmup, export
+from ..config import settings
 from ..dependencies import get_current_admin
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, set_next_cursor
 
 router = APIRouter(
     prefix="/admin",
@@ -25,11 +27,10 @@ def create_user(user: schemas.UserCreate):
 
 
 @router.get("/users/", response_model=List[schemas.User])
-def read_users(skip: int = 0, limit: int = 100):
-    users = crud.crud_user.get_multi(limit=limit)
-    if not users:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No users found")
-    return users
+def read_users(response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
+    page = crud.crud_user.get_multi(limit=limit, cursor=cursor)
+    set_next_cursor(response, page)
+    return page.items
 
 
 @router.get("/users/{user_id}", response_model=schemas.User)
@@ -74,9 +75,10 @@ def create_subject(subject: schemas.SubjectCreate):
 
 
 @router.get("/subjects/", response_model=List[schemas.Subject])
-def read_subjects(limit: int = 100):
-    subjects = crud.crud_subject.get_multi(limit=limit)
-    return subjects
+def read_subjects(response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
+    page = crud.crud_subject.get_multi(limit=limit, cursor=cursor)
+    set_next_cursor(response, page)
+    return page.items
 
 
 @router.put("/subjects/{subject_id}", response_model=schemas.Subject)
@@ -145,12 +147,15 @@ async def regenerate_lesson_content(lesson_id: str, background_tasks: Background
 
 
 @router.get("/subjects/{subject_id}/lessons/", response_model=List[schemas.Lesson])
-def read_lessons_for_subject(subject_id: str, limit: int = 100):
+def read_lessons_for_subject(
+    subject_id: str, response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None
+):
     db_subject = crud.crud_subject.get(hash_key=subject_id)
     if db_subject is None:
         raise HTTPException(status_code=404, detail="Subject not found")
-    lessons = crud.crud_lesson.get_by_subject(subject_id=subject_id)
-    return lessons
+    page = crud.crud_lesson.get_by_subject(subject_id=subject_id, limit=limit, cursor=cursor)
+    set_next_cursor(response, page)
+    return page.items
 
 
 # Individual Lesson routes
@@ -187,11 +192,11 @@ def verify_lesson(lesson_id: str, admin: schemas.User = Depends(get_current_admi
     if not lesson:
         raise HTTPException(status_code=404, detail="Lesson not found")
 
-    lesson.status = schemas.LessonStatusEnum.VERIFIED.value
-    lesson.verified_at = datetime.now(timezone.utc)
-    lesson.verified_by = admin.id
-    lesson.save()
-    return lesson
+    # Through crud so the catalog cache and the search index follow the status change
+    return crud.crud_lesson.update(
+        lesson,
+        {"status": schemas.LessonStatusEnum.VERIFIED.value, "verified_at": datetime.now(timezone.utc), "verified_by": admin.id},
+    )
 
 
 # Nested PracticeTask routes
@@ -206,12 +211,15 @@ def create_task_for_lesson(lesson_id: str, task: schemas.PracticeTaskBase):
 
 
 @router.get("/lessons/{lesson_id}/practice_tasks/", response_model=List[schemas.PracticeTask])
-def read_tasks_for_lesson(lesson_id: str, limit: int = 100):
+def read_tasks_for_lesson(
+    lesson_id: str, response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None
+):
     db_lesson = crud.crud_lesson.get(hash_key=lesson_id)
     if db_lesson is None:
         raise HTTPException(status_code=404, detail="Lesson not found")
-    tasks = crud.crud_practice_task.get_by_lesson(lesson_id=lesson_id)
-    return tasks
+    page = crud.crud_practice_task.get_by_lesson(lesson_id=lesson_id, limit=limit, cursor=cursor)
+    set_next_cursor(response, page)
+    return page.items
 
 
 # Nested Quiz routes
@@ -226,9 +234,50 @@ def create_quiz_for_lesson(lesson_id: str, quiz: schemas.QuizBase):
 
 
 @router.get("/lessons/{lesson_id}/quizzes/", response_model=List[schemas.Quiz])
-def read_quizzes_for_lesson(lesson_id: str, limit: int = 100):
+def read_quizzes_for_lesson(
+    lesson_id: str, response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None
+):
     db_lesson = crud.crud_lesson.get(hash_key=lesson_id)
     if db_lesson is None:
         raise HTTPException(status_code=404, detail="Lesson not found")
-    quizzes = crud.crud_quiz.get_by_lesson(lesson_id=lesson_id)
-    return quizzes
+    page = crud.crud_quiz.get_by_lesson(lesson_id=lesson_id, limit=limit, cursor=cursor)
+    set_next_cursor(response, page)
+    return page.items
+
+
+# Operational routes
+@router.get("/dynamodb/latency")
+def read_dynamodb_latency():
+    """Per table and operation DynamoDB latency histograms for this instance."""
+    return db.latency_snapshot()
+
+
+@router.get("/warmup")
+def read_warmup_report():
+    """Steps run by this instance's startup warmup and how long each took."""
+    return warmup.last_report or {}
+
+
+@router.post("/exports/{dataset}", response_model=schemas.ExportJob, status_code=status.HTTP_202_ACCEPTED)
+def start_export(dataset: str, background_tasks: BackgroundTasks, format: str = Query("csv"), segments: int = Query(4, ge=1, le=16)):
+    """Export a dataset to S3 in the background; poll the status route for the download URLs."""
+    if dataset not in export.DATASETS:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    if not settings.export_s3_bucket:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Exports need EXPORT_S3_BUCKET; use manage.py export")
+    try:
+        export_id = export.start_s3_export(background_tasks, dataset, fmt=format, segments=segments)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"export_id": export_id, "status": "pending"}
+
+
+@router.get("/exports/{dataset}/{export_id}", response_model=schemas.ExportJob)
+def read_export(dataset: str, export_id: str = Path(..., pattern=r"^\d{8}T\d{6}Z-[0-9a-f]{8}$")):
+    """Progress of an export, with presigned download URLs of its chunks once it is ready."""
+    if dataset not in export.DATASETS or not settings.export_s3_bucket:
+        raise HTTPException(status_code=404, detail="Export not found")
+    job = export.export_status(dataset, export_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return job
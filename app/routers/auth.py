@@ -2,7 +2,7 @@
 from fastapi import APIRouter, status, HTTPException
 
 import logging
-from .. import schemas
+from .. import schemas, crud
 from ..models import User
 from .. import utils, dependencies
 
@@ -17,29 +17,36 @@ router = APIRouter(tags=["Authentication"])
 def login(
     user_credentials: schemas.UserLogin,
 ):
-    try:
-        matching_user = next(User.email_index.query(user_credentials.email))
-        user = User.get(matching_user.id)
-    except StopIteration:
-        user = None
-    except Exception as e:
-        logger.error(f"Database error during user lookup for email {user_credentials.email}: {e}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
+    user = crud.crud_user.get_by_email(user_credentials.email)
 
     if not user:
         print("No user found with the provided email.")
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid Credentials")
 
-    if not utils.verify(user_credentials.password, user.password):
+    verified, new_hash = utils.verify_and_update(user_credentials.password, user.password)
+    if not verified:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid Credentials")
 
+    if user.is_active is False:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
+
+    if new_hash:
+        # Stored hash uses an outdated cost or scheme; replace it while we have the plain password
+        try:
+            user.update(actions=[User.password.set(new_hash)])
+        except Exception as e:
+            logger.warning(f"Failed to rehash password for user {user.id}: {e}")
+
     # --- Create access token ---
     access_token = dependencies.create_access_token(
         data={
             "user_id": user.id,  # Assuming user.id is the hash key
             "email": user.email,
             "username": user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
             "role": user.role,  # This is the string value
+            "is_active": user.is_active is not False,
         }
     )
     return {"access_token": access_token, "token_type": "bearer"}
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from .. import schemas, services, models
-from ..dependencies import get_current_student
+from fastapi import APIRouter, Depends, HTTPException, Path, status
+from .. import schemas, services, models, crud
+from ..dependencies import get_current_student, get_current_admin
 import logging
 
 # Configure logging
@@ -40,3 +40,28 @@ def admin_dashboard():
     except Exception as e:
         logger.error(f"Error fetching admin dashboard: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
+
+
+# Cohort analytics; numpy is imported with app.analytics on first use to keep cold starts lean
+@router.get("/admin/analytics/subjects/{subject_id}", response_model=schemas.CohortAnalytics, dependencies=[Depends(get_current_admin)])
+def subject_analytics(subject_id: str):
+    from .. import analytics
+
+    if crud.crud_subject.get(hash_key=subject_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subject not found")
+    try:
+        return analytics.subject_analytics(subject_id)
+    except Exception as e:
+        logger.error(f"Error computing analytics for subject {subject_id}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
+
+
+@router.get("/admin/analytics/grades/{grade_level}", response_model=schemas.CohortAnalytics, dependencies=[Depends(get_current_admin)])
+def grade_analytics(grade_level: int = Path(..., ge=1, le=12)):
+    from .. import analytics
+
+    try:
+        return analytics.grade_analytics(grade_level)
+    except Exception as e:
+        logger.error(f"Error computing analytics for grade {grade_level}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from typing import List, Optional
 import logging
 from .. import crud, schemas, models, services
 from ..dependencies import get_current_student
+from ..ratelimit import rate_limit
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, set_next_cursor
+from ..http_cache import LESSON_CACHE_CONTROL, LESSON_TASKS_CACHE_CONTROL, make_etag, etag_matches, not_modified, set_cache_headers
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,35 +15,63 @@ router = APIRouter(prefix="/lessons", tags=["lessons"])
 
 
 @router.get("/{lesson_id}/", response_model=schemas.Lesson)
-def get_lesson(lesson_id: str):
+def get_lesson(lesson_id: str, request: Request, response: Response):
     try:
         lesson = crud.crud_lesson.get(hash_key=lesson_id)
         if not lesson:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No lesson found for this subject")
+
+        # Content stays compressed and unserialized when the client copy is current
+        etag = make_etag(lesson.id, lesson.updated_at.isoformat())
+        if etag_matches(request, etag):
+            return not_modified(etag, LESSON_CACHE_CONTROL)
+        set_cache_headers(response, etag, LESSON_CACHE_CONTROL)
         return lesson
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching lesson {lesson_id}: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
 
 
 @router.get("/{lesson_id}/tasks/", response_model=List[schemas.PracticeTask])
-def get_tasks(lesson_id: str):
+def get_tasks(
+    lesson_id: str, request: Request, response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None
+):
     try:
-        tasks = crud.crud_practice_task.get_by_lesson(lesson_id=lesson_id)
-        return tasks
+        page = crud.crud_practice_task.get_by_lesson(lesson_id=lesson_id, limit=limit, cursor=cursor)
+        etag = make_etag(lesson_id, page.next_cursor, *(f"{task.id}@{task.updated_at.isoformat()}" for task in page.items))
+        if etag_matches(request, etag):
+            return not_modified(etag, LESSON_TASKS_CACHE_CONTROL)
+        set_cache_headers(response, etag, LESSON_TASKS_CACHE_CONTROL)
+        set_next_cursor(response, page)
+        return page.items
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching tasks for lesson {lesson_id}: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
 
 
-@router.get("/{lesson_id}/quiz/", response_model=schemas.Quiz)
+@router.get("/{lesson_id}/quiz/", response_model=schemas.Quiz, dependencies=[Depends(rate_limit("quiz_start"))])
 async def get_quiz(lesson_id: str, student: models.Student = Depends(get_current_student)):
     try:
         # Check for successful quiz attempts for this lesson by the student
         lesson = crud.crud_lesson.get(lesson_id)
+        if lesson is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Lesson not found")
         new_quiz = await services.generate_quiz(lesson, student)
         return new_quiz
 
+    except services.QuizGenerationError as e:
+        logger.error(f"Error generating quiz for lesson {lesson_id}: {e}")
+        if e.unavailable:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Quiz generation is unavailable, please retry later")
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Quiz generation failed")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching quiz for lesson {lesson_id}: {e}")
         raise HTTPException(
@@ -50,11 +81,18 @@ async def get_quiz(lesson_id: str, student: models.Student = Depends(get_current
 
 
 @router.get("/{lesson_id}/attempts/", response_model=List[schemas.QuizAttemptOut])
-def get_quiz_attempts(lesson_id: str, student: models.Student = Depends(get_current_student)):
+def get_quiz_attempts(
+    lesson_id: str,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    student: models.Student = Depends(get_current_student),
+):
     try:
-        quizzes = crud.crud_quiz.get_by_lesson_student(lesson_id=lesson_id, student_id=student.user_id)
+        page = crud.crud_quiz.get_by_lesson_student(lesson_id=lesson_id, student_id=student.user_id, limit=limit, cursor=cursor)
+        set_next_cursor(response, page)
         attempts_out = []
-        for quiz in quizzes:
+        for quiz in page.items:
             questions_map = {q.question_id: q for q in quiz.quiz_questions}
 
             responses_out = []
@@ -87,6 +125,8 @@ def get_quiz_attempts(lesson_id: str, student: models.Student = Depends(get_curr
                 )
             )
         return attempts_out
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching quiz attempts for lesson {lesson_id}: {e}")
         raise HTTPException(
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status
 from typing import List
 import logging
 from ..dependencies import get_current_student
+from ..ratelimit import rate_limit
 from .. import schemas, services, models
+from ..utils import run_in_thread
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -10,20 +12,42 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/quizzes", tags=["quizzes"])
 
+# Suggested client poll interval while feedback is pending
+FEEDBACK_RETRY_AFTER_SECONDS = 2
 
-@router.post("/{quiz_id}/submit", response_model=schemas.QuizSubmissionResponse)
+
+@router.post("/{quiz_id}/submit", response_model=schemas.QuizSubmissionResponse, dependencies=[Depends(rate_limit("quiz_submit"))])
 async def submit_quiz(
     quiz_id: str,
     responses: List[schemas.QuizResponse],
+    background_tasks: BackgroundTasks,
     current_student: models.Student = Depends(get_current_student),
 ):
     try:
         return await services.submit_quiz_responses(
             quiz_id,
             responses,
+            background_tasks,
         )
+    except services.QuizAlreadySubmittedError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error submitting quiz for student {current_student.user_id}: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
+
+
+@router.get("/{quiz_id}/feedback", response_model=schemas.QuizFeedback)
+async def get_quiz_feedback(quiz_id: str, response: Response, current_student: models.Student = Depends(get_current_student)):
+    """AI feedback of a submitted attempt; while it is pending, Retry-After says when to poll again."""
+    try:
+        quiz = await run_in_thread(models.Quiz.get, quiz_id, attributes_to_get=["id", "student_id", "ai_feedback", "feedback_status"])
+    except models.Quiz.DoesNotExist:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quiz not found")
+    if quiz.student_id != current_student.user_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quiz not found")
+
+    if quiz.feedback_status == models.FeedbackStatusEnum.PENDING.value:
+        response.headers["Retry-After"] = str(FEEDBACK_RETRY_AFTER_SECONDS)
+    return {"quiz_id": quiz.id, "feedback_status": quiz.feedback_status, "ai_feedback": quiz.ai_feedback}
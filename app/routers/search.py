@@ -0,0 +1,38 @@
+import logging
+import time
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query, status
+
+from .. import schemas
+from ..config import settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+@router.get("/", response_model=schemas.SearchResults)
+def search_catalog(
+    q: str = Query(..., min_length=1, max_length=200),
+    language: Optional[schemas.LanguageChoicesEnum] = None,
+    kind: Optional[Literal["lesson", "subject"]] = Query(None, alias="type"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    if not settings.search_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Search is disabled")
+    # numpy is imported with app.search on first use, to keep cold starts lean
+    from .. import search
+
+    start = time.perf_counter()
+    try:
+        hits = search.search_index.search(q, language.value if language else None, kind, limit)
+    except search.IndexNotBuiltError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Search index is not available yet")
+    except Exception as e:
+        logger.error(f"Error searching for {q!r}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Search error")
+    return schemas.SearchResults(query=q, hits=hits, took_ms=round((time.perf_counter() - start) * 1000, 3))
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from .. import schemas, models, crud, services
 from ..dependencies import get_current_student
-from typing import List
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, set_next_cursor
+from ..http_cache import SUBJECTS_CACHE_CONTROL, SUBJECT_CACHE_CONTROL, make_etag, etag_matches, not_modified, set_cache_headers
+from typing import List, Optional
 import logging
 
 # Configure logging
@@ -12,23 +14,35 @@ router = APIRouter(prefix="/subjects", tags=["subjects"])
 
 
 @router.get("/", response_model=List[schemas.Subject])
-def get_subjects(limit: int = 100):
+def get_subjects(
+    request: Request, response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None
+):
     try:
-        subjects = crud.crud_subject.get_multi(limit=limit)
-        if not subjects:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No subjects found")
-        return subjects
+        page = crud.crud_subject.get_multi(limit=limit, cursor=cursor)
+        etag = make_etag(page.next_cursor, *(f"{subject.id}@{subject.updated_at.isoformat()}" for subject in page.items))
+        if etag_matches(request, etag):
+            return not_modified(etag, SUBJECTS_CACHE_CONTROL)
+        set_cache_headers(response, etag, SUBJECTS_CACHE_CONTROL)
+        set_next_cursor(response, page)
+        return page.items
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching subjects: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
 
 
 @router.get("/{subject_id}/", response_model=schemas.SubjectDetail)
-def get_subject(subject_id: str):
+def get_subject(subject_id: str, request: Request, response: Response):
     subject = crud.crud_subject.get(hash_key=subject_id)
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
 
+    etag = make_etag(subject.id, subject.updated_at.isoformat())
+    if etag_matches(request, etag):
+        return not_modified(etag, SUBJECT_CACHE_CONTROL)
+    set_cache_headers(response, etag, SUBJECT_CACHE_CONTROL)
+
     return schemas.SubjectDetail(
         id=subject.id,
         name=subject.name,
@@ -145,12 +145,17 @@ def update_me(user_update: schemas.UserUpdate, current_user: schemas.User = Depe
     update_data = user_update.model_dump(exclude_unset=True)
     if isinstance(update_data.get("role"), enum.Enum):
         update_data["role"] = update_data["role"].value
+    role_changed = "role" in update_data and update_data["role"] != user_to_update.role
     for key, value in update_data.items():
         setattr(user_to_update, key, value)
 
     try:
         user_to_update.save()
+        if role_changed:
+            crud.crud_user.revoke_tokens(user_to_update.id)
         return user_to_update
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error updating user {current_user.id}: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not update user")
@@ -0,0 +1,151 @@
+"""
+Segmented parallel scans.
+
+`parallel_scan` runs one worker thread per scan segment and streams pages back through a
+bounded queue, so a full-table pass uses all segments' throughput while holding only a few
+pages in memory. Pages carry their segment's LastEvaluatedKey, which `ScanCheckpoint`
+persists once the caller has processed them, so an interrupted pass can resume where it
+stopped.
+"""
+
+import json
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Iterator, List, Optional, Type, TypeVar
+
+from pynamodb.models import Model
+
+ModelType = TypeVar("ModelType", bound=Model)
+
+_SEGMENT_DONE = object()
+
+
+@dataclass
+class ScanPage:
+    segment: int
+    items: List[Any]
+    last_evaluated_key: Optional[dict]  # None once the segment is exhausted
+    consumed_capacity: float
+
+
+class ScanCheckpoint:
+    """Per-segment scan positions in a JSON file: {"total_segments": n, "segments": {"0": key | "done"}, ...}."""
+
+    DONE = "done"
+
+    def __init__(self, path: str, total_segments: int, state: Optional[dict] = None):
+        self.path = path
+        self.total_segments = total_segments
+        self.state = state or {"total_segments": total_segments, "segments": {}}
+
+    @classmethod
+    def load(cls, path: str, total_segments: int) -> "ScanCheckpoint":
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state.get("total_segments") != total_segments:
+                raise ValueError(f"Checkpoint {path} was written with {state.get('total_segments')} segments, not {total_segments}")
+            return cls(path, total_segments, state)
+        return cls(path, total_segments)
+
+    def start_key(self, segment: int) -> Optional[dict]:
+        position = self.state["segments"].get(str(segment))
+        return None if position == self.DONE else position
+
+    def is_done(self, segment: int) -> bool:
+        return self.state["segments"].get(str(segment)) == self.DONE
+
+    def record(self, page: ScanPage) -> None:
+        self.state["segments"][str(page.segment)] = page.last_evaluated_key or self.DONE
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def parallel_scan(
+    model: Type[ModelType],
+    total_segments: int = 4,
+    attributes_to_get: Optional[List[str]] = None,
+    filter_condition=None,
+    page_size: Optional[int] = None,
+    checkpoint: Optional[ScanCheckpoint] = None,
+    max_pending_pages: Optional[int] = None,
+) -> Iterator[ScanPage]:
+    """
+    Scan `model` with `total_segments` concurrent segments, yielding pages as they arrive.
+
+    Pages of one segment are yielded in order; segments interleave. Segments the checkpoint
+    marks as done are skipped, the others start from their recorded key. Items are model
+    instances (partially populated when `attributes_to_get` is set).
+    """
+    pages: "queue.Queue" = queue.Queue(maxsize=max_pending_pages or 2 * total_segments)
+    stop = threading.Event()
+    connection = model._get_connection()
+
+    def put(value) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan_segment(segment: int) -> None:
+        try:
+            start_key = checkpoint.start_key(segment) if checkpoint else None
+            while not stop.is_set():
+                data = connection.scan(
+                    filter_condition=filter_condition,
+                    attributes_to_get=attributes_to_get,
+                    limit=page_size,
+                    return_consumed_capacity="TOTAL",
+                    segment=segment,
+                    total_segments=total_segments,
+                    exclusive_start_key=start_key,
+                )
+                start_key = data.get("LastEvaluatedKey")
+                page = ScanPage(
+                    segment=segment,
+                    items=[model.from_raw_data(item) for item in data.get("Items", [])],
+                    last_evaluated_key=start_key,
+                    consumed_capacity=data.get("ConsumedCapacity", {}).get("CapacityUnits", 0.0),
+                )
+                if not put(page) or start_key is None:
+                    break
+        except Exception as e:
+            put(e)
+        finally:
+            put(_SEGMENT_DONE)
+
+    segments = [s for s in range(total_segments) if not (checkpoint and checkpoint.is_done(s))]
+    if not segments:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=len(segments), thread_name_prefix=f"scan-{model.Meta.table_name}")
+    try:
+        for segment in segments:
+            executor.submit(scan_segment, segment)
+        remaining = len(segments)
+        while remaining:
+            value = pages.get()
+            if value is _SEGMENT_DONE:
+                remaining -= 1
+            elif isinstance(value, Exception):
+                raise value
+            else:
+                yield value
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
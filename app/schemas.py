@@ -1,6 +1,6 @@
 from datetime import datetime
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict
+from pydantic import BaseModel, Field, EmailStr, model_validator
+from typing import List, Literal, Optional, Dict
 from .models import UserRoleEnum, LessonStatusEnum, DifficultyLevelEnum, LanguageChoicesEnum
 
 
@@ -123,6 +123,7 @@ class QuizAttempt(QuizAttemptBase):
     score: Optional[float] = 0.0
     passed: bool
     ai_feedback: Optional[str] = None
+    feedback_status: Optional[str] = None
     quiz_version: Optional[int] = 0
     cheating_detected: bool
     responses: List[QuizResponse] = []
@@ -133,7 +134,13 @@ class QuizAttempt(QuizAttemptBase):
 
 class QuizSubmissionResponse(BaseModel):
     attempt: QuizAttempt
-    ai_feedback: str
+    ai_feedback: Optional[str] = None  # generated in the background, see QuizFeedback
+
+
+class QuizFeedback(BaseModel):
+    quiz_id: str
+    feedback_status: Optional[str] = None
+    ai_feedback: Optional[str] = None
 
 
 class DashboardStats(BaseModel):
@@ -143,11 +150,38 @@ class DashboardStats(BaseModel):
     streak: int
 
 
+class SearchHit(BaseModel):
+    type: Literal["lesson", "subject"]
+    id: str
+    title: str
+    subject_id: str
+    language: Optional[str] = None  # None for subjects
+    score: float
+
+
+class SearchResults(BaseModel):
+    query: str
+    hits: List[SearchHit]
+    took_ms: float
+
+
 class AIContentRequest(BaseModel):
-    user_messages: List[Dict[str, str]]
+    # Either the whole conversation every turn, or only the new `message` (plus the `session_id`
+    # returned by the previous turn) with the history kept server side
+    user_messages: Optional[List[Dict[str, str]]] = None
+    message: Optional[str] = Field(None, min_length=1)
+    session_id: Optional[str] = None
     subject_id: str
     lesson_id: Optional[str] = None
 
+    @model_validator(mode="after")
+    def check_conversation(self):
+        if (self.user_messages is None) == (self.message is None):
+            raise ValueError("Send either user_messages or message")
+        if self.session_id and self.message is None:
+            raise ValueError("session_id requires message")
+        return self
+
 
 class StudentResponseBase(BaseModel):
     attempt_id: str
@@ -251,6 +285,65 @@ class AdminDashboard(BaseModel):
         from_attributes = True
 
 
+class ScoreBucket(BaseModel):
+    min: int
+    max: int
+    count: int
+
+
+class ScoreStats(BaseModel):
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    p10: Optional[float] = None
+    p25: Optional[float] = None
+    p50: Optional[float] = None
+    p75: Optional[float] = None
+    p90: Optional[float] = None
+    histogram: List[ScoreBucket] = []
+
+
+class TimeTakenStats(BaseModel):
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    p95: Optional[float] = None
+
+
+class LessonAnalytics(BaseModel):
+    lesson_id: str
+    lesson_title: Optional[str] = None
+    attempts: int  # submitted
+    unsubmitted: int = 0  # quizzes generated but never submitted
+    students: int
+    pass_rate: Optional[float] = None
+    avg_score: Optional[float] = None
+    avg_time_taken_minutes: Optional[float] = None
+    difficulty: Optional[float] = None  # 1 - pass rate
+
+
+class CohortAnalytics(BaseModel):
+    subject_id: Optional[str] = None
+    grade_level: Optional[int] = None
+    subjects: Optional[int] = None
+    attempts: int  # submitted
+    unsubmitted: int = 0
+    students: int
+    lessons: int
+    pass_rate: Optional[float] = None
+    passing_score: float
+    score: ScoreStats
+    time_taken_minutes: TimeTakenStats
+    per_lesson: List[LessonAnalytics]  # hardest first
+
+
+class ExportJob(BaseModel):
+    export_id: str
+    status: Literal["pending", "running", "ready", "failed"]
+    rows: Optional[int] = None
+    chunks: Optional[int] = None
+    urls: List[str] = []  # presigned, once ready
+    error: Optional[str] = None
+
+
 class QuizAttemptResponsesOut(BaseModel):
     question_id: str
     question_text: str
@@ -267,6 +360,7 @@ class QuizAttemptOut(BaseModel):
     score: Optional[float] = 0.0
     passed: bool
     ai_feedback: Optional[str] = None
+    feedback_status: Optional[str] = None
     quiz_version: Optional[int] = 0
     cheating_detected: bool
     responses: List[QuizAttemptResponsesOut] = []
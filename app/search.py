@@ -0,0 +1,593 @@
+"""
+Full-text search over lessons and subjects.
+
+Documents are analyzed per language (app/text.py) and ranked with BM25 over a weighted sum
+of their fields: lesson title, tags, summary and content; subject name and description. The
+index is one immutable file (a segment): a JSON header with the vocabulary and document
+metadata, then posting ranges, postings and document lengths as flat arrays. The file is
+memory-mapped and the arrays are read in place with numpy, so a query only touches the
+postings of its terms.
+
+`manage.py build-search-index` builds the segment from the tables, offline. With
+`search_s3_bucket` set it is published to S3 and every instance downloads it at warmup,
+then checks the object's ETag every `search_reload_seconds` for a newer one; otherwise
+`search_index_path` is the index itself, shared through the file system (e.g. EFS). Searches
+never read the tables: until a segment has been built they fail with IndexNotBuiltError.
+
+Lesson and subject writes update the index incrementally. New versions go to an in-memory
+delta, and the documents they replace (or that were deleted) are masked in the segment, so
+the writing instance sees them at once. Once `search_merge_threshold` documents have
+changed, or at shutdown, the delta is merged into a new segment and published, with a
+conditional write that retries on the latest segment when another instance published first.
+A Lambda instance may be frozen or recycled before that, so there each change is also sent to
+a task (app/crud/main.py) that re-reads the item and publishes it right away.
+"""
+
+import json
+import logging
+import math
+import mmap
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from . import tasks
+from .config import settings
+from .crud.main import SEARCH_UPDATE_TASK
+from .models import Lesson, LessonStatusEnum, Subject
+from .text import analyze
+
+logger = logging.getLogger(__name__)
+
+LESSON, SUBJECT = "lesson", "subject"
+KINDS = (LESSON, SUBJECT)
+NO_LANGUAGE = ""  # subjects are not written in one language; they match queries in every language
+FIELD_WEIGHTS = {"title": 3.0, "tags": 2.0, "summary": 1.5, "content": 1.0}
+BM25_K1, BM25_B = 1.2, 0.75
+# Placeholders and retired lessons are not searchable
+UNSEARCHABLE_STATUSES = {LessonStatusEnum.PENDING.value, LessonStatusEnum.FAILED.value, LessonStatusEnum.ARCHIVED.value}
+
+MAGIC = b"KESI"
+FORMAT_VERSION = 1
+PUBLISH_ATTEMPTS = 3
+
+
+class IndexNotBuiltError(RuntimeError):
+    """No segment has been built yet; run manage.py build-search-index."""
+
+
+class PublishConflict(Exception):
+    """The shared segment changed since it was downloaded."""
+
+
+@dataclass
+class Document:
+    kind: str
+    id: str
+    title: str
+    subject_id: str
+    language: str
+    terms: Dict[str, float]  # term -> field-weighted frequency
+    length: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.kind}:{self.id}"
+
+    @property
+    def meta(self) -> list:
+        return [self.kind, self.id, self.title, self.subject_id, self.language]
+
+
+def _document(kind: str, id: str, title: str, subject_id: str, language: str, fields: Dict[str, str]) -> Document:
+    terms: Dict[str, float] = defaultdict(float)
+    length = 0.0
+    for field, text in fields.items():
+        weight = FIELD_WEIGHTS[field]
+        for term in analyze(text or "", language or None):
+            terms[term] += weight
+            length += weight
+    return Document(kind, id, title, subject_id, language, dict(terms), length)
+
+
+def lesson_document(lesson: Lesson) -> Optional[Document]:
+    if lesson.status in UNSEARCHABLE_STATUSES:
+        return None
+    fields = {"title": lesson.title, "tags": " ".join(lesson.tags or []), "summary": lesson.summary, "content": lesson.content}
+    return _document(LESSON, lesson.id, lesson.title, lesson.subject_id, lesson.language, fields)
+
+
+def subject_document(subject: Subject) -> Optional[Document]:
+    if subject.is_active is False:
+        return None
+    return _document(SUBJECT, subject.id, subject.name, subject.id, NO_LANGUAGE, {"title": subject.name, "summary": subject.description})
+
+
+def load_documents() -> Iterable[Document]:
+    """Every searchable subject and lesson, read from the tables."""
+    for subject in Subject.scan():
+        document = subject_document(subject)
+        if document is not None:
+            yield document
+    for lesson in Lesson.scan():
+        document = lesson_document(lesson)
+        if document is not None:
+            yield document
+
+
+def _pad(size: int) -> bytes:
+    return b"\0" * (-size % 8)
+
+
+def write_segment(path: str, metas: List[list], lengths: np.ndarray, vocabulary: List[str], terms: np.ndarray, docs: np.ndarray, tfs: np.ndarray) -> None:
+    """
+    Write a segment from postings given as parallel (term, doc, tf) arrays in any order;
+    `terms` index into `vocabulary`, whose unused entries are dropped.
+    """
+    used, terms = np.unique(terms, return_inverse=True)
+    order = np.lexsort((docs, terms))
+    terms, docs, tfs = terms[order], docs[order].astype(np.int32), tfs[order].astype(np.float32)
+    offsets = np.zeros(len(used) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(terms, minlength=len(used)), out=offsets[1:])
+    header = json.dumps(
+        {
+            "version": FORMAT_VERSION,
+            "built_at": time.time(),
+            "documents": metas,
+            "terms": [vocabulary[i] for i in used],
+            "postings": len(docs),
+            "total_length": float(lengths.sum()),
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+    header += b" " * (-(8 + len(header)) % 8)  # JSON allows trailing whitespace
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC + len(header).to_bytes(4, "little") + header)
+        for array in (offsets, docs, tfs, lengths.astype(np.float32)):
+            data = array.tobytes()
+            f.write(data + _pad(len(data)))
+    # Readers keep their mapping of the old file; new opens see the complete new one
+    os.replace(temporary, path)
+
+
+class Segment:
+    """A memory-mapped index file."""
+
+    def __init__(self, path: str):
+        self.mtime = os.stat(path).st_mtime_ns
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:4] != MAGIC:
+            raise ValueError(f"{path} is not a search index")
+        header_size = int.from_bytes(self._mmap[4:8], "little")
+        header = json.loads(self._mmap[8 : 8 + header_size])
+        if header["version"] != FORMAT_VERSION:
+            raise ValueError(f"{path} has index format {header['version']}, expected {FORMAT_VERSION}; run manage.py build-search-index")
+
+        self.metas: List[list] = header["documents"]
+        self.vocabulary: List[str] = header["terms"]
+        self.terms = {term: i for i, term in enumerate(self.vocabulary)}
+        self.keys = {f"{kind}:{id}": i for i, (kind, id, *_) in enumerate(self.metas)}
+        self.total_length = header["total_length"]
+        self.doc_count = len(self.metas)
+
+        position = 8 + header_size
+
+        def array(dtype, count: int) -> np.ndarray:
+            nonlocal position
+            values = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=position) if count else np.zeros(0, dtype=dtype)
+            position += values.nbytes + (-values.nbytes % 8)
+            return values
+
+        self.offsets = array(np.int64, len(self.vocabulary) + 1)
+        self.docs = array(np.int32, header["postings"])
+        self.tfs = array(np.float32, header["postings"])
+        self.lengths = array(np.float32, self.doc_count)
+
+        self.languages = sorted({meta[4] for meta in self.metas})
+        codes = {language: code for code, language in enumerate(self.languages)}
+        self.language = np.array([codes[meta[4]] for meta in self.metas], dtype=np.int16)
+        self.kind = np.array([KINDS.index(meta[0]) for meta in self.metas], dtype=np.int8)
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        t = self.terms.get(term)
+        if t is None:
+            return None
+        start, end = self.offsets[t], self.offsets[t + 1]
+        return self.docs[start:end], self.tfs[start:end]
+
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    import boto3
+
+    return boto3.client("s3", region_name=settings.aws_region)
+
+
+class S3Store:
+    """The shared segment: one S3 object, whose ETag identifies the version an instance has."""
+
+    def __init__(self, bucket: str, key: str):
+        self.bucket = bucket
+        self.key = key
+
+    @property
+    def uri(self) -> str:
+        return f"s3://{self.bucket}/{self.key}"
+
+    def etag(self) -> Optional[str]:
+        from botocore.exceptions import ClientError
+
+        try:
+            return get_s3_client().head_object(Bucket=self.bucket, Key=self.key)["ETag"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+
+    def download(self, path: str) -> Optional[str]:
+        """Replace `path` with the shared segment and return its ETag; None if none was published."""
+        client = get_s3_client()
+        try:
+            response = client.get_object(Bucket=self.bucket, Key=self.key)
+        except client.exceptions.NoSuchKey:
+            return None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.download"
+        with open(temporary, "wb") as f:
+            for chunk in response["Body"].iter_chunks(1024 * 1024):
+                f.write(chunk)
+        os.replace(temporary, path)
+        return response["ETag"]
+
+    def upload(self, path: str, etag: Optional[str] = None, force: bool = False) -> str:
+        """
+        Publish the segment at `path` and return its ETag. Unless `force`, it only replaces the
+        version `etag` (or only creates the object when `etag` is None), else PublishConflict.
+        """
+        from botocore.exceptions import ClientError
+
+        conditions = {} if force else {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+        try:
+            with open(path, "rb") as f:
+                return get_s3_client().put_object(Bucket=self.bucket, Key=self.key, Body=f, **conditions)["ETag"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict"):
+                raise PublishConflict(self.uri) from e
+            raise
+
+
+def _postings(documents: List[Document], vocabulary: List[str], term_ids: Dict[str, int], base: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(term, doc, tf) arrays for `documents`, numbered from `base`; new terms are appended to `vocabulary`."""
+    terms, docs, tfs = [], [], []
+    for i, document in enumerate(documents):
+        for term, tf in document.terms.items():
+            t = term_ids.get(term)
+            if t is None:
+                t = term_ids[term] = len(vocabulary)
+                vocabulary.append(term)
+            terms.append(t)
+            docs.append(base + i)
+            tfs.append(tf)
+    return np.array(terms, dtype=np.int64), np.array(docs, dtype=np.int64), np.array(tfs, dtype=np.float32)
+
+
+class SearchIndex:
+    def __init__(self, path: str, merge_threshold: int = 50, reload_seconds: int = 30, store: Optional[S3Store] = None):
+        self.path = path
+        self.merge_threshold = merge_threshold
+        self.reload_seconds = reload_seconds
+        self.store = store
+        self._segment: Optional[Segment] = None
+        self._etag: Optional[str] = None  # version of the shared segment that is open
+        self._deleted = np.zeros(0, dtype=bool)  # segment documents replaced by the delta or removed
+        self._delta: Dict[str, Document] = {}
+        self._removed: set = set()  # keys removed since the segment was written
+        self._checked_at: Optional[float] = None
+        self._lock = threading.RLock()
+        # Serializes writes of the file (downloads, merges, rebuilds); taken before _lock, never inside it
+        self._file_lock = threading.Lock()
+
+    def open(self) -> bool:
+        """Map the segment, downloading it from the store first if there is one; True when a segment is open."""
+        with self._lock:
+            if self._segment is not None:
+                return True
+            # Without a segment, check again only every reload_seconds
+            if self._checked_at is not None and time.monotonic() - self._checked_at < self.reload_seconds:
+                return False
+            self._checked_at = time.monotonic()
+        with self._file_lock:
+            if self.store is not None:
+                etag = self.store.download(self.path)
+                if etag is None:
+                    return False
+            elif os.path.exists(self.path):
+                etag = None
+            else:
+                return False
+            segment = Segment(self.path)
+        with self._lock:
+            if self._segment is None:
+                self._swap(segment, etag)
+            return True
+
+    def _swap(self, segment: Segment, etag: Optional[str] = None) -> None:
+        deleted = np.zeros(segment.doc_count, dtype=bool)
+        for key in (*self._delta, *self._removed):
+            i = segment.keys.get(key)
+            if i is not None:
+                deleted[i] = True
+        self._segment, self._deleted, self._etag = segment, deleted, etag
+        self._checked_at = time.monotonic()
+
+    def _refresh_if_due(self) -> None:
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.reload_seconds:
+                return
+            self._checked_at = time.monotonic()
+        # Outside _lock: other searches keep using the open segment meanwhile
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Error checking for a newer search index: {e}")
+
+    def refresh(self) -> None:
+        """Swap in a segment published (or a file rewritten) by another process since this one was opened."""
+        with self._file_lock:
+            if self.store is not None:
+                if self.store.etag() in (None, self._etag):
+                    return
+                etag = self.store.download(self.path)
+            else:
+                try:
+                    if os.stat(self.path).st_mtime_ns == self._segment.mtime:
+                        return
+                except FileNotFoundError:
+                    return
+                etag = None
+            segment = Segment(self.path)
+        with self._lock:
+            self._swap(segment, etag)
+
+    def _mask(self, key: str) -> None:
+        i = self._segment.keys.get(key)
+        if i is not None:
+            self._deleted[i] = True
+
+    def upsert(self, document: Document) -> None:
+        # Without a segment the change is left to the next build-search-index, which reads the tables
+        if not self.open():
+            return
+        with self._lock:
+            self._mask(document.key)
+            self._delta[document.key] = document
+            self._removed.discard(document.key)
+        self._merge_if_full()
+
+    def remove(self, key: str) -> None:
+        if not self.open():
+            return
+        with self._lock:
+            self._mask(key)
+            self._delta.pop(key, None)
+            if key in self._segment.keys:
+                self._removed.add(key)
+        self._merge_if_full()
+
+    def _merge_if_full(self) -> None:
+        if len(self._delta) + len(self._removed) >= self.merge_threshold:
+            self.merge()
+
+    def merge(self) -> None:
+        """
+        Write (and publish) a new segment with the delta folded in. When another process has
+        published first, the delta is merged into its segment instead; on failure it is kept
+        and retried on the next merge.
+        """
+        with self._file_lock:
+            for _ in range(PUBLISH_ATTEMPTS):
+                with self._lock:
+                    if self._segment is None or not (self._delta or self._removed):
+                        return
+                    segment, keep, etag = self._segment, ~self._deleted, self._etag
+                    delta, removed = dict(self._delta), set(self._removed)
+                try:
+                    self._write_merged(segment, keep, list(delta.values()))
+                    if self.store is not None:
+                        etag = self.store.upload(self.path, etag)
+                except PublishConflict:
+                    etag = self.store.download(self.path)
+                    with self._lock:
+                        self._swap(Segment(self.path), etag)
+                    continue
+                except Exception as e:
+                    logger.error(f"Error writing search index {self.path}: {e}")
+                    return
+                with self._lock:
+                    # Changes made while the segment was written stay in the delta
+                    for key, document in delta.items():
+                        if self._delta.get(key) is document:
+                            del self._delta[key]
+                    self._removed -= removed
+                    self._swap(Segment(self.path), etag)
+                return
+            logger.warning(f"Search index was published by other processes during {PUBLISH_ATTEMPTS} merges, keeping the delta")
+
+    def _write_merged(self, segment: Segment, keep: np.ndarray, delta: List[Document]) -> None:
+        position = np.cumsum(keep) - 1  # new number of each kept segment document
+        live = keep[segment.docs]
+        posting_terms = np.repeat(np.arange(len(segment.vocabulary)), np.diff(segment.offsets))
+
+        vocabulary, term_ids = list(segment.vocabulary), dict(segment.terms)
+        delta_terms, delta_docs, delta_tfs = _postings(delta, vocabulary, term_ids, int(keep.sum()))
+        write_segment(
+            self.path,
+            [meta for meta, kept in zip(segment.metas, keep) if kept] + [document.meta for document in delta],
+            np.concatenate([segment.lengths[keep], np.array([document.length for document in delta], dtype=np.float32)]),
+            vocabulary,
+            np.concatenate([posting_terms[live], delta_terms]),
+            np.concatenate([position[segment.docs[live]], delta_docs]),
+            np.concatenate([segment.tfs[live], delta_tfs]),
+        )
+
+    def rebuild(self, documents: Iterable[Document]) -> Segment:
+        """
+        Write a new segment from `documents` and publish it over whatever version is shared;
+        changes made meanwhile stay in the delta and still apply.
+        """
+        documents = list(documents)
+        vocabulary: List[str] = []
+        terms, docs, tfs = _postings(documents, vocabulary, {}, 0)
+        lengths = np.array([document.length for document in documents], dtype=np.float32)
+        with self._file_lock:
+            write_segment(self.path, [document.meta for document in documents], lengths, vocabulary, terms, docs, tfs)
+            etag = self.store.upload(self.path, force=True) if self.store is not None else None
+            segment = Segment(self.path)
+        with self._lock:
+            self._swap(segment, etag)
+            return self._segment
+
+    def search(self, query: str, language: Optional[str] = None, kind: Optional[str] = None, limit: int = 10) -> List[dict]:
+        """
+        The best `limit` documents for `query`, best first. With `language`, lessons in other
+        languages are left out (subjects always match); `kind` keeps only lessons or subjects.
+        """
+        if not self.open():
+            raise IndexNotBuiltError(f"No search index at {self.store.uri if self.store else self.path}, run manage.py build-search-index")
+        self._refresh_if_due()
+        with self._lock:
+            segment, deleted, delta = self._segment, self._deleted.copy(), list(self._delta.values())
+
+        total = segment.doc_count + len(delta)
+        live = total - int(deleted.sum())
+        if not live:
+            return []
+        avg_length = ((segment.total_length + sum(document.length for document in delta)) / total) or 1.0
+        scores = np.zeros(segment.doc_count, dtype=np.float32)
+        delta_scores = [0.0] * len(delta)
+        languages = [language, NO_LANGUAGE] if language else sorted(set(segment.languages) | {document.language for document in delta})
+
+        # Each language analyzes the query its own way and scores only its own documents
+        for query_language in languages:
+            code = segment.languages.index(query_language) if query_language in segment.languages else None
+            for term in set(analyze(query, query_language or None)):
+                postings = segment.postings(term)
+                in_delta = [i for i, document in enumerate(delta) if document.language == query_language and term in document.terms]
+                df = (len(postings[0]) if postings else 0) + len(in_delta)
+                if not df:
+                    continue
+                idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+                if postings and code is not None:
+                    docs, tfs = postings
+                    same_language = segment.language[docs] == code
+                    docs, tfs = docs[same_language], tfs[same_language]
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * segment.lengths[docs] / avg_length)
+                    scores[docs] += idf * tfs * (BM25_K1 + 1) / (tfs + norm)
+                for i in in_delta:
+                    tf = delta[i].terms[term]
+                    delta_scores[i] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * delta[i].length / avg_length))
+
+        scores[deleted] = 0
+        if kind:
+            scores[segment.kind != KINDS.index(kind)] = 0
+        top = np.flatnonzero(scores)
+        if len(top) > limit:
+            top = top[np.argpartition(-scores[top], limit - 1)[:limit]]
+        ranked = [(float(scores[i]), segment.metas[i]) for i in top]
+        ranked += [(score, document.meta) for score, document in zip(delta_scores, delta) if score and (not kind or document.kind == kind)]
+        ranked.sort(key=lambda hit: -hit[0])
+        return [
+            {"type": meta[0], "id": meta[1], "title": meta[2], "subject_id": meta[3], "language": meta[4] or None, "score": round(score, 4)}
+            for score, meta in ranked[:limit]
+        ]
+
+
+search_index = SearchIndex(
+    settings.search_index_path,
+    settings.search_merge_threshold,
+    settings.search_reload_seconds,
+    S3Store(settings.search_s3_bucket, settings.search_s3_key) if settings.search_s3_bucket else None,
+)
+
+
+def _document_for(key: str) -> Optional[Document]:
+    """The current document for `key`, read from its table; None if it was deleted or is not searchable."""
+    kind, id = key.split(":", 1)
+    model = Lesson if kind == LESSON else Subject
+    try:
+        item = model.get(id)
+    except model.DoesNotExist:
+        return None
+    return lesson_document(item) if kind == LESSON else subject_document(item)
+
+
+def update_documents(keys: List[str]) -> None:
+    """Re-read `keys` from the tables and publish them in the shared segment (the search update task)."""
+    if not search_index.open():
+        return
+    for key in keys:
+        document = _document_for(key)
+        if document is None:
+            search_index.remove(key)
+        else:
+            search_index.upsert(document)
+    search_index.merge()
+
+
+def _share(key: str) -> None:
+    # The delta of a Lambda instance could die with it, so publish the change from a task now
+    if search_index.store is not None and tasks.dispatches_to_lambda():
+        tasks.invoke(SEARCH_UPDATE_TASK, keys=[key])
+
+
+# Called from the lesson and subject writes in app/crud; failures are logged, the write itself succeeded
+def index_lesson(lesson: Lesson) -> None:
+    if not settings.search_enabled:
+        return
+    key = f"{LESSON}:{lesson.id}"
+    try:
+        document = lesson_document(lesson)
+        if document is None:
+            search_index.remove(key)
+        else:
+            search_index.upsert(document)
+        _share(key)
+    except Exception as e:
+        logger.error(f"Error indexing lesson {lesson.id} for search: {e}")
+
+
+def index_subject(subject: Subject) -> None:
+    if not settings.search_enabled:
+        return
+    key = f"{SUBJECT}:{subject.id}"
+    try:
+        document = subject_document(subject)
+        if document is None:
+            search_index.remove(key)
+        else:
+            search_index.upsert(document)
+        _share(key)
+    except Exception as e:
+        logger.error(f"Error indexing subject {subject.id} for search: {e}")
+
+
+def remove(kind: str, id: str) -> None:
+    if not settings.search_enabled:
+        return
+    key = f"{kind}:{id}"
+    try:
+        search_index.remove(key)
+        _share(key)
+    except Exception as e:
+        logger.error(f"Error removing {kind} {id} from search: {e}")
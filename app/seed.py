@@ -0,0 +1,256 @@
+"""
+Streaming seed pipeline.
+
+seed_db.py writes the curriculum as NDJSON, one record per line. `seed_from_file` reads it
+lazily, validates records in batches, and writes them through concurrent batch writes, so
+memory stays bounded by a few batches whatever the file size. IDs are derived from each
+record's natural key (uuid5), so a rerun overwrites the same items instead of adding
+duplicates; fields the app changes after seeding (a lesson's moderation status, verification
+and creation times) are read back and kept. Items are written directly, not through the CRUD
+layer, so the search and passage indexes are not updated.
+"""
+
+import json
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Annotated, Callable, Dict, Iterable, Iterator, List, Literal, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from pynamodb.models import Model
+
+from .models import DifficultyLevelEnum, Lesson, LessonStatusEnum, Subject, User, UserRoleEnum
+from .utils import hash
+
+SEED_NAMESPACE = uuid.UUID("6f1b2d64-3c1e-4f5a-9a57-5e0b8d2c7a41")
+
+# BatchWriteItem accepts at most 25 items
+WRITE_CHUNK_SIZE = 25
+
+
+def seed_id(kind: str, *key) -> str:
+    """Deterministic ID for a seeded item from its natural key."""
+    return str(uuid.uuid5(SEED_NAMESPACE, ":".join([kind, *map(str, key)])))
+
+
+def subject_seed_id(grade_level: int, name: str) -> str:
+    return seed_id("subject", grade_level, name)
+
+
+def lesson_seed_id(grade_level: int, subject_name: str, language: str, order_in_subject: int) -> str:
+    return seed_id("lesson", grade_level, subject_name, language, order_in_subject)
+
+
+def user_seed_id(email: str) -> str:
+    return seed_id("user", email.lower())
+
+
+class SeedSubject(BaseModel):
+    type: Literal["subject"]
+    name: str = Field(..., max_length=100)
+    description: Optional[str] = None
+    grade_level: int = Field(..., ge=1, le=12)
+    is_active: bool = True
+
+
+class SeedLesson(BaseModel):
+    type: Literal["lesson"]
+    subject_name: str = Field(..., max_length=100)
+    grade_level: int = Field(..., ge=1, le=12)
+    title: str = Field(..., max_length=255)
+    language: str
+    content: str
+    difficulty: DifficultyLevelEnum = DifficultyLevelEnum.MEDIUM
+    order_in_subject: int = Field(..., ge=1)
+    status: Optional[LessonStatusEnum] = None
+
+
+class SeedUser(BaseModel):
+    type: Literal["user"]
+    username: str
+    email: str
+    password: str
+    role: UserRoleEnum = UserRoleEnum.STUDENT
+
+
+SeedRecord = Annotated[Union[SeedSubject, SeedLesson, SeedUser], Field(discriminator="type")]
+
+_record = TypeAdapter(SeedRecord)
+_records = TypeAdapter(List[SeedRecord])
+
+
+@dataclass
+class SeedStats:
+    lines: int = 0
+    subjects: int = 0
+    lessons: int = 0
+    users: int = 0
+    skipped_users: int = 0
+    batches: int = 0
+    errors: List[str] = field(default_factory=list)
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    @property
+    def items(self) -> int:
+        return self.subjects + self.lessons + self.users
+
+
+def read_records(path: str, errors: Optional[List[str]] = None) -> Iterator[Tuple[int, dict]]:
+    """(line number, record) for each non-empty NDJSON line, read lazily; malformed lines are added to `errors` and skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                if errors is None:
+                    raise
+                errors.append(f"line {line_number}: invalid JSON: {e.msg}")
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _validate(batch: List[Tuple[int, dict]], stats: SeedStats) -> List[SeedRecord]:
+    """Validate a batch in one pass; on failure, revalidate record by record to report line numbers."""
+    try:
+        return _records.validate_python([raw for _, raw in batch])
+    except ValidationError:
+        pass
+    records = []
+    for line_number, raw in batch:
+        try:
+            records.append(_record.validate_python(raw))
+        except ValidationError as e:
+            error = e.errors()[0]
+            location = ".".join(str(part) for part in error["loc"])
+            stats.errors.append(f"line {line_number}: {location}: {error['msg']}")
+    return records
+
+
+def _to_item(record: SeedRecord, instructor_id: str) -> Model:
+    if isinstance(record, SeedSubject):
+        return Subject(
+            id=subject_seed_id(record.grade_level, record.name),
+            name=record.name,
+            description=record.description,
+            grade_level=record.grade_level,
+            is_active=record.is_active,
+        )
+    if isinstance(record, SeedLesson):
+        lesson = Lesson(
+            id=lesson_seed_id(record.grade_level, record.subject_name, record.language, record.order_in_subject),
+            subject_id=subject_seed_id(record.grade_level, record.subject_name),
+            instructor_id=instructor_id,
+            title=record.title,
+            language=record.language,
+            content=record.content,
+            difficulty=record.difficulty.value,
+            order_in_subject=record.order_in_subject,
+        )
+        if record.status:
+            lesson.status = record.status.value
+        return lesson
+    return User(
+        id=user_seed_id(record.email),
+        username=record.username,
+        email=record.email,
+        password=hash(record.password),
+        role=record.role.value,
+    )
+
+
+# Attributes of existing items that a reseed keeps instead of resetting
+PRESERVED_ATTRIBUTES: Dict[Type[Model], List[str]] = {
+    Lesson: ["status", "verified_at", "created_at"],
+    Subject: ["created_at"],
+}
+
+
+def _preserve_existing(model: Type[Model], items: List[Model]) -> None:
+    attributes = PRESERVED_ATTRIBUTES.get(model)
+    if not attributes:
+        return
+    existing = {item.id: item for item in model.batch_get([item.id for item in items], attributes_to_get=["id", *attributes])}
+    for item in items:
+        current = existing.get(item.id)
+        if current is None:
+            continue
+        for attribute in attributes:
+            if getattr(current, attribute, None) is not None:
+                setattr(item, attribute, getattr(current, attribute))
+
+
+def _write_chunk(model: Type[Model], items: List[Model]) -> int:
+    _preserve_existing(model, items)
+    with model.batch_write() as batch:
+        for item in items:
+            batch.save(item)
+    return len(items)
+
+
+def seed_from_file(
+    path: str,
+    instructor_id: str,
+    include_users: bool = False,
+    batch_size: int = 500,
+    workers: int = 8,
+    on_batch: Optional[Callable[[SeedStats], None]] = None,
+) -> SeedStats:
+    """
+    Seed subjects, lessons and (with `include_users`) users from an NDJSON file.
+
+    Existing users are left untouched, so reseeding never resets their passwords; existing
+    lessons keep their status, verification and creation times. Invalid records and
+    malformed lines are skipped and listed in `stats.errors`.
+    """
+    stats = SeedStats()
+    pending = set()
+
+    def drain(limit: int) -> None:
+        nonlocal pending
+        while len(pending) > limit:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="seed") as executor:
+        for batch in _batched(read_records(path, stats.errors), batch_size):
+            stats.lines += len(batch)
+            stats.batches += 1
+            by_model: Dict[Type[Model], List[Model]] = {}
+            for record in _validate(batch, stats):
+                if isinstance(record, SeedUser):
+                    if not include_users:
+                        continue
+                    if next(iter(User.email_index.query(record.email, limit=1)), None):
+                        stats.skipped_users += 1
+                        continue
+                    stats.users += 1
+                elif isinstance(record, SeedSubject):
+                    stats.subjects += 1
+                else:
+                    stats.lessons += 1
+                item = _to_item(record, instructor_id)
+                by_model.setdefault(type(item), []).append(item)
+
+            for model, items in by_model.items():
+                for chunk in _batched(items, WRITE_CHUNK_SIZE):
+                    pending.add(executor.submit(_write_chunk, model, chunk))
+            # Keep a bounded number of writes in flight so reading never runs far ahead
+            drain(2 * workers)
+            if on_batch:
+                on_batch(stats)
+        drain(0)
+    return stats
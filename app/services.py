@@ -3,15 +3,18 @@ from typing import List, Dict, Tuple
 from fastapi import BackgroundTasks
 from . import schemas
 from .ai import generate_content as ai
-from .models import Lesson, PracticeTask, Quiz, Student, Subject
+from .ai.context import invalidate_lesson_context
+from .models import Lesson, PracticeTask, Quiz, Student, Subject, FeedbackStatusEnum, QUIZ_ATTEMPT_LIMIT
 from pynamodb.transactions import TransactWrite
-from pynamodb.exceptions import TransactWriteError
-from pynamodb.connection import Connection
+from pynamodb.exceptions import PutError, TransactWriteError
+from . import db
 from datetime import datetime, timezone
 import uuid
 from .utils import run_in_thread
+from .cache import catalog_cache
 import asyncio
 from . import crud
+from . import tasks
 from collections import defaultdict
 
 def group_attempts_by_lesson(attempts: List[Quiz]) -> Dict[str, List[Quiz]]:
@@ -24,8 +27,9 @@ def analyze_attempts(attempts: List[Quiz]) -> Tuple[int, bool]:
     """Return (max_score, is_completed) for a lesson's attempts"""
     max_score, is_completed = 0, False
     for a in attempts:
-        if a.score > max_score:
-            max_score = getattr(a, "score", 0)
+        score = a.score or 0
+        if score > max_score:
+            max_score = score
         if a.passed:
             is_completed = True
     return max_score, is_completed
@@ -48,7 +52,7 @@ def calculate_streak(passed_attempts: List[Quiz]) -> int:
 async def get_subject_details_data(subject: Subject, student: Student, attempts_incude=False) -> schemas.SubjectDetail:
     lessons, attempted_quizzes = await asyncio.gather(
         run_in_thread(crud.crud_lesson.get_by_subject_and_language, subject.id, student.language),
-        run_in_thread(crud.crud_quiz.get_by_subject_student, subject.id, student.user_id)
+        run_in_thread(crud.crud_quiz.get_summaries_by_subject_student, subject.id, student.user_id)
     )    
     if not lessons:
         return schemas.SubjectDetail(
@@ -136,6 +140,7 @@ async def get_student_dashboard_data(student: Student) -> schemas.StudentDashboa
 
 
 async def create_lesson_content(lesson_id: str, subject: str, grade_level: int, language_value: str, title: str):
+    db_lesson = None
     try:
         lesson_content = await ai.generate_lesson(
             subject=subject,
@@ -151,6 +156,8 @@ async def create_lesson_content(lesson_id: str, subject: str, grade_level: int,
 
         db_lesson.content = lesson_content
         db_lesson.status = "draft"
+        # TransactWrite bypasses BaseModel.save, keep updated_at (and the lesson ETag) current
+        db_lesson.updated_at = datetime.now(timezone.utc)
 
         practice_tasks = await ai.generate_practice_tasks(
             lesson_content=lesson_content,
@@ -172,21 +179,23 @@ async def create_lesson_content(lesson_id: str, subject: str, grade_level: int,
             )
             tasks.append(task_obj)
 
-        conn = Connection(region="us-east-1")
-        with TransactWrite(connection=conn) as transaction:
+        with TransactWrite(connection=db.get_connection()) as transaction:
             transaction.save(db_lesson)
             for task in tasks:
                 transaction.save(task)
+        catalog_cache.invalidate_lessons(db_lesson.subject_id, db_lesson.language)
+        invalidate_lesson_context(db_lesson.id)
+        await run_in_thread(crud.crud_lesson.reindex, db_lesson)
 
     except TransactWriteError as e:
         print(f"Transaction failed: {e}")
-        # Handle transaction error, maybe update lesson status to 'FAILED'
-        db_lesson.status = "failed"
-        db_lesson.save()
+        # Through crud, so the failed lesson also leaves the search index
+        await run_in_thread(crud.crud_lesson.update, db_lesson, {"status": "failed"})
     except Exception as e:
         print(f"Error in create_lesson_content: {e}")
-        db_lesson.status = "failed"
-        db_lesson.save()
+        db_lesson = db_lesson or await run_in_thread(crud.crud_lesson.get, hash_key=lesson_id)
+        if db_lesson is not None:
+            await run_in_thread(crud.crud_lesson.update, db_lesson, {"status": "failed"})
 
 
 async def create_lesson(
@@ -204,6 +213,7 @@ async def create_lesson(
         created_at=datetime.now(timezone.utc),
     )
     db_lesson.save()
+    catalog_cache.invalidate_lessons(subject_id, language_value)
 
     background_tasks.add_task(
         create_lesson_content, lesson_id=new_lesson_id, subject=subject, grade_level=grade_level, language_value=language_value, title=title
@@ -212,20 +222,26 @@ async def create_lesson(
     return db_lesson
 
 
-async def generate_quiz(lesson: Lesson, student: Student) -> schemas.Quiz:
-    try:
-        try:
-            quizzes = crud.crud_quiz.get_by_lesson_student(lesson.id, student.user_id)
-            quiz_version = max([quiz.quiz_version for quiz in quizzes]) + 1
-        except Exception as e:
-            print("Exception in generating quiz: ", str(e))
-            quiz_version = 1
+class QuizGenerationError(Exception):
+    """The LLM failed to produce a quiz; unavailable is set when retrying later may succeed."""
+
+    def __init__(self, message: str, unavailable: bool = False):
+        super().__init__(message)
+        self.unavailable = unavailable
+
+
+def _llm_unavailable(e: Exception) -> bool:
+    from openai import APIConnectionError, InternalServerError, RateLimitError
+
+    # APITimeoutError is an APIConnectionError
+    return isinstance(e, (APIConnectionError, InternalServerError, RateLimitError, asyncio.TimeoutError))
 
-        if quiz_version >= 3:
-            raise ValueError(
-                f"Student: {student.user_id}, is not able create a new quiz for lesson {lesson.id} due to limited quiz attemtps (3 attempts only)."
-            )
 
+async def generate_quiz(lesson: Lesson, student: Student) -> schemas.Quiz:
+    # Claim the attempt before any LLM call; over-limit requests stop here without calling the LLM
+    quiz_version = await run_in_thread(crud.crud_quiz_attempt_counter.increment, student.user_id, lesson.id, QUIZ_ATTEMPT_LIMIT)
+
+    try:
         db_quiz = Quiz(
             lesson_id=lesson.id,
             student_id=student.user_id,
@@ -235,38 +251,46 @@ async def generate_quiz(lesson: Lesson, student: Student) -> schemas.Quiz:
             start_time=datetime.now(timezone.utc),
         )
 
-        quiz_questions = await ai.generate_quiz_questions(
-            lesson_content=lesson.content,
-            grade_level=student.current_grade,
-            language=lesson.language,
-        )
-
-        for question_data in quiz_questions:
-            db_quiz.add_question(
-                question_text=question_data.question_text,
-                question_type=question_data.question_type,
-                options=question_data.options,
-                correct_answer=question_data.correct_answer,
+        try:
+            quiz_questions = await ai.generate_quiz_questions(
+                lesson_content=lesson.content,
+                grade_level=student.current_grade,
+                language=lesson.language,
             )
 
+            for question_data in quiz_questions:
+                db_quiz.add_question(
+                    question_text=question_data.question_text,
+                    question_type=question_data.question_type,
+                    options=question_data.options,
+                    correct_answer=question_data.correct_answer,
+                )
+        except Exception as e:
+            raise QuizGenerationError(f"Quiz generation failed: {e}", unavailable=_llm_unavailable(e)) from e
+
         db_quiz.save()
         return db_quiz
 
     except Exception as e:
         print(f"Error in generating quiz: {e}")
+        await run_in_thread(crud.crud_quiz_attempt_counter.decrement, student.user_id, lesson.id)
+        raise
+
 
+class QuizAlreadySubmittedError(ValueError):
+    pass
 
-async def submit_quiz_responses(quiz_id: str, responses: List[schemas.QuizResponse]) -> schemas.QuizSubmissionResponse:
+
+async def submit_quiz_responses(
+    quiz_id: str, responses: List[schemas.QuizResponse], background_tasks: BackgroundTasks
+) -> schemas.QuizSubmissionResponse:
     try:
         try:
             quiz = Quiz.get(quiz_id)
         except Quiz.DoesNotExist:
             raise ValueError("Quiz not found")
-
-        # Create quiz attempt
-
-        student_answers = []
-        correct_answers = []
+        if quiz.end_time is not None:
+            raise QuizAlreadySubmittedError("Quiz already submitted")
 
         # Process responses
         for response in responses:
@@ -280,23 +304,51 @@ async def submit_quiz_responses(quiz_id: str, responses: List[schemas.QuizRespon
                 raise ValueError(f"Question with id {question_id} not found in quiz {quiz_id}")
 
             is_correct = answer.strip().lower() == question.correct_answer.strip().lower()
-            student_answers.append(answer)
-            correct_answers.append(question.correct_answer)
             quiz.add_response(
                 question_id=question_id,  # Link to question
                 student_answer=answer,
                 is_correct=is_correct,
             )
 
-        # Generate AI feedback
-        ai_feedback = await ai.generate_quiz_feedback(student_answers=student_answers, correct_answers=correct_answers)
-
-        quiz.ai_feedback = ai_feedback
+        # Persist the graded attempt first; feedback is generated afterwards and attached to it
+        quiz.feedback_status = FeedbackStatusEnum.PENDING.value
         quiz.finish_quiz()
-        quiz.save()  # Update the attempt record
+        try:
+            # Conditional, so two concurrent submissions cannot both be graded and start feedback
+            quiz.save(condition=Quiz.end_time.does_not_exist())
+        except PutError as e:
+            if e.cause_response_code == "ConditionalCheckFailedException":
+                raise QuizAlreadySubmittedError("Quiz already submitted")
+            raise
 
-        return {"attempt": quiz, "ai_feedback": ai_feedback}
+        await run_in_thread(tasks.enqueue, background_tasks, "quiz_feedback", quiz_id=quiz.id)
+
+        return {"attempt": quiz, "ai_feedback": None}
 
     except Exception as e:
         print(f"Error in submit_quiz_responses: {e}")
         raise
+
+
+@tasks.task("quiz_feedback")
+async def generate_attempt_feedback(quiz_id: str):
+    """Generate AI feedback for a submitted attempt and store it on the quiz."""
+    try:
+        quiz = Quiz.get(quiz_id)
+    except Quiz.DoesNotExist:
+        print(f"Quiz {quiz_id} not found for feedback generation")
+        return
+    if quiz.feedback_status != FeedbackStatusEnum.PENDING.value:
+        # Already generated, e.g. a retried invocation
+        return
+
+    correct_answers_by_question = {q.question_id: q.correct_answer for q in quiz.quiz_questions or []}
+    student_answers = [r.student_answer for r in quiz.responses or []]
+    correct_answers = [correct_answers_by_question.get(r.question_id) for r in quiz.responses or []]
+
+    try:
+        ai_feedback = await ai.generate_quiz_feedback(student_answers=student_answers, correct_answers=correct_answers)
+        quiz.update(actions=[Quiz.ai_feedback.set(ai_feedback), Quiz.feedback_status.set(FeedbackStatusEnum.READY.value)])
+    except Exception as e:
+        print(f"Error generating feedback for quiz {quiz_id}: {e}")
+        quiz.update(actions=[Quiz.feedback_status.set(FeedbackStatusEnum.FAILED.value)])
@@ -0,0 +1,77 @@
+"""
+Work that runs after the response has been sent.
+
+In a long-running server FastAPI background tasks run once the response is out, but under
+Mangum on Lambda they run inside the same invocation, before the response is returned. On
+Lambda a task is therefore dispatched as an asynchronous ("Event") invocation of this same
+function, which `handler` in app/main.py routes back to `run`; elsewhere it stays a regular
+background task. Tasks must be idempotent: Lambda retries a failed asynchronous invocation.
+"""
+
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict
+
+from fastapi import BackgroundTasks
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+TASK_KEY = "khaneducation_task"
+
+_tasks: Dict[str, Callable[..., Awaitable[None]]] = {}
+
+
+def task(name: str):
+    """Register an async function as a task that `enqueue` can dispatch by name."""
+
+    def register(function):
+        _tasks[name] = function
+        return function
+
+    return register
+
+
+@lru_cache(maxsize=None)
+def get_lambda_client():
+    import boto3
+
+    return boto3.client("lambda", region_name=settings.aws_region)
+
+
+def _function_name():
+    return settings.tasks_function_name or os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+
+
+def dispatches_to_lambda() -> bool:
+    return bool(_function_name())
+
+
+def invoke(task_name: str, **kwargs) -> None:
+    """Run task `task_name` in an asynchronous invocation of the tasks function."""
+    payload = json.dumps({TASK_KEY: task_name, "kwargs": kwargs}).encode("utf-8")
+    # Event invocations return as soon as Lambda has queued the payload
+    get_lambda_client().invoke(FunctionName=_function_name(), InvocationType="Event", Payload=payload)
+
+
+def enqueue(background_tasks: BackgroundTasks, task_name: str, **kwargs) -> None:
+    """Run task `task_name` with JSON-serializable `kwargs` after the response."""
+    if dispatches_to_lambda():
+        invoke(task_name, **kwargs)
+    else:
+        background_tasks.add_task(_tasks[task_name], **kwargs)
+
+
+def is_task_event(event) -> bool:
+    return isinstance(event, dict) and TASK_KEY in event
+
+
+async def run(event: dict) -> None:
+    task_name = event[TASK_KEY]
+    if task_name not in _tasks:
+        logger.error(f"Unknown task {task_name}")
+        return
+    await _tasks[task_name](**event.get("kwargs", {}))
@@ -0,0 +1,82 @@
+"""
+Text analysis shared by search (app/search.py) and the assistant's retrieval (app/ai/retrieval.py).
+
+Arabic-script text is normalized the same way for every language: diacritics and tatweel
+removed, letters that Arabic, Persian, Urdu and Pashto write differently folded to one form,
+and zero-width non-joiners dropped so "کتاب‌ها" and "کتابها" are one word. `analyze` then
+drops the language's stopwords and strips common inflections with a light stemmer.
+"""
+
+import re
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+_WORD = re.compile(r"\w+")
+# Harakat, Quranic marks, superscript alef and tatweel
+_ARABIC_MARKS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+# Letters written differently across Arabic, Persian, Urdu and Pashto text, folded to one form
+_LETTER_FOLDS = str.maketrans(
+    {"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ي": "ی", "ى": "ی", "ئ": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه", "ہ": "ه", "ؤ": "و", "\u200c": None}
+)
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _ARABIC_MARKS.sub("", text).translate(_LETTER_FOLDS)
+
+
+def words(text: str) -> List[str]:
+    return _WORD.findall(normalize_text(text))
+
+
+_STOPWORDS = {
+    "English": "a an and are as at be but by can do does for from has have how in is it its of on or that the their this to was were what when "
+    "where which who why will with you your",
+    "Arabic": "في من على الى عن ان إن هذا هذه ذلك التي الذي هو هي ما لا كان مع او ثم قد كل بين و",
+    "Persian": "و در به از که این آن با را برای است هم یک تا بر می شود هر نیز یا",
+    "Urdu": "کے کی کا ہے میں اور سے کو نے یہ وہ پر ہیں بھی تھا ایک کیا",
+    "Pashto": "د په او چې ته دا هم یو له سره کې دی شي څه ولې کوم",
+}
+STOPWORDS: Dict[str, Set[str]] = {language: set(words(stopwords)) for language, stopwords in _STOPWORDS.items()}
+# Text with no language (subject names) is matched against every language's query
+ANY_LANGUAGE_STOPWORDS: Set[str] = set().union(*STOPWORDS.values())
+
+# (suffix, replacement), first match wins; the stem keeps at least MIN_STEM characters
+_ENGLISH_SUFFIXES = (
+    ("ational", "ate"), ("ization", "ize"), ("fulness", "ful"), ("iveness", "ive"), ("ousness", "ous"),
+    ("sses", "ss"), ("ies", "y"), ("ches", "ch"), ("shes", "sh"), ("xes", "x"),
+    ("ing", ""), ("edly", ""), ("ed", ""), ("ly", ""), ("ss", "ss"), ("s", ""),  # "ss" keeps "class" whole
+)  # fmt: skip
+# Suffixes are written after normalization (ي -> ی, ة -> ه)
+_SUFFIXES: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "English": _ENGLISH_SUFFIXES,
+    "Arabic": tuple((suffix, "") for suffix in ("ها", "ان", "ات", "ون", "ین", "یه", "ه", "ی")),
+    "Persian": tuple((suffix, "") for suffix in ("هایی", "های", "ها", "ترین", "تر", "ات")),
+    "Urdu": tuple((suffix, "") for suffix in ("وں", "یں", "ات")),
+    "Pashto": tuple((suffix, "") for suffix in ("ګانې", "ونه", "انو")),
+}
+# The Arabic article and the conjunctions/prepositions written attached to it
+_ARABIC_PREFIXES = ("وال", "بال", "کال", "فال", "لل", "ال")
+MIN_STEM = 3
+
+
+def stem(token: str, language: Optional[str]) -> str:
+    if language == "Arabic":
+        for prefix in _ARABIC_PREFIXES:
+            if token.startswith(prefix) and len(token) - len(prefix) >= MIN_STEM:
+                token = token[len(prefix) :]
+                break
+    suffixes = _SUFFIXES.get(language)
+    if suffixes is None:
+        # No language: stem Latin-script words as English, leave the rest as written
+        suffixes = _ENGLISH_SUFFIXES if token.isascii() else ()
+    for suffix, replacement in suffixes:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+            return token[: -len(suffix)] + replacement
+    return token
+
+
+def analyze(text: str, language: Optional[str] = None) -> List[str]:
+    """Normalized, stopword-free, stemmed terms of `text` in `language` (None: text in no particular language)."""
+    stopwords = STOPWORDS.get(language, ANY_LANGUAGE_STOPWORDS)
+    return [stem(token, language) for token in words(text) if token not in stopwords]
@@ -1,18 +1,36 @@
-from passlib.context import CryptContext
 import re
 import asyncio
+from functools import lru_cache
 from itertools import islice
-from typing import Iterable
+from typing import Iterable, Optional, Tuple
+from .config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """The bcrypt context, built on first use; passlib loads its backend lazily as well."""
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=settings.bcrypt_rounds,
+        bcrypt__min_rounds=settings.bcrypt_rounds,
+        bcrypt__max_rounds=settings.bcrypt_rounds,
+    )
 
 
 def hash(password: str):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def verify(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+
+def verify_and_update(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """Verify a password and, when its hash uses outdated parameters, return a replacement hash."""
+    return get_pwd_context().verify_and_update(plain_password, hashed_password)
 
 
 def is_strong_password(password: str) -> bool:
@@ -0,0 +1,110 @@
+"""
+Init-phase warmup.
+
+Runs once per process (during Lambda init, or at server startup) so that the first real
+request does not pay for connection setup, SDK imports, the bcrypt backend and the first
+catalog queries. Steps run in order until the time budget is spent; every step is timed
+and failures are logged, never raised.
+"""
+
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import FastAPI
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Payload key for explicit warm pings, e.g. {"warmup": true} from a scheduled rule's constant input
+WARM_PING_KEY = "warmup"
+
+last_report: Optional[dict] = None
+
+
+def _warm_dynamodb(app: FastAPI) -> None:
+    """Create the shared client and open a pooled connection with one cheap read."""
+    from .models import Subject
+
+    try:
+        Subject.get("__warmup__")
+    except Subject.DoesNotExist:
+        pass
+
+
+def _warm_catalog(app: FastAPI) -> None:
+    from . import crud
+
+    for grade_level in settings.warmup_grade_levels:
+        crud.crud_subject.get_by_grade(grade_level)
+
+
+def _warm_password_hashing(app: FastAPI) -> None:
+    from .utils import get_pwd_context
+
+    get_pwd_context().handler("bcrypt").get_backend()
+
+
+def _warm_ai_sdk(app: FastAPI) -> None:
+    from openai import AsyncOpenAI  # noqa: F401
+
+
+def _warm_schemas(app: FastAPI) -> None:
+    """Build the OpenAPI document, which generates the JSON schema of every request and response model."""
+    app.openapi()
+
+
+def _warm_search(app: FastAPI) -> None:
+    """Load the search segment (downloaded from S3 when it is shared there); it is only ever built by manage.py build-search-index."""
+    if settings.search_enabled:
+        from . import search
+
+        search.search_index.open()
+
+
+STEPS: List[Tuple[str, Callable[[FastAPI], None]]] = [
+    ("dynamodb", _warm_dynamodb),
+    ("password_hashing", _warm_password_hashing),
+    ("catalog", _warm_catalog),
+    ("ai_sdk", _warm_ai_sdk),
+    ("schemas", _warm_schemas),
+    ("search", _warm_search),
+]
+
+
+def run(app: FastAPI, budget_seconds: Optional[float] = None) -> dict:
+    """Run the warmup steps within the budget and return (and keep) a report of what ran."""
+    global last_report
+    budget_seconds = settings.warmup_budget_seconds if budget_seconds is None else budget_seconds
+    started = time.perf_counter()
+    steps = []
+
+    for name, step in STEPS:
+        elapsed = time.perf_counter() - started
+        if elapsed >= budget_seconds:
+            steps.append({"name": name, "status": "skipped", "duration_ms": 0.0})
+            continue
+        step_started = time.perf_counter()
+        try:
+            step(app)
+            status = "ok"
+        except Exception as e:
+            logger.warning(f"Warmup step {name} failed: {e}")
+            status = "failed"
+        steps.append({"name": name, "status": status, "duration_ms": round((time.perf_counter() - step_started) * 1000, 2)})
+
+    last_report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "budget_ms": budget_seconds * 1000,
+        "total_ms": round((time.perf_counter() - started) * 1000, 2),
+        "steps": steps,
+    }
+    logger.info(f"Warmup finished in {last_report['total_ms']} ms: {[(s['name'], s['status'], s['duration_ms']) for s in steps]}")
+    return last_report
+
+
+def is_warm_ping(event) -> bool:
+    """Scheduled EventBridge invocations and explicit {"warmup": true} payloads are keep-warm pings."""
+    return isinstance(event, dict) and (event.get("source") == "aws.events" or bool(event.get(WARM_PING_KEY)))
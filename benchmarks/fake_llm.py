@@ -0,0 +1,99 @@
+"""
+Deterministic OpenAI-compatible chat completions endpoint for load tests.
+
+Every request sleeps for a configurable latency (seeded jitter) and returns a fixed answer.
+Structured-output requests (`response_format` with a JSON schema, as sent by
+`chat.completions.parse`) get a minimal instance of that schema, so quiz and practice-task
+generation parse as they would against the real model.
+
+    python -m benchmarks.fake_llm --port 8900 --latency-ms 800 --jitter-ms 200
+"""
+
+import asyncio
+import json
+import random
+import time
+
+import typer
+import uvicorn
+from fastapi import FastAPI, Request
+
+ARRAY_ITEMS = 5
+TEXT_ANSWER = "This is a deterministic answer from the benchmark LLM stand-in."
+
+
+def example_for(schema: dict, defs: dict, name: str = "value"):
+    """Smallest deterministic value that satisfies a (strict mode) JSON schema."""
+    if "$ref" in schema:
+        return example_for(defs[schema["$ref"].split("/")[-1]], defs, name)
+    if "anyOf" in schema:
+        options = [option for option in schema["anyOf"] if option.get("type") != "null"]
+        return example_for(options[0], defs, name) if options else None
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "const" in schema:
+        return schema["const"]
+
+    kind = schema.get("type", "string")
+    if kind == "object":
+        return {key: example_for(value, defs, key) for key, value in schema.get("properties", {}).items()}
+    if kind == "array":
+        count = max(schema.get("minItems", 0), min(ARRAY_ITEMS, schema.get("maxItems", ARRAY_ITEMS)))
+        return [example_for(schema.get("items", {}), defs, f"{name} {i + 1}") for i in range(count)]
+    if kind == "integer":
+        return schema.get("minimum", 1)
+    if kind == "number":
+        return float(schema.get("minimum", 1))
+    if kind == "boolean":
+        return True
+    return name.replace("_", " ")
+
+
+def create_app(latency_ms: float = 800, jitter_ms: float = 200, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="Benchmark LLM stand-in")
+    rng = random.Random(seed)
+    stats = {"requests": 0}
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"]["schema"]
+            content = json.dumps(example_for(schema, schema.get("$defs", {})))
+        else:
+            content = TEXT_ANSWER
+
+        prompt_tokens = sum(len(str(message.get("content", ""))) for message in body.get("messages", [])) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": f"chatcmpl-bench-{stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    @app.get("/stats")
+    def get_stats():
+        return stats
+
+    return app
+
+
+def main(
+    port: int = typer.Option(8900, "--port"),
+    latency_ms: float = typer.Option(800, "--latency-ms", help="Mean response latency"),
+    jitter_ms: float = typer.Option(200, "--jitter-ms", help="Uniform jitter around the mean"),
+    seed: int = typer.Option(0, "--seed"),
+):
+    uvicorn.run(create_app(latency_ms, jitter_ms, seed), host="127.0.0.1", port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    typer.run(main)
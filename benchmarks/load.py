@@ -0,0 +1,408 @@
+"""
+End-to-end load test of app.main:app against local stand-ins.
+
+`run` starts a DynamoDB stand-in (moto server, unless --dynamodb-endpoint points at e.g.
+DynamoDB Local), the fake LLM from benchmarks/fake_llm.py and the app under uvicorn,
+seeds the curriculum, registers benchmark students and drives a weighted mix of routes
+from concurrent virtual users. It prints throughput and p50/p95/p99 per route and writes
+the results as JSON; `compare` diffs two result files and exits non-zero on regressions.
+
+    python -m benchmarks.load run --users 20 --duration 60 --mix mixed --save-baseline mixed
+    python -m benchmarks.load run --mix mixed --output /tmp/mixed.json
+    python -m benchmarks.load compare benchmarks/baselines/mixed.json /tmp/mixed.json
+"""
+
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+import typer
+
+BASELINES_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+# Relative weights of the routes each virtual user picks from
+MIXES: Dict[str, Dict[str, int]] = {
+    "browse": {"login": 5, "dashboard": 30, "subject_details": 30, "lesson": 35},
+    "quiz": {"lesson": 20, "quiz_start": 40, "quiz_submit": 40},
+    "mixed": {"login": 5, "dashboard": 20, "subject_details": 20, "lesson": 30, "quiz_start": 12, "quiz_submit": 13},
+}
+
+BENCH_PASSWORD = "Bench123()"
+BENCH_INSTRUCTOR_EMAIL = "bench-instructor@edu.com"
+# New students start in grade 1 with English lessons (see routers/user_profile.create_user)
+GRADE, LANGUAGE = 1, "English"
+
+app = typer.Typer()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process for {url} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def _start(stack: ExitStack, args: List[str], url: str, log_dir: str, name: str, env: Optional[dict] = None) -> subprocess.Popen:
+    log = stack.enter_context(open(os.path.join(log_dir, f"{name}.log"), "w"))
+    process = subprocess.Popen(args, stdout=log, stderr=subprocess.STDOUT, env=env)
+
+    def stop():
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    stack.callback(stop)
+    _wait_until_up(url, process)
+    return process
+
+
+def _app_environment(dynamodb_endpoint: str, llm_base_url: str) -> dict:
+    env = dict(os.environ)
+    env.update(
+        {
+            "DYNAMODB_ENDPOINT_URL": dynamodb_endpoint,
+            "LLM_BASE_URL": llm_base_url,
+            "AWS_ACCESS_KEY_ID": env.get("AWS_ACCESS_KEY_ID", "bench"),
+            "AWS_SECRET_ACCESS_KEY": env.get("AWS_SECRET_ACCESS_KEY", "bench"),
+            "AWS_DEFAULT_REGION": env.get("AWS_REGION", "us-east-1"),
+            # The limits would turn most quiz requests of a few busy users into 429s; measure the workload, not the limiter
+            "RATE_LIMIT_ENABLED": "false",
+        }
+    )
+    for name, default in {
+        "DEBUG": "false",
+        "SECRET_KEY": "benchmark-secret",
+        "ALGORITHM": "HS256",
+        "ACCESS_TOKEN_EXPIRE_MINUTES": "120",
+        "GEMINI_API_KEY": "benchmark",
+    }.items():
+        env.setdefault(name, default)
+    return env
+
+
+def _prepare_tables() -> None:
+    """Create the tables and seed the curriculum; runs in this process against the stand-in."""
+    import manage
+    import seed_db
+    from app.seed import seed_from_file, user_seed_id
+
+    manage.create_tables()
+    with tempfile.NamedTemporaryFile("w", suffix=".ndjson", encoding="utf-8", delete=False) as f:
+        for record in seed_db.generate_records():
+            if record["type"] != "user":
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    try:
+        stats = seed_from_file(f.name, user_seed_id(BENCH_INSTRUCTOR_EMAIL))
+    finally:
+        os.remove(f.name)
+    print(f"Seeded {stats.subjects} subjects and {stats.lessons} lessons in {stats.elapsed_seconds:.1f}s")
+
+
+@dataclass
+class Recorder:
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    statuses: Dict[str, Counter] = field(default_factory=lambda: defaultdict(Counter))
+
+    def record(self, route: str, elapsed_ms: float, status: int) -> None:
+        self.latencies[route].append(elapsed_ms)
+        self.statuses[route][status] += 1
+
+
+def _summary(latencies: List[float], statuses: Counter, seconds: float) -> dict:
+    ordered = sorted(latencies)
+    quantiles = statistics.quantiles(ordered, n=100, method="inclusive") if len(ordered) > 1 else ordered * 99
+    requests = len(ordered)
+    return {
+        "requests": requests,
+        "errors": sum(count for status, count in statuses.items() if status == 0 or status >= 500),
+        "rejected": sum(count for status, count in statuses.items() if 400 <= status < 500),
+        "throughput_rps": round(requests / seconds, 2) if seconds else 0.0,
+        "mean_ms": round(statistics.fmean(ordered), 2) if ordered else None,
+        "p50_ms": round(quantiles[49], 2) if ordered else None,
+        "p95_ms": round(quantiles[94], 2) if ordered else None,
+        "p99_ms": round(quantiles[98], 2) if ordered else None,
+        "max_ms": round(ordered[-1], 2) if ordered else None,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, email: str, rng: random.Random, recorder: Recorder):
+        from app.models import QUIZ_ATTEMPT_LIMIT
+        from app.seed import lesson_seed_id, subject_seed_id
+        from seed_db import SUBJECTS
+
+        self.client = client
+        self.email = email
+        self.rng = rng
+        self.recorder = recorder
+        self.headers: Dict[str, str] = {}
+        self.open_quizzes: List[dict] = []
+        self.subject_ids = [subject_seed_id(GRADE, name) for name in SUBJECTS]
+        self.lesson_ids = [lesson_seed_id(GRADE, name, LANGUAGE, order) for name in SUBJECTS for order in range(1, 11)]
+        # Quizzes started per lesson, kept under the attempt limit so starts are not rejected with 429
+        self.quiz_starts: Counter = Counter()
+        self.attempt_limit = QUIZ_ATTEMPT_LIMIT
+
+    async def request(self, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(route, (time.perf_counter() - start) * 1000, 0)
+            return None
+        self.recorder.record(route, (time.perf_counter() - start) * 1000, response.status_code)
+        return response
+
+    async def login(self) -> None:
+        response = await self.request("login", "POST", "/login", json={"email": self.email, "password": BENCH_PASSWORD})
+        if response is not None and response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def step(self, route: str) -> None:
+        if route == "quiz_submit" and not self.open_quizzes:
+            route = "quiz_start"
+        quiz_lessons = [lesson_id for lesson_id in self.lesson_ids if self.quiz_starts[lesson_id] < self.attempt_limit]
+        if route == "quiz_start" and not quiz_lessons:
+            route = "lesson"
+
+        if route == "login":
+            await self.login()
+        elif route == "dashboard":
+            await self.request(route, "GET", "/dashboard/student/")
+        elif route == "subject_details":
+            await self.request(route, "GET", f"/subjects/{self.rng.choice(self.subject_ids)}/details/")
+        elif route == "lesson":
+            await self.request(route, "GET", f"/lessons/{self.rng.choice(self.lesson_ids)}/")
+        elif route == "quiz_start":
+            lesson_id = self.rng.choice(quiz_lessons)
+            self.quiz_starts[lesson_id] += 1
+            response = await self.request(route, "GET", f"/lessons/{lesson_id}/quiz/")
+            if response is not None and response.status_code == 200:
+                self.open_quizzes.append(response.json())
+        elif route == "quiz_submit":
+            quiz = self.open_quizzes.pop()
+            answers = [
+                {"question_id": question["question_id"], "student_answer": self.rng.choice(question["options"] or ["answer"])}
+                for question in quiz["quiz_questions"]
+            ]
+            await self.request(route, "POST", f"/quizzes/{quiz['id']}/submit", json=answers)
+
+    async def run(self, mix: Dict[str, int], deadline: float) -> None:
+        routes, weights = list(mix), list(mix.values())
+        while time.perf_counter() < deadline:
+            await self.step(self.rng.choices(routes, weights)[0])
+
+
+async def _register_students(base_url: str, count: int) -> List[str]:
+    """Ensure `count` benchmark students exist; reruns against a persistent stand-in reuse them."""
+    emails = [f"bench-student-{i}@edu.com" for i in range(count)]
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+
+        async def ensure(email: str) -> None:
+            login = await client.post("/login", json={"email": email, "password": BENCH_PASSWORD})
+            if login.status_code == 200:
+                return
+            response = await client.post("/users/", json={"username": email.split("@")[0], "email": email, "password": BENCH_PASSWORD})
+            response.raise_for_status()
+
+        await asyncio.gather(*(ensure(email) for email in emails))
+    return emails
+
+
+async def _drive(base_url: str, emails: List[str], mix: Dict[str, int], duration: float, seed: int) -> tuple:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=len(emails), max_keepalive_connections=len(emails))
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        users = [VirtualUser(client, email, random.Random(seed + i), recorder) for i, email in enumerate(emails)]
+        await asyncio.gather(*(user.login() for user in users))
+        # Only the steady-state phase is measured
+        recorder = Recorder()
+        for user in users:
+            user.recorder = recorder
+        start = time.perf_counter()
+        await asyncio.gather(*(user.run(mix, start + duration) for user in users))
+        elapsed = time.perf_counter() - start
+    return recorder, elapsed
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_report(result: dict) -> None:
+    print(f"\n{'route':<16}{'requests':>10}{'errors':>8}{'4xx':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route, stats in [*result["routes"].items(), ("total", result["total"])]:
+        print(
+            f"{route:<16}{stats['requests']:>10}{stats['errors']:>8}{stats['rejected']:>6}{stats['throughput_rps']:>9.1f}"
+            f"{stats['p50_ms'] or 0:>10.1f}{stats['p95_ms'] or 0:>10.1f}{stats['p99_ms'] or 0:>10.1f}"
+        )
+
+
+@app.command()
+def run(
+    users: int = typer.Option(20, "--users", "-u", help="Concurrent virtual users (one student each)"),
+    duration: float = typer.Option(60, "--duration", "-d", help="Measured seconds, after login"),
+    mix: str = typer.Option("mixed", "--mix", help=f"Route mix: {', '.join(MIXES)}"),
+    llm_latency_ms: float = typer.Option(800, "--llm-latency-ms", help="Mean latency of the fake LLM"),
+    llm_jitter_ms: float = typer.Option(200, "--llm-jitter-ms"),
+    app_workers: int = typer.Option(1, "--app-workers", help="uvicorn worker processes"),
+    dynamodb_endpoint: Optional[str] = typer.Option(None, "--dynamodb-endpoint", help="Use a running stand-in, e.g. DynamoDB Local"),
+    seed: int = typer.Option(0, "--seed", help="Seed for route choices and LLM jitter"),
+    output: Optional[str] = typer.Option(None, "--output", "-o", help="Write the results JSON here"),
+    save_baseline: Optional[str] = typer.Option(None, "--save-baseline", help="Also store the results as benchmarks/baselines/<name>.json"),
+):
+    """
+    Run one load test and report throughput and latency percentiles per route.
+    """
+    if mix not in MIXES:
+        raise typer.BadParameter(f"Unknown mix {mix}, expected one of {', '.join(MIXES)}")
+
+    log_dir = tempfile.mkdtemp(prefix="bench-")
+    with ExitStack() as stack:
+        if not dynamodb_endpoint:
+            port = _free_port()
+            dynamodb_endpoint = f"http://127.0.0.1:{port}"
+            _start(stack, [sys.executable, "-m", "moto.server", "-p", str(port)], dynamodb_endpoint, log_dir, "dynamodb")
+
+        llm_port = _free_port()
+        llm_base_url = f"http://127.0.0.1:{llm_port}/"
+        _start(
+            stack,
+            [sys.executable, "-m", "benchmarks.fake_llm", "--port", str(llm_port), "--latency-ms", str(llm_latency_ms), "--jitter-ms", str(llm_jitter_ms), "--seed", str(seed)],
+            f"{llm_base_url}stats",
+            log_dir,
+            "fake_llm",
+        )
+
+        env = _app_environment(dynamodb_endpoint, llm_base_url)
+        os.environ.update(env)
+        _prepare_tables()
+
+        app_port = _free_port()
+        base_url = f"http://127.0.0.1:{app_port}"
+        _start(
+            stack,
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port), "--workers", str(app_workers), "--log-level", "warning"],
+            f"{base_url}/languages",
+            log_dir,
+            "app",
+            env=env,
+        )
+
+        emails = asyncio.run(_register_students(base_url, users))
+        print(f"Driving the '{mix}' mix with {users} users for {duration:.0f}s (logs in {log_dir})")
+        recorder, elapsed = asyncio.run(_drive(base_url, emails, MIXES[mix], duration, seed))
+
+    all_latencies = [latency for latencies in recorder.latencies.values() for latency in latencies]
+    all_statuses = sum(recorder.statuses.values(), Counter())
+    result = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "config": {
+            "mix": mix,
+            "users": users,
+            "duration_seconds": duration,
+            "llm_latency_ms": llm_latency_ms,
+            "llm_jitter_ms": llm_jitter_ms,
+            "app_workers": app_workers,
+            "seed": seed,
+        },
+        "elapsed_seconds": round(elapsed, 2),
+        "routes": {route: _summary(recorder.latencies[route], recorder.statuses[route], elapsed) for route in sorted(recorder.latencies)},
+        "total": _summary(all_latencies, all_statuses, elapsed),
+    }
+    _print_report(result)
+
+    paths = [output] if output else []
+    if save_baseline:
+        paths.append(os.path.join(BASELINES_DIR, f"{save_baseline}.json"))
+    for path in paths:
+        with open(path, "w") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+        print(f"Results written to {path}")
+
+
+def _change(baseline: Optional[float], current: Optional[float]) -> Optional[float]:
+    if not baseline or current is None:
+        return None
+    return (current - baseline) / baseline
+
+
+@app.command()
+def compare(
+    baseline_path: str = typer.Argument(..., help="Baseline results JSON"),
+    current_path: str = typer.Argument(..., help="Results JSON to check"),
+    threshold: float = typer.Option(0.10, "--threshold", help="Allowed relative slowdown before a route counts as a regression"),
+):
+    """
+    Compare two load test results route by route; exits with code 1 on regressions.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+
+    if baseline["config"] != current["config"]:
+        print(f"Warning: configs differ\n  baseline: {baseline['config']}\n  current:  {current['config']}")
+
+    regressions = []
+    print(f"{'route':<16}{'req/s':>18}{'p50 ms':>22}{'p95 ms':>22}{'p99 ms':>22}{'errors':>14}{'4xx':>14}")
+    routes = sorted(set(baseline["routes"]) | set(current["routes"]))
+    for route in [*routes, "total"]:
+        before = baseline["total"] if route == "total" else baseline["routes"].get(route, {})
+        after = current["total"] if route == "total" else current["routes"].get(route, {})
+        cells = []
+        for metric, higher_is_worse in (("throughput_rps", False), ("p50_ms", True), ("p95_ms", True), ("p99_ms", True)):
+            change = _change(before.get(metric), after.get(metric))
+            cells.append(f"{before.get(metric) or 0:>8.1f} -> {after.get(metric) or 0:>8.1f}" + (f" {change:+.0%}" if change is not None else ""))
+            if change is not None and metric != "p50_ms" and (change > threshold if higher_is_worse else change < -threshold):
+                regressions.append(f"{route} {metric} {change:+.0%}")
+        if after.get("errors", 0) > before.get("errors", 0):
+            regressions.append(f"{route} errors {before.get('errors', 0)} -> {after['errors']}")
+        # 4xx are counted apart from errors: a rise means requests were rejected that used to succeed
+        if after.get("rejected", 0) > before.get("rejected", 0):
+            regressions.append(f"{route} 4xx {before.get('rejected', 0)} -> {after['rejected']}")
+        cells = [f"{cell:>22}" for cell in cells]
+        cells += [f"{before.get(count, 0):>5} -> {after.get(count, 0):>5}" for count in ("errors", "rejected")]
+        print(f"{route:<16}" + "".join(cells))
+
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        raise typer.Exit(code=1)
+    print("\nNo regressions beyond the threshold.")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,165 @@
+"""
+Micro-benchmarks for the dashboard hot path in app/services.py.
+
+For each size it generates synthetic quiz attempt summaries and lessons, then times
+`group_attempts_by_lesson`, `analyze_attempts`, `calculate_streak`, the per-lesson
+`SubjectLesson.model_validate` loop and the whole `get_subject_details_data` (with the two
+DynamoDB reads replaced by the synthetic data), and measures peak and retained memory with
+tracemalloc.
+
+    python -m benchmarks.micro --sizes 100,1000,10000,100000,1000000 --output /tmp/micro.json
+"""
+
+import asyncio
+import gc
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+
+import typer
+
+from app import crud, schemas, services
+from app.models import QUIZ_PASSING_SCORE, Lesson, Quiz, Student, Subject
+
+ATTEMPTS_PER_LESSON = 10
+LANGUAGE = "English"
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def make_lessons(count: int, subject_id: str) -> List[Lesson]:
+    """Lessons as returned by the subject-language index (projected attributes only)."""
+    lessons = []
+    for i in range(count):
+        lesson = Lesson.__new__(Lesson)
+        lesson.attribute_values = {
+            "id": f"lesson-{i}",
+            "subject_id": subject_id,
+            "title": f"Lesson {i}",
+            "language": LANGUAGE,
+            "order_in_subject": i + 1,
+        }
+        lessons.append(lesson)
+    return lessons
+
+
+def make_attempts(count: int, lessons: List[Lesson], rng: random.Random) -> List[Quiz]:
+    """
+    Attempt summaries as returned by the summary index. Instances are filled the way
+    deserialization fills them, since Model.__init__ would dominate the setup time at 10^6.
+    """
+    attempts = []
+    days = max(30, count // 20)
+    for i in range(count):
+        lesson = rng.choice(lessons)
+        score = round(rng.uniform(0, 100), 1)
+        quiz = Quiz.__new__(Quiz)
+        quiz.attribute_values = {
+            "id": f"quiz-{i}",
+            "student_id": "student-0",
+            "subject_id": lesson.subject_id,
+            "lesson_id": lesson.id,
+            "lesson_title": lesson.title,
+            "score": score,
+            "passed": score >= QUIZ_PASSING_SCORE,
+            "end_time": START + timedelta(days=rng.randrange(days), minutes=rng.randrange(1440)),
+        }
+        attempts.append(quiz)
+    return attempts
+
+
+@contextmanager
+def patched_reads(lessons: List[Lesson], attempts: List[Quiz]):
+    """Serve the two reads of get_subject_details_data from memory."""
+    originals = (crud.crud_lesson.get_by_subject_and_language, crud.crud_quiz.get_summaries_by_subject_student)
+    crud.crud_lesson.get_by_subject_and_language = lambda subject_id, language: lessons
+    crud.crud_quiz.get_summaries_by_subject_student = lambda subject_id, student_id: attempts
+    try:
+        yield
+    finally:
+        crud.crud_lesson.get_by_subject_and_language, crud.crud_quiz.get_summaries_by_subject_student = originals
+
+
+def _time(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"min_ms": round(min(timings), 3), "median_ms": round(statistics.median(timings), 3)}
+
+
+def _memory(fn: Callable[[], object]) -> Dict[str, float]:
+    """Peak traced memory during one call, and memory still held by its result afterwards."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {"peak_kib": round(peak / 1024, 1), "retained_kib": round(current / 1024, 1)}
+
+
+def benchmarks_for(size: int, rng: random.Random) -> Dict[str, Callable[[], object]]:
+    subject = Subject(id="subject-0", name="Mathematics", grade_level=1)
+    student = Student(user_id="student-0", language=LANGUAGE, current_grade=1)
+    lessons = make_lessons(max(10, size // ATTEMPTS_PER_LESSON), subject.id)
+    attempts = make_attempts(size, lessons, rng)
+    grouped = services.group_attempts_by_lesson(attempts)
+    passed = [a for a in attempts if a.passed]
+
+    def subject_details():
+        with patched_reads(lessons, attempts):
+            return asyncio.run(services.get_subject_details_data(subject, student))
+
+    return {
+        "group_attempts_by_lesson": lambda: services.group_attempts_by_lesson(attempts),
+        "analyze_attempts": lambda: [services.analyze_attempts(group) for group in grouped.values()],
+        "calculate_streak": lambda: services.calculate_streak(passed),
+        "subject_lesson_validate": lambda: [schemas.SubjectLesson.model_validate(lesson) for lesson in lessons],
+        "get_subject_details_data": subject_details,
+    }
+
+
+def main(
+    sizes: str = typer.Option("100,1000,10000,100000,1000000", "--sizes", help="Comma-separated attempt counts"),
+    repeat: int = typer.Option(5, "--repeat", help="Timed runs per benchmark (fewer above 10^5 attempts)"),
+    only: str = typer.Option("", "--only", help="Comma-separated benchmark names to run"),
+    seed: int = typer.Option(0, "--seed"),
+    output: str = typer.Option("", "--output", "-o", help="Write the results JSON here"),
+):
+    """
+    Time the dashboard hot functions at each size and report peak/retained memory.
+    """
+    selected = set(filter(None, only.split(",")))
+    results = []
+    print(f"{'benchmark':<26}{'attempts':>10}{'lessons':>9}{'min ms':>12}{'median ms':>12}{'peak KiB':>12}{'retained KiB':>14}")
+    for size in [int(s) for s in sizes.split(",")]:
+        rng = random.Random(seed)
+        runs = repeat if size <= 100_000 else max(1, repeat // 3)
+        for name, fn in benchmarks_for(size, rng).items():
+            if selected and name not in selected:
+                continue
+            row = {"benchmark": name, "attempts": size, "lessons": max(10, size // ATTEMPTS_PER_LESSON), **_time(fn, runs), **_memory(fn)}
+            results.append(row)
+            print(
+                f"{name:<26}{size:>10}{row['lessons']:>9}{row['min_ms']:>12.2f}{row['median_ms']:>12.2f}"
+                f"{row['peak_kib']:>12.1f}{row['retained_kib']:>14.1f}"
+            )
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({"created_at": datetime.now(timezone.utc).isoformat(), "seed": seed, "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -212,9 +212,10 @@ USERS = [
 ]
 
 
-def generate_data():
-    subjects = []
-    lessons = []
+def generate_records():
+    """Yield seed records one at a time: users first, then each subject followed by its lessons."""
+    for user in USERS:
+        yield {"type": "user", **user}
 
     for grade in GRADES:
         # Set difficulty band
@@ -226,40 +227,39 @@ def generate_data():
             diff_band = "hard"
 
         for subject in SUBJECTS:
-            lessons = []
+            yield {
+                "type": "subject",
+                "name": subject,
+                "description": f"{subject} curriculum for Grade {grade}",
+                "grade_level": grade,
+                "is_active": True,
+            }
             for order in range(1, 11):
                 for lang in LANGUAGES:
                     lesson = LESSONS[subject][diff_band][order - 1]
 
-                    lessons.append(
-                        {
-                            "title": lesson,
-                            "language": lang,
-                            "content": f"Grade {grade} {subject}; Lesson {order}: {lesson}",
-                            "difficulty": diff_band,
-                            "order_in_subject": order,
-                        }
-                    )
-            subjects.append(
-                {
-                    "name": subject,
-                    "description": f"{subject} curriculum for Grade {grade}",
-                    "grade_level": grade,
-                    "is_active": True,
-                    "lessons": lessons,
-                }
-            )
+                    yield {
+                        "type": "lesson",
+                        "subject_name": subject,
+                        "grade_level": grade,
+                        "title": lesson,
+                        "language": lang,
+                        "content": f"Grade {grade} {subject}; Lesson {order}: {lesson}",
+                        "difficulty": diff_band,
+                        "order_in_subject": order,
+                    }
 
-    return {"users": USERS, "subjects": subjects}
 
-
-# Generate and save data
+# Generate and save data as NDJSON, one record per line
 if __name__ == "__main__":
-    data = generate_data()
-    with open("seed.json", "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    counts = {"user": 0, "subject": 0, "lesson": 0}
+    with open("seed.ndjson", "w", encoding="utf-8") as f:
+        for record in generate_records():
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+            counts[record["type"]] += 1
 
     print(f"Generated curriculum data for {len(GRADES)} grades, {len(SUBJECTS)} subjects, and {len(LANGUAGES)} languages")
-    print(f"Total subjects: {len(data['subjects'])}")
-    print(f"Total lessons: {len(GRADES) * len(SUBJECTS) * len(LANGUAGES)}")
-    print("Data saved to seed.json")
+    print(f"Total subjects: {counts['subject']}")
+    print(f"Total lessons: {counts['lesson']}")
+    print("Data saved to seed.ndjson")
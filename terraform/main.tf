@@ -48,6 +48,36 @@ resource "random_string" "bucket_suffix" {
   upper   = false
 }
 
+# S3 Bucket for files the API writes (admin exports), private; downloads use presigned URLs
+resource "aws_s3_bucket" "data" {
+  bucket = "${var.function_name}-data-${random_string.bucket_suffix.result}"
+  tags   = var.tags
+}
+
+resource "aws_s3_bucket_public_access_block" "data" {
+  bucket = aws_s3_bucket.data.id
+
+  block_public_acls       = true
+  block_public_policy     = true
+  ignore_public_acls      = true
+  restrict_public_buckets = true
+}
+
+resource "aws_s3_bucket_lifecycle_configuration" "data" {
+  bucket = aws_s3_bucket.data.id
+
+  rule {
+    id     = "expire-exports"
+    status = "Enabled"
+    filter {
+      prefix = "exports/"
+    }
+    expiration {
+      days = 7
+    }
+  }
+}
+
 # S3 Bucket Public Access Block
 resource "aws_s3_bucket_public_access_block" "website" {
   bucket = aws_s3_bucket.website.id
@@ -167,6 +197,30 @@ resource "aws_iam_role_policy" "lambda_policy" {
           "arn:aws:dynamodb:${data.aws_region.current.name}:${data.aws_caller_identity.current.account_id}:table/khaneducation_*",
           "arn:aws:dynamodb:${data.aws_region.current.name}:${data.aws_caller_identity.current.account_id}:table/khaneducation_*/index/*"
         ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:GetObject",
+          "s3:PutObject"
+        ]
+        Resource = "${aws_s3_bucket.data.arn}/*"
+      },
+      {
+        # Lets a missing object read as NoSuchKey instead of AccessDenied
+        Effect = "Allow"
+        Action = [
+          "s3:ListBucket"
+        ]
+        Resource = aws_s3_bucket.data.arn
+      },
+      {
+        # Post-response tasks are asynchronous invocations of the function itself (app/tasks.py)
+        Effect = "Allow"
+        Action = [
+          "lambda:InvokeFunction"
+        ]
+        Resource = "arn:aws:lambda:${data.aws_region.current.name}:${data.aws_caller_identity.current.account_id}:function:${var.function_name}"
       }
     ]
   })
@@ -204,6 +258,8 @@ resource "aws_lambda_function" "khaneducation_lambda" {
       SECRET_KEY     = var.secret_key
       ALGORITHM      = "HS256"
       ACCESS_TOKEN_EXPIRE_MINUTES = "30"
+      EXPORT_S3_BUCKET = aws_s3_bucket.data.id
+      SEARCH_S3_BUCKET = aws_s3_bucket.data.id
     }
   }
   depends_on = [
@@ -215,6 +271,13 @@ resource "aws_lambda_function" "khaneducation_lambda" {
   tags = var.tags
 }
 
+# Post-response tasks are idempotent; one retry is enough and stale ones are dropped
+resource "aws_lambda_function_event_invoke_config" "khaneducation_tasks" {
+  function_name                = aws_lambda_function.khaneducation_lambda.function_name
+  maximum_retry_attempts       = 1
+  maximum_event_age_in_seconds = 600
+}
+
 # CloudWatch Log Group
 resource "aws_cloudwatch_log_group" "khaneducation_lambda_logs" {
   name              = "/aws/lambda/${var.function_name}"
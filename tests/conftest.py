@@ -0,0 +1,15 @@
+import os
+
+# Settings the app requires; real values are never needed because DynamoDB is mocked and no LLM is called
+for name, value in {
+    "DEBUG": "False",
+    "SECRET_KEY": "test-secret-key",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "GEMINI_API_KEY": "test",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "WARMUP_ENABLED": "false",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+from app.analytics import AttemptColumns, summarize
+
+
+def _attempt(lesson_id, student_id, score=None, passed=False, time_taken_minutes=None):
+    return SimpleNamespace(lesson_id=lesson_id, student_id=student_id, score=score, passed=passed, time_taken_minutes=time_taken_minutes)
+
+
+def test_unsubmitted_attempts_are_not_failures():
+    columns = AttemptColumns.from_summaries(
+        [
+            _attempt("lesson-1", "student-1", score=90, passed=True, time_taken_minutes=5),
+            _attempt("lesson-1", "student-2", score=40, time_taken_minutes=7),
+            # Generated but never submitted: no score, and passed keeps its default
+            _attempt("lesson-1", "student-3"),
+            _attempt("lesson-2", "student-1"),
+        ]
+    )
+    result = summarize(columns, {"lesson-1": "Fractions"})
+
+    assert result["attempts"] == 2
+    assert result["unsubmitted"] == 2
+    assert result["pass_rate"] == 0.5
+    lessons = {lesson["lesson_id"]: lesson for lesson in result["per_lesson"]}
+    assert lessons["lesson-1"] == {
+        "lesson_id": "lesson-1",
+        "lesson_title": "Fractions",
+        "attempts": 2,
+        "unsubmitted": 1,
+        "students": 3,
+        "pass_rate": 0.5,
+        "avg_score": 65.0,
+        "avg_time_taken_minutes": 6.0,
+        "difficulty": 0.5,
+    }
+    # Only abandoned quizzes: nothing to rate yet
+    assert lessons["lesson-2"]["attempts"] == 0
+    assert lessons["lesson-2"]["unsubmitted"] == 1
+    assert lessons["lesson-2"]["pass_rate"] is None
+    assert lessons["lesson-2"]["difficulty"] is None
+
+
+def test_no_submitted_attempts():
+    result = summarize(AttemptColumns.from_summaries([_attempt("lesson-1", "student-1")]))
+    assert result["attempts"] == 0
+    assert result["pass_rate"] is None
+    assert result["score"]["mean"] is None
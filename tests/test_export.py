@@ -0,0 +1,40 @@
+import sys
+
+import boto3
+import pytest
+from fastapi import BackgroundTasks, HTTPException
+from moto import mock_aws
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    with mock_aws():
+        from app.config import settings
+
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="exports-bucket")
+        monkeypatch.setattr(settings, "export_s3_bucket", "exports-bucket")
+        yield "exports-bucket"
+
+
+@pytest.mark.parametrize("fmt", ["xlsx", "parquet"])
+def test_unavailable_format_is_rejected_with_the_request(bucket, monkeypatch, fmt):
+    from app.routers.admin import start_export
+
+    monkeypatch.setitem(sys.modules, "pyarrow", None)  # not installed
+    background_tasks = BackgroundTasks()
+    with pytest.raises(HTTPException) as error:
+        start_export("quizzes", background_tasks, format=fmt, segments=1)
+
+    assert error.value.status_code == 400
+    assert not background_tasks.tasks
+    assert "Contents" not in boto3.client("s3", region_name="us-east-1").list_objects_v2(Bucket=bucket)
+
+
+def test_csv_export_is_started(bucket):
+    from app.routers.admin import start_export
+
+    background_tasks = BackgroundTasks()
+    job = start_export("quizzes", background_tasks, format="csv", segments=1)
+
+    assert job["status"] == "pending"
+    assert len(background_tasks.tasks) == 1
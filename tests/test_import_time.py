@@ -0,0 +1,8 @@
+from manage import DEFERRED_MODULES, loaded_modules
+
+
+def test_app_import_defers_heavy_modules():
+    # Which modules load is deterministic, unlike the import time itself (see manage.py check-import-time)
+    loaded = loaded_modules("app.main")
+    eager = [module for module in DEFERRED_MODULES if module in loaded]
+    assert not eager, f"import app.main loads {', '.join(eager)}; import them where they are first used"
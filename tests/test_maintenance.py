@@ -0,0 +1,62 @@
+import pytest
+from moto import mock_aws
+
+
+@pytest.fixture(scope="module", autouse=True)
+def tables():
+    with mock_aws():
+        import manage
+
+        manage.create_tables()
+        yield
+
+
+def _user(username: str, legacy: bool = False):
+    """A user; `legacy` ones are stored without updated_at, like rows written before it was tracked."""
+    from app.models import User
+
+    user = User(username=username, email=f"{username}@example.com", password="old")
+    user.save()
+    if legacy:
+        client = User._get_connection().connection.client
+        client.update_item(TableName=User.Meta.table_name, Key={"id": {"S": user.id}}, UpdateExpression="REMOVE updated_at")
+    return user
+
+
+def _set_password(job):
+    from app.models import User
+
+    return job.run(lambda user: [User.password.set("new")])
+
+
+@pytest.mark.parametrize("attributes_to_get", [None, ["id", "password"]])
+def test_job_updates_items_without_updated_at(attributes_to_get):
+    from app.maintenance import MaintenanceJob
+    from app.models import User
+
+    users = [_user(f"current-{bool(attributes_to_get)}"), _user(f"legacy-{bool(attributes_to_get)}", legacy=True)]
+    job = MaintenanceJob(User, "set_password", segments=1, attributes_to_get=attributes_to_get, progress=False)
+    stats = _set_password(job)
+
+    assert stats.conflicts == 0
+    for user in users:
+        assert User.get(user.id).password == "new"
+
+
+def test_job_leaves_items_saved_during_the_run():
+    from app.maintenance import MaintenanceJob
+    from app.models import User
+
+    user = _user("concurrent")
+    job = MaintenanceJob(User, "set_password_concurrent", segments=1, progress=False)
+
+    def set_password(item):
+        if item.id != user.id:
+            return None
+        # Another writer saves the item between the read and the write, and again before the retry
+        User.get(user.id).save()
+        return [User.password.set("new")]
+
+    stats = job.run(set_password)
+    assert stats.conflicts == 1
+    assert User.get(user.id).password == "old"
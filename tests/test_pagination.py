@@ -0,0 +1,83 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from moto import mock_aws
+
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+KEY = {"id": {"S": "subject-1"}}
+SCOPE = "khaneducation_subjects::scan"
+
+
+@pytest.fixture(scope="module")
+def client():
+    with mock_aws():
+        import manage
+        from app.main import app
+        from app.models import Subject
+
+        manage.create_tables()
+        for n in range(5):
+            Subject(name=f"Subject {n}", grade_level=1).save()
+        yield TestClient(app)
+
+
+def _tamper(text: str) -> str:
+    # The first character, since the last one of unpadded base64 may only hold padding bits
+    return ("A" if text[0] != "A" else "B") + text[1:]
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(KEY, SCOPE)
+    assert decode_cursor(cursor, SCOPE) == KEY
+    assert encode_cursor(None, SCOPE) is None
+    assert decode_cursor(None, SCOPE) is None
+
+
+@pytest.mark.parametrize("part", ["payload", "signature"])
+def test_tampered_cursor_is_rejected(part):
+    payload, signature = encode_cursor(KEY, SCOPE).split(".")
+    cursor = f"{_tamper(payload)}.{signature}" if part == "payload" else f"{payload}.{_tamper(signature)}"
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, SCOPE)
+
+
+def test_cursor_is_bound_to_its_scope():
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(KEY, SCOPE), "khaneducation_lessons:lesson_subject_index:query")
+
+
+def test_pages_end_without_a_cursor(client):
+    seen, cursor, pages = [], None, 0
+    while True:
+        response = client.get("/subjects/", params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen += [subject["id"] for subject in response.json()]
+        pages += 1
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+    assert pages == 3
+    assert len(seen) == len(set(seen)) == 5
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "e30.AAAA"])
+def test_invalid_cursor_is_a_bad_request(client, cursor):
+    assert client.get("/subjects/", params={"cursor": cursor}).status_code == 400
+
+
+def test_tampered_cursor_is_a_bad_request(client):
+    cursor = client.get("/subjects/", params={"limit": 2}).headers[NEXT_CURSOR_HEADER]
+    payload, signature = cursor.split(".")
+    assert client.get("/subjects/", params={"cursor": f"{_tamper(payload)}.{signature}"}).status_code == 400
+    assert client.get("/subjects/", params={"cursor": f"{payload}.{_tamper(signature)}"}).status_code == 400
+
+
+def test_cursor_replayed_against_another_table_or_index_is_rejected(client):
+    from app import crud
+
+    cursor = client.get("/subjects/", params={"limit": 2}).headers[NEXT_CURSOR_HEADER]
+    for read in (lambda: crud.crud_user.get_multi(limit=2, cursor=cursor), lambda: crud.crud_lesson.get_by_subject("subject-1", limit=2, cursor=cursor)):
+        with pytest.raises(HTTPException) as error:
+            read()
+        assert error.value.status_code == 400
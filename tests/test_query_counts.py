@@ -0,0 +1,117 @@
+"""
+DynamoDB call bounds for the student read paths.
+
+The dashboard and subject details must cost a fixed number of calls per enrolled subject,
+whatever the number of lessons and quiz attempts; a per-lesson or per-attempt lookup (N+1)
+fails these tests with the call-site report of `assert_max_queries`.
+"""
+
+import itertools
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from moto import mock_aws
+
+SUBJECTS = 3
+# Each test student gets a grade of its own, so it only sees the subjects it created
+_grades = itertools.count(1)
+
+# Per request: the user (database auth mode) and the student profile
+AUTH_CALLS = 2
+# Per subject with a cold catalog cache: its lessons and the student's attempt summaries
+SUBJECT_CALLS = 2
+
+
+@pytest.fixture(scope="module")
+def client():
+    with mock_aws():
+        import manage
+        from app.main import app
+
+        manage.create_tables()
+        yield TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def cold_catalog_cache():
+    from app.cache import catalog_cache
+
+    catalog_cache.clear()
+
+
+def _student(lessons_per_subject: int, attempts_per_lesson: int):
+    """A student enrolled in `SUBJECTS` fresh subjects; returns auth headers and the subject ids."""
+    from app import models
+    from app.dependencies import create_access_token
+
+    grade = next(_grades)
+    user = models.User(username=f"student{grade}", email=f"student{grade}@example.com", password="x")
+    user.save()
+    models.Student(user_id=user.id, current_grade=grade, language="en").save()
+
+    subject_ids = []
+    started = datetime.now(timezone.utc) - timedelta(days=1)
+    for s in range(SUBJECTS):
+        subject = models.Subject(name=f"Subject {s}", grade_level=grade)
+        subject.save()
+        subject_ids.append(subject.id)
+        for n in range(lessons_per_subject):
+            lesson = models.Lesson(subject_id=subject.id, instructor_id="instructor", title=f"Lesson {n}", language="en", content="...", status="verified")
+            lesson.save()
+            for a in range(attempts_per_lesson):
+                models.Quiz(
+                    student_id=user.id,
+                    subject_id=subject.id,
+                    lesson_id=lesson.id,
+                    lesson_title=lesson.title,
+                    start_time=started + timedelta(minutes=a),
+                    end_time=started + timedelta(minutes=a + 5),
+                    score=50 + 10 * a,
+                    passed=a > 0,
+                ).save()
+
+    token = create_access_token(
+        data={"user_id": user.id, "email": user.email, "username": user.username, "role": user.role, "is_active": True}
+    )
+    return {"Authorization": f"Bearer {token}"}, subject_ids
+
+
+def _count(client, path, headers) -> int:
+    from app.querycount import assert_max_queries
+
+    with assert_max_queries(1000, f"GET {path}") as tracker:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.text
+    return tracker.count
+
+
+@pytest.mark.parametrize("lessons, attempts", [(1, 1), (8, 3)])
+def test_student_dashboard_query_bound(client, lessons, attempts):
+    from app.querycount import assert_max_queries
+
+    headers, _ = _student(lessons, attempts)
+    # Subjects of the grade, then lessons and attempts of each subject
+    with assert_max_queries(AUTH_CALLS + 1 + SUBJECT_CALLS * SUBJECTS, "GET /dashboard/student/"):
+        response = client.get("/dashboard/student/", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["stats"]["total_lessons"] == lessons * SUBJECTS
+
+
+@pytest.mark.parametrize("lessons, attempts", [(1, 1), (8, 3)])
+def test_subject_details_query_bound(client, lessons, attempts):
+    from app.querycount import assert_max_queries
+
+    headers, subject_ids = _student(lessons, attempts)
+    path = f"/subjects/{subject_ids[0]}/details/"
+    # The subject itself, then its lessons and the student's attempts
+    with assert_max_queries(AUTH_CALLS + 1 + SUBJECT_CALLS, f"GET {path}"):
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.text
+    assert len(response.json()["lessons"]) == lessons
+
+
+def test_dashboard_calls_do_not_grow_with_lessons_or_attempts(client):
+    small, _ = _student(1, 1)
+    large, _ = _student(10, 4)
+    assert _count(client, "/dashboard/student/", large) == _count(client, "/dashboard/student/", small)
@@ -0,0 +1,103 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from moto import mock_aws
+
+LIMIT = 3
+
+
+@pytest.fixture(autouse=True)
+def tables():
+    with mock_aws():
+        import manage
+
+        manage.create_tables()
+        yield
+
+
+def _question():
+    return SimpleNamespace(question_text="2 + 2?", question_type="multiple_choice", options=["3", "4"], correct_answer="4")
+
+
+def _lesson():
+    from app.models import Lesson
+
+    lesson = Lesson(subject_id="subject-1", instructor_id="admin-1", title="Addition", language="en", content="2 + 2 = 4", status="verified")
+    lesson.save()
+    return lesson
+
+
+def _student():
+    from app.models import Student
+
+    return Student(user_id="student-1", current_grade=1)
+
+
+def test_versions_are_not_reused_after_a_released_attempt():
+    from app.crud import crud_quiz_attempt_counter as counter
+
+    assert counter.increment("student-1", "lesson-1", LIMIT) == 1
+    assert counter.increment("student-1", "lesson-1", LIMIT) == 2
+    counter.decrement("student-1", "lesson-1")
+    # The slot is free again, but its version number is not
+    assert counter.increment("student-1", "lesson-1", LIMIT) == 3
+    assert counter.increment("student-1", "lesson-1", LIMIT) == 4
+    with pytest.raises(ValueError):
+        counter.increment("student-1", "lesson-1", LIMIT)
+
+
+def test_counters_without_versions_continue_from_their_attempts():
+    from app.crud import crud_quiz_attempt_counter as counter
+    from app.models import QuizAttemptCounter
+
+    QuizAttemptCounter(student_id="student-1", lesson_id="lesson-1", attempts=2).save()
+    assert counter.increment("student-1", "lesson-1", LIMIT) == 3
+
+
+def test_backfill_sets_versions_from_the_quizzes():
+    import manage
+    from app.models import Quiz, QuizAttemptCounter
+
+    for version in (1, 3):
+        Quiz(lesson_id="lesson-1", student_id="student-1", subject_id="subject-1", lesson_title="Addition", quiz_version=version).save()
+    manage.backfill_attempt_counters(dry_run=False)
+
+    counter = QuizAttemptCounter.get("student-1", "lesson-1")
+    assert (counter.attempts, counter.versions) == (2, 3)
+
+
+@pytest.mark.parametrize("error, status_code", [(ValueError("LLM returned invalid JSON"), 502), (asyncio.TimeoutError(), 503)])
+def test_llm_failures_are_not_forbidden_and_release_the_attempt(monkeypatch, error, status_code):
+    from app import services
+    from app.models import QuizAttemptCounter
+    from app.routers.lesson import get_quiz
+
+    lesson = _lesson()
+
+    async def failing_generation(**kwargs):
+        raise error
+
+    monkeypatch.setattr(services.ai, "generate_quiz_questions", failing_generation)
+    with pytest.raises(HTTPException) as failure:
+        asyncio.run(get_quiz(lesson.id, _student()))
+    assert failure.value.status_code == status_code
+    assert QuizAttemptCounter.get("student-1", lesson.id).attempts == 0
+
+
+def test_attempt_limit_is_forbidden(monkeypatch):
+    from app import services
+    from app.routers.lesson import get_quiz
+
+    lesson = _lesson()
+
+    async def generation(**kwargs):
+        return [_question()]
+
+    monkeypatch.setattr(services.ai, "generate_quiz_questions", generation)
+    versions = [asyncio.run(get_quiz(lesson.id, _student())).quiz_version for _ in range(LIMIT)]
+    assert versions == [1, 2, 3]
+    with pytest.raises(HTTPException) as failure:
+        asyncio.run(get_quiz(lesson.id, _student()))
+    assert failure.value.status_code == 403
@@ -0,0 +1,106 @@
+import pytest
+from fastapi import HTTPException
+
+from app import ratelimit
+from app.ratelimit import Limit, MemoryBackend, RateLimiter
+from app.schemas import User as UserSchema
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock)
+    return clock
+
+
+@pytest.mark.parametrize("value, expected", [("20/minute", Limit(20, 60)), ("1/second", Limit(1, 1)), ("0.5/hour", Limit(0.5, 3600))])
+def test_parse(value, expected):
+    assert Limit.parse(value) == expected
+
+
+@pytest.mark.parametrize("value", ["0/minute", "-1/minute", "nan/minute", "inf/minute", "ten/minute", "20/day", "20"])
+def test_parse_rejects_invalid_limits(value):
+    with pytest.raises(ValueError):
+        Limit.parse(value)
+
+
+def test_burst_up_to_capacity_then_wait(clock):
+    backend, limit = MemoryBackend(), Limit(3, 60)
+    assert [backend.acquire("key", limit) for _ in range(3)] == [0, 0, 0]
+    assert backend.acquire("key", limit) == pytest.approx(20)  # one token every 20 s
+
+
+def test_refill(clock):
+    backend, limit = MemoryBackend(), Limit(3, 60)
+    for _ in range(3):
+        backend.acquire("key", limit)
+    clock.now += 20
+    assert backend.acquire("key", limit) == 0
+    assert backend.acquire("key", limit) == pytest.approx(20)
+
+    # Idle time refills up to the capacity, never beyond
+    clock.now += 3600
+    assert [backend.acquire("key", limit) for _ in range(3)] == [0, 0, 0]
+    assert backend.acquire("key", limit) > 0
+
+
+def test_refund_is_capped_at_capacity(clock):
+    backend, limit = MemoryBackend(), Limit(2, 60)
+    backend.acquire("key", limit)
+    backend.refund("key", limit)
+    backend.refund("key", limit)
+    assert [backend.acquire("key", limit) for _ in range(3)][-1] > 0
+
+
+def test_lru_bound(clock):
+    backend, limit = MemoryBackend(max_keys=2), Limit(1, 60)
+    for key in ("a", "b", "c"):
+        backend.acquire(key, limit)
+    # "a" was evicted, and a bucket that is not there is full
+    assert backend.acquire("a", limit) == 0
+
+
+def test_global_rejection_refunds_the_user_token(clock):
+    limiter = RateLimiter(MemoryBackend(), {"quiz_start": {"student": "1/hour", "global": "1/minute"}})
+    assert limiter.check("quiz_start", "user-1", "student") == 0
+    # The global bucket is empty, so user-2's only token goes back...
+    assert limiter.check("quiz_start", "user-2", "student") == pytest.approx(60)
+    clock.now += 60
+    # ...and is there once the global bucket has refilled
+    assert limiter.check("quiz_start", "user-2", "student") == 0
+
+
+def test_roles_without_a_budget_use_the_default(clock):
+    limiter = RateLimiter(MemoryBackend(), {"ai_assist": {"student": "1/minute", "default": "2/minute"}})
+    assert [limiter.check("ai_assist", "admin-1", "admin") for _ in range(3)][-1] > 0
+    assert limiter.check("ai_assist", "student-1", "student") == 0
+    assert limiter.check("ai_assist", "student-1", "student") > 0
+
+
+def test_backend_failure_fails_open():
+    class Broken:
+        def acquire(self, *args):
+            raise ConnectionError("redis is down")
+
+    assert RateLimiter(Broken(), {"ai_assist": {"default": "1/minute"}}).check("ai_assist", "user-1", "student") == 0
+
+
+def test_dependency_answers_429_with_retry_after(clock, monkeypatch):
+    monkeypatch.setattr(ratelimit.settings, "rate_limit_enabled", True)
+    monkeypatch.setattr(ratelimit, "limiter", RateLimiter(MemoryBackend(), {"quiz_start": {"student": "1/minute"}}))
+    check = ratelimit.rate_limit("quiz_start")
+    user = UserSchema(id="user-1", username="student", email="student@example.com", role="student")
+
+    check(user)
+    with pytest.raises(HTTPException) as error:
+        check(user)
+    assert error.value.status_code == 429
+    assert error.value.headers["Retry-After"] == "60"
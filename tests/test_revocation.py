@@ -0,0 +1,105 @@
+import time
+
+import pytest
+from moto import mock_aws
+
+from app.revocation import RevocationList
+
+MAX_AGE = 15 * 60
+
+
+@pytest.fixture(autouse=True)
+def tables():
+    with mock_aws():
+        from app.models import TokenRevocation
+
+        TokenRevocation.create_table(wait=True)
+        yield
+
+
+def _instance(refresh_seconds: int = 30) -> RevocationList:
+    revocations = RevocationList(enabled=True, refresh_seconds=refresh_seconds, max_token_age_seconds=MAX_AGE)
+    revocations.refresh()
+    return revocations
+
+
+def test_revoke_rejects_earlier_tokens_only():
+    revocations = _instance()
+    issued_at = time.time()
+    revocations.revoke("user-1")
+
+    assert revocations.is_revoked("user-1", issued_at)
+    assert not revocations.is_revoked("user-2", issued_at)
+    # Logging in again right after the revocation gets a token that is accepted
+    assert not revocations.is_revoked("user-1", time.time())
+
+
+def test_tokens_without_iat_are_rejected():
+    assert _instance().is_revoked("user-1", None)
+
+
+def test_tokens_older_than_the_claims_lifetime_are_rejected():
+    # e.g. a 30-day token issued in database mode, after its revocation entry has expired
+    revocations = _instance()
+    assert revocations.is_revoked("user-1", time.time() - MAX_AGE - 1)
+    assert not revocations.is_revoked("user-1", time.time() - MAX_AGE + 60)
+
+
+def test_revocation_entry_outlives_the_tokens_it_blocks():
+    from app.models import TokenRevocation
+
+    _instance(refresh_seconds=30).revoke("user-1")
+    entry = TokenRevocation.get("user-1")
+    assert entry.expires_at.timestamp() >= time.time() + MAX_AGE + 29
+
+
+def test_other_instances_pick_up_revocations_when_stale():
+    issued_at = time.time()
+    other = _instance(refresh_seconds=0)
+    _instance().revoke("user-1")
+
+    assert not other.is_revoked("user-1", issued_at)  # until its next refresh
+    assert other.is_stale()
+    other.refresh()
+    assert other.is_revoked("user-1", issued_at)
+
+
+def test_fresh_snapshot_is_not_rescanned():
+    revocations = _instance(refresh_seconds=3600)
+    issued_at = time.time()
+    _instance().revoke("user-1")
+    revocations.refresh()
+    assert not revocations.is_revoked("user-1", issued_at)
+
+
+def test_revoke_all():
+    revocations = _instance()
+    issued_at = time.time()
+    revocations.revoke_all()
+    assert revocations.is_revoked("user-1", issued_at)
+    assert revocations.is_revoked("user-2", issued_at)
+    assert not revocations.is_revoked("user-1", time.time())
+
+
+def test_disabled_list_stores_nothing():
+    from app.models import TokenRevocation
+
+    RevocationList(enabled=False, refresh_seconds=30, max_token_age_seconds=MAX_AGE).revoke("user-1")
+    assert TokenRevocation.count() == 0
+
+
+def test_password_reset_revokes_every_token(tmp_path, monkeypatch):
+    import manage
+    from app.models import TokenRevocation, User
+    from app.revocation import ALL_USERS, revocation_list
+
+    User.create_table(wait=True)
+    User(username="student", email="student@example.com", password="old").save()
+    monkeypatch.setattr(revocation_list, "enabled", True)
+    monkeypatch.setattr(revocation_list, "_not_before", {})
+    issued_at = time.time()
+
+    manage.update_all_passwords(dry_run=False, segments=1, capacity_fraction=0.25, checkpoint_dir=str(tmp_path))
+
+    assert TokenRevocation.get(ALL_USERS).not_before >= issued_at
+    assert revocation_list.is_revoked("any-user", issued_at)
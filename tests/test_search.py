@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from moto import mock_aws
+
+
+@pytest.fixture(autouse=True)
+def index(tmp_path, monkeypatch):
+    """A local, empty search index, as left by build-search-index on empty tables."""
+    with mock_aws():
+        import manage
+        from app import search
+
+        manage.create_tables()
+        index = search.SearchIndex(str(tmp_path / "search.idx"), merge_threshold=50, reload_seconds=30)
+        index.rebuild([])
+        monkeypatch.setattr(search, "search_index", index)
+        yield index
+
+
+def _lesson(status: str):
+    from app.models import Lesson
+
+    lesson = Lesson(subject_id="subject-1", instructor_id="admin-1", title="Photosynthesis", language="en", content="Plants use light", status=status)
+    lesson.save()
+    return lesson
+
+
+def _titles(index):
+    return [hit["title"] for hit in index.search("photosynthesis")]
+
+
+def test_verified_lesson_becomes_searchable(index):
+    from app.routers.admin import verify_lesson
+    from app.schemas import User
+
+    lesson = _lesson("pending")
+    assert _titles(index) == []
+
+    verified = verify_lesson(lesson.id, User(id="admin-1", username="admin", email="admin@example.com", role="admin"))
+    assert verified.status == "verified"
+    assert _titles(index) == ["Photosynthesis"]
+
+
+def test_failed_regeneration_leaves_the_index(index, monkeypatch):
+    from app import services
+    from app.crud import crud_lesson
+    from app.models import Lesson
+
+    lesson = _lesson("verified")
+    crud_lesson.reindex(lesson)
+    assert _titles(index) == ["Photosynthesis"]
+
+    async def failing_generation(**kwargs):
+        raise ValueError("LLM returned no lesson")
+
+    monkeypatch.setattr(services.ai, "generate_lesson", failing_generation)
+    asyncio.run(services.create_lesson_content(lesson.id, "Biology", 5, "en", lesson.title))
+
+    assert Lesson.get(lesson.id).status == "failed"
+    assert _titles(index) == []
+
+
+def test_search_without_an_index_does_not_read_the_tables(tmp_path):
+    from app import search
+    from app.querycount import assert_max_queries
+
+    with assert_max_queries(0, "search"), pytest.raises(search.IndexNotBuiltError):
+        search.SearchIndex(str(tmp_path / "missing.idx")).search("photosynthesis")
@@ -15,6 +15,7 @@ import {
   getLesson,
   getQuiz,
   submitQuiz,
+  waitForQuizFeedback,
   getPracticeTasks,
   getStudentDashboard,
   getLanguages,
@@ -258,11 +259,17 @@ export const useSubmitQuiz = () => {
       const passed = data.attempt.passed;
       toast({
         title: passed ? "Quiz Passed!" : "Quiz Completed",
-        description: `Score: ${Math.round(data.attempt.score)}%. ${
-          data.ai_feedback
-        }`,
+        description: `Score: ${Math.round(data.attempt.score)}%.`,
         variant: passed ? "default" : "destructive",
       });
+
+      waitForQuizFeedback(data.attempt.id)
+        .then((feedback) => {
+          if (feedback.feedback_status === "ready" && feedback.ai_feedback) {
+            toast({ title: "Quiz Feedback", description: feedback.ai_feedback });
+          }
+        })
+        .catch(() => undefined);
     },
     onError: (error: AxiosError) => {
       toast({
@@ -177,13 +177,38 @@ export async function getQuizAttempts(
 
 export async function submitQuiz(submission: Partial<QuizSubmission>): Promise<{
   attempt: QuizAttempt;
-  ai_feedback: string;
+  ai_feedback?: string | null;
   regenerated_quiz?: Quiz;
 }> {
   const response = await api.post(`/quizzes/${submission.quiz_id}/submit/`, submission.responses);
   return response.data;
 }
 
+type QuizFeedback = {
+  quiz_id: string;
+  feedback_status?: "pending" | "ready" | "failed" | null;
+  ai_feedback?: string | null;
+};
+
+// Feedback is generated after submission; while pending, Retry-After says when to ask again
+export async function getQuizFeedback(quizId: string): Promise<QuizFeedback & { retryAfterSeconds?: number }> {
+  const response = await api.get(`/quizzes/${quizId}/feedback`);
+  const retryAfter = Number(response.headers["retry-after"]);
+  return { ...response.data, retryAfterSeconds: Number.isFinite(retryAfter) ? retryAfter : undefined };
+}
+
+// Polls until the feedback is ready or failed, or `timeoutMs` has passed
+export async function waitForQuizFeedback(quizId: string, timeoutMs = 30000): Promise<QuizFeedback> {
+  const deadline = Date.now() + timeoutMs;
+  for (;;) {
+    const feedback = await getQuizFeedback(quizId);
+    if (feedback.feedback_status !== "pending" || Date.now() >= deadline) {
+      return feedback;
+    }
+    await new Promise((resolve) => setTimeout(resolve, (feedback.retryAfterSeconds ?? 2) * 1000));
+  }
+}
+
 // Dashboard APIs
 
 export async function getStudentDashboard(): Promise<StudentDashboard> {